@@ -1,7 +1,9 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from .models import UserProfile, Account, Budget
+from .budgets import evaluate_budgets
 
 
 class UserProfileInline(admin.StackedInline):
@@ -38,6 +40,14 @@ class AccountAdmin(admin.ModelAdmin):
     )
 
 
+class BudgetChangeList(ChangeList):
+    """Change list that evaluates spending for the whole page in one query"""
+
+    def get_results(self, request):
+        super().get_results(request)
+        evaluate_budgets(self.result_list)
+
+
 @admin.register(Budget)
 class BudgetAdmin(admin.ModelAdmin):
     list_display = ['name', 'user', 'category', 'amount', 'period', 'get_spent_amount', 'get_percentage_used', 'is_active']
@@ -66,6 +76,9 @@ class BudgetAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_changelist(self, request, **kwargs):
+        return BudgetChangeList
+
     def get_spent_amount(self, obj):
         return f"${obj.get_spent_amount():.2f}"
     get_spent_amount.short_description = 'Spent Amount'
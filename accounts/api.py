@@ -1,23 +1,32 @@
-from ninja import NinjaAPI, Query
-from django.shortcuts import get_object_or_404
-from django.db.models import Q, Sum
+from ninja import Query
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.db.models import Count, Q, Sum
 from django.core.paginator import Paginator
 from typing import Optional
 from math import ceil
 
+from backend.cache import cached_response
+from backend.instrumentation import InstrumentedNinjaAPI
+from backend.serialization import afetch
+from transactions.category_tree import get_category_tree
+from transactions.forecast import forecast_account
+from transactions.pagination import apaginate
 from .models import Account, UserProfile, Budget
+from .budgets import evaluate_budgets
+from .serializers import account_serializer, user_profile_serializer
 from .schemas import (
     AccountSchema, UserProfileSchema, BudgetSchema,
     AccountListResponse, UserProfileListResponse, BudgetListResponse,
-    AccountSummarySchema
+    AccountSummarySchema, AccountForecastSchema
 )
 
 
 # Create API instance
-api = NinjaAPI(
+api = InstrumentedNinjaAPI(
     title="Accounts API",
     description="Read-only API for accounts, user profiles, and budgets",
-    version="1.0.0"
+    version="1.0.0",
+    urls_namespace="accounts_api"
 )
 
 
@@ -26,13 +35,8 @@ def get_username(user):
     return user.username if user else None
 
 
-def get_category_name(category):
-    """Helper function to get category name from category object"""
-    return category.name if category else None
-
-
 @api.get("/accounts/", response=AccountListResponse)
-def list_accounts(
+async def list_accounts(
     request,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
@@ -45,7 +49,7 @@ def list_accounts(
     """
     List all accounts with optional filtering and pagination.
     """
-    queryset = Account.objects.select_related('user').all()
+    queryset = Account.objects.all()
     
     # Apply filters
     if account_type:
@@ -67,45 +71,24 @@ def list_accounts(
         )
     
     # Pagination
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
+    rows, total_count = await apaginate(account_serializer.values_list(queryset), page, page_size)
     
-    # Convert to schema
-    accounts = []
-    for account in page_obj:
-        accounts.append(AccountSchema(
-            id=account.id,
-            user_id=account.user_id,
-            username=get_username(account.user),
-            account_name=account.account_name,
-            account_type=account.account_type,
-            account_type_display=account.get_account_type_display(),
-            account_number=account.account_number,
-            balance=account.balance,
-            initial_balance=account.initial_balance,
-            currency=account.currency,
-            currency_display=account.get_currency_display(),
-            description=account.description,
-            is_active=account.is_active,
-            created_at=account.created_at,
-            updated_at=account.updated_at
-        ))
-    
-    return AccountListResponse(
-        accounts=accounts,
-        total_count=paginator.count,
-        page=page,
-        page_size=page_size,
-        total_pages=ceil(paginator.count / page_size)
-    )
+    # Plain dicts are validated once by the response schema
+    return {
+        "accounts": await account_serializer.aserialize_rows(rows),
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": ceil(total_count / page_size)
+    }
 
 
-@api.get("/accounts/{account_id}/", response=AccountSchema)
-def get_account(request, account_id: int):
+@api.get("/accounts/{int:account_id}/", response=AccountSchema)
+async def get_account(request, account_id: int):
     """
     Get a specific account by ID.
     """
-    account = get_object_or_404(Account.objects.select_related('user'), id=account_id)
+    account = await aget_object_or_404(Account.objects.select_related('user'), id=account_id)
     
     return AccountSchema(
         id=account.id,
@@ -126,15 +109,16 @@ def get_account(request, account_id: int):
     )
 
 
-@api.get("/accounts/{account_id}/summary/", response=AccountSummarySchema)
+@api.get("/accounts/{int:account_id}/summary/", response=AccountSummarySchema)
 def get_account_summary(request, account_id: int):
     """
     Get account summary with income/expense totals.
     """
     account = get_object_or_404(Account.objects.select_related('user'), id=account_id)
     
-    total_income = account.get_total_income()
-    total_expense = account.get_total_expense()
+    totals = account.get_totals()
+    total_income = totals['income']
+    total_expense = totals['expense']
     net_balance = account.balance + total_income - total_expense
     
     return AccountSummarySchema(
@@ -155,8 +139,25 @@ def get_account_summary(request, account_id: int):
     )
 
 
+@api.get("/accounts/{int:account_id}/forecast/", response=AccountForecastSchema)
+def get_account_forecast(
+    request,
+    account_id: int,
+    months: int = Query(12, ge=1, le=120, description="Number of months to project"),
+    granularity: str = Query("monthly", pattern="^(daily|monthly)$", description="'daily' or 'monthly' points")
+):
+    """
+    Project the account balance from its active recurring transactions.
+    """
+    account = get_object_or_404(Account, id=account_id)
+    
+    forecast = forecast_account(account, months=months, granularity=granularity)
+    forecast.update(account_name=account.account_name, currency=account.currency)
+    return forecast
+
+
 @api.get("/user-profiles/", response=UserProfileListResponse)
-def list_user_profiles(
+async def list_user_profiles(
     request,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
@@ -166,7 +167,7 @@ def list_user_profiles(
     """
     List all user profiles with optional filtering and pagination.
     """
-    queryset = UserProfile.objects.select_related('user').all()
+    queryset = UserProfile.objects.all()
     
     # Apply filters
     if user_id:
@@ -176,38 +177,24 @@ def list_user_profiles(
         queryset = queryset.filter(user__username__icontains=search)
     
     # Pagination
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
+    rows, total_count = await apaginate(user_profile_serializer.values_list(queryset), page, page_size)
     
-    # Convert to schema
-    profiles = []
-    for profile in page_obj:
-        profiles.append(UserProfileSchema(
-            id=profile.id,
-            user_id=profile.user_id,
-            username=get_username(profile.user),
-            phone_number=profile.phone_number,
-            date_of_birth=profile.date_of_birth,
-            address=profile.address,
-            created_at=profile.created_at,
-            updated_at=profile.updated_at
-        ))
-    
-    return UserProfileListResponse(
-        profiles=profiles,
-        total_count=paginator.count,
-        page=page,
-        page_size=page_size,
-        total_pages=ceil(paginator.count / page_size)
-    )
+    # Plain dicts are validated once by the response schema
+    return {
+        "profiles": await user_profile_serializer.aserialize_rows(rows),
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": ceil(total_count / page_size)
+    }
 
 
 @api.get("/user-profiles/{profile_id}/", response=UserProfileSchema)
-def get_user_profile(request, profile_id: int):
+async def get_user_profile(request, profile_id: int):
     """
     Get a specific user profile by ID.
     """
-    profile = get_object_or_404(UserProfile.objects.select_related('user'), id=profile_id)
+    profile = await aget_object_or_404(UserProfile.objects.select_related('user'), id=profile_id)
     
     return UserProfileSchema(
         id=profile.id,
@@ -234,7 +221,7 @@ def list_budgets(
     """
     List all budgets with optional filtering and pagination.
     """
-    queryset = Budget.objects.select_related('user', 'category').all()
+    queryset = Budget.objects.select_related('user').all()
     
     # Apply filters
     if user_id:
@@ -253,20 +240,24 @@ def list_budgets(
     paginator = Paginator(queryset, page_size)
     page_obj = paginator.get_page(page)
     
-    # Convert to schema
+    # Resolve spent amounts for the whole page at once
+    evaluate_budgets(page_obj)
+    
+    # Convert to dicts; they are validated once by the response schema
+    tree = get_category_tree()
     budgets = []
     for budget in page_obj:
         spent_amount = budget.get_spent_amount()
         remaining_budget = budget.get_remaining_budget()
         percentage_used = budget.get_percentage_used()
         
-        budgets.append(BudgetSchema(
+        budgets.append(dict(
             id=budget.id,
             user_id=budget.user_id,
             username=get_username(budget.user),
             name=budget.name,
             category_id=budget.category_id,
-            category_name=get_category_name(budget.category),
+            category_name=tree.name(budget.category_id),
             amount=budget.amount,
             period=budget.period,
             period_display=budget.get_period_display(),
@@ -280,13 +271,13 @@ def list_budgets(
             updated_at=budget.updated_at
         ))
     
-    return BudgetListResponse(
-        budgets=budgets,
-        total_count=paginator.count,
-        page=page,
-        page_size=page_size,
-        total_pages=ceil(paginator.count / page_size)
-    )
+    return {
+        "budgets": budgets,
+        "total_count": paginator.count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": ceil(paginator.count / page_size)
+    }
 
 
 @api.get("/budgets/{budget_id}/", response=BudgetSchema)
@@ -294,7 +285,7 @@ def get_budget(request, budget_id: int):
     """
     Get a specific budget by ID.
     """
-    budget = get_object_or_404(Budget.objects.select_related('user', 'category'), id=budget_id)
+    budget = get_object_or_404(Budget.objects.select_related('user'), id=budget_id)
     
     spent_amount = budget.get_spent_amount()
     remaining_budget = budget.get_remaining_budget()
@@ -306,7 +297,7 @@ def get_budget(request, budget_id: int):
         username=get_username(budget.user),
         name=budget.name,
         category_id=budget.category_id,
-        category_name=get_category_name(budget.category),
+        category_name=get_category_tree().name(budget.category_id),
         amount=budget.amount,
         period=budget.period,
         period_display=budget.get_period_display(),
@@ -322,13 +313,11 @@ def get_budget(request, budget_id: int):
 
 
 @api.get("/accounts/statistics/")
-def get_accounts_statistics(request):
+@cached_response('accounts')
+async def get_accounts_statistics(request):
     """
     Get general statistics about accounts.
     """
-    total_accounts = Account.objects.count()
-    active_accounts = Account.objects.filter(is_active=True).count()
-    
     # Account type distribution
     account_types = Account.objects.values('account_type').annotate(
         count=Sum('id', distinct=True)
@@ -344,11 +333,18 @@ def get_accounts_statistics(request):
         total_balance=Sum('balance')
     ).values('currency', 'total_balance')
     
+    # Awaited one after another: the async ORM runs them on this request's
+    # connection in a single thread either way
+    counts = await Account.objects.aaggregate(total=Count('id'), active=Count('id', filter=Q(is_active=True)))
+    account_types = await afetch(account_types)
+    currencies = await afetch(currencies)
+    balance_by_currency = await afetch(balance_by_currency)
+    
     return {
-        "total_accounts": total_accounts,
-        "active_accounts": active_accounts,
-        "inactive_accounts": total_accounts - active_accounts,
-        "account_types": list(account_types),
-        "currencies": list(currencies),
-        "balance_by_currency": list(balance_by_currency)
+        "total_accounts": counts['total'],
+        "active_accounts": counts['active'],
+        "inactive_accounts": counts['total'] - counts['active'],
+        "account_types": account_types,
+        "currencies": currencies,
+        "balance_by_currency": balance_by_currency
     }
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+
+def get_budget_window(budget, today=None):
+    """Return the (start, end) dates of the budget's current period"""
+    today = today or timezone.now().date()
+
+    if budget.period == 'MONTHLY':
+        start = today.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    elif budget.period == 'WEEKLY':
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=6)
+    elif budget.period == 'YEARLY':
+        start = today.replace(month=1, day=1)
+        end = today.replace(month=12, day=31)
+    else:
+        start = budget.start_date
+        end = budget.end_date or today
+
+    return start, end
+
+
+def evaluate_budgets(budgets, today=None):
+    """
+    Compute the spent amount of every budget in a single grouped query.
+
+    Budgets that share a period window (all MONTHLY budgets, all WEEKLY
+    budgets, ...) share one conditional SUM; expense totals are grouped by
+    (user, category) and rolled up in Python: over the budget's category and
+    its subcategories (read from the category closure table), or over every
+    category for budgets without one.
+    The result is attached to each budget as ``spent_amount``, which the
+    Budget.get_* helpers pick up instead of querying again.
+    """
+    from transactions.models import CategoryClosure, Transaction
+
+    budgets = list(budgets)
+    if not budgets:
+        return budgets
+
+    windows = {budget.pk: get_budget_window(budget, today) for budget in budgets}
+    aliases = {window: f'spent_{i}' for i, window in enumerate(sorted(set(windows.values())))}
+
+    rows = Transaction.objects.filter(
+        user_id__in={budget.user_id for budget in budgets},
+        transaction_type='EXPENSE',
+        date__range=[
+            min(start for start, _ in windows.values()),
+            max(end for _, end in windows.values()),
+        ]
+    ).order_by().values('user_id', 'category_id').annotate(**{
+        alias: Sum('amount', filter=Q(date__range=window))
+        for window, alias in aliases.items()
+    })
+
+    totals = {}
+    for row in rows:
+        key = (row['user_id'], row['category_id'])
+        totals[key] = {alias: row[alias] or Decimal('0.00') for alias in aliases.values()}
+
+    descendants = {}
+    category_ids = {budget.category_id for budget in budgets if budget.category_id}
+    if category_ids:
+        for ancestor_id, descendant_id in CategoryClosure.objects.filter(
+            ancestor_id__in=category_ids
+        ).values_list('ancestor_id', 'descendant_id'):
+            descendants.setdefault(ancestor_id, []).append(descendant_id)
+
+    for budget in budgets:
+        alias = aliases[windows[budget.pk]]
+        if budget.category_id:
+            spent = sum(
+                (
+                    totals.get((budget.user_id, category_id), {}).get(alias, Decimal('0.00'))
+                    for category_id in descendants.get(budget.category_id, [budget.category_id])
+                ),
+                Decimal('0.00')
+            )
+        else:
+            spent = sum(
+                (values[alias] for (user_id, _), values in totals.items() if user_id == budget.user_id),
+                Decimal('0.00')
+            )
+        budget.spent_amount = spent
+
+    return budgets
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -75,46 +75,81 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.account_name} ({self.get_account_type_display()}) - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_user_id = instance.__dict__.get('user_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Override save to move the account's transactions along when it changes owner"""
+        from transactions.models import Transaction
+
+        update_fields = kwargs.get('update_fields')
+        stored_user_id = getattr(self, '_stored_user_id', None)
+        owner_changed = (
+            stored_user_id is not None and stored_user_id != self.user_id
+            and (update_fields is None or 'user' in update_fields or 'user_id' in update_fields)
+        )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if owner_changed:
+                # Transaction.user is a denormalized copy of the owner
+                Transaction.objects.filter(account=self).update(user_id=self.user_id)
+        if owner_changed or update_fields is None:
+            self._stored_user_id = self.user_id
+
     def update_balance(self, amount):
         """Update account balance by amount (positive for credit, negative for debit)"""
-        self.balance += Decimal(str(amount))
-        self.save(update_fields=['balance', 'updated_at'])
+        amount = Decimal(str(amount))
+        # Apply the change in the database so concurrent updates are not lost
+        Account.objects.filter(pk=self.pk).update(
+            balance=models.F('balance') + amount,
+            updated_at=timezone.now()
+        )
+        self.balance += amount
+
+    def get_totals(self):
+        """Calculate total income and expenses for this account from the daily rollups"""
+        from transactions.models import AccountDailyRollup
+        totals = AccountDailyRollup.objects.filter(account=self).aggregate(
+            income=models.Sum('total_amount', filter=models.Q(transaction_type='INCOME')),
+            expense=models.Sum('total_amount', filter=models.Q(transaction_type='EXPENSE'))
+        )
+        return {
+            'income': totals['income'] or Decimal('0.00'),
+            'expense': totals['expense'] or Decimal('0.00'),
+        }
 
     def get_total_income(self):
         """Calculate total income for this account"""
-        from transactions.models import Transaction
-        return Transaction.objects.filter(
-            account=self,
-            transaction_type='INCOME'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        return self.get_totals()['income']
 
     def get_total_expense(self):
         """Calculate total expenses for this account"""
-        from transactions.models import Transaction
-        return Transaction.objects.filter(
-            account=self,
-            transaction_type='EXPENSE'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        return self.get_totals()['expense']
 
     def get_monthly_summary(self, year, month):
         """Get monthly transaction summary"""
-        from transactions.models import Transaction
-        transactions = Transaction.objects.filter(
+        from transactions.models import AccountDailyRollup
+        rollups = AccountDailyRollup.objects.filter(
             account=self,
             date__year=year,
             date__month=month
+        ).aggregate(
+            income=models.Sum('total_amount', filter=models.Q(transaction_type='INCOME')),
+            expense=models.Sum('total_amount', filter=models.Q(transaction_type='EXPENSE')),
+            transaction_count=models.Sum('transaction_count')
         )
 
-        income = transactions.filter(transaction_type='INCOME').aggregate(
-            total=models.Sum('amount'))['total'] or Decimal('0.00')
-        expense = transactions.filter(transaction_type='EXPENSE').aggregate(
-            total=models.Sum('amount'))['total'] or Decimal('0.00')
+        income = rollups['income'] or Decimal('0.00')
+        expense = rollups['expense'] or Decimal('0.00')
 
         return {
             'income': income,
             'expense': expense,
             'net': income - expense,
-            'transaction_count': transactions.count()
+            'transaction_count': rollups['transaction_count'] or 0
         }
 
 
@@ -153,33 +188,10 @@ class Budget(models.Model):
 
     def get_spent_amount(self):
         """Calculate amount spent in current budget period"""
-        from transactions.models import Transaction
-        from datetime import datetime, timedelta
-
-        if self.period == 'MONTHLY':
-            start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            end = (start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
-        elif self.period == 'WEEKLY':
-            start = timezone.now() - timedelta(days=timezone.now().weekday())
-            start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-            end = start + timedelta(days=7) - timedelta(seconds=1)
-        elif self.period == 'YEARLY':
-            start = timezone.now().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            end = start.replace(year=start.year + 1) - timedelta(seconds=1)
-        else:
-            start = self.start_date
-            end = self.end_date or timezone.now()
-
-        transactions = Transaction.objects.filter(
-            account__user=self.user,
-            transaction_type='EXPENSE',
-            date__range=[start, end]
-        )
-
-        if self.category:
-            transactions = transactions.filter(category=self.category)
-
-        return transactions.aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        if not hasattr(self, 'spent_amount'):
+            from .budgets import evaluate_budgets
+            evaluate_budgets([self])
+        return self.spent_amount
 
     def get_remaining_budget(self):
         """Calculate remaining budget"""
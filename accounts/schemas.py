@@ -74,6 +74,28 @@ class BudgetSchema(Schema):
     updated_at: datetime
 
 
+class ForecastPointSchema(Schema):
+    """Projected cash flow and closing balance for one day or month"""
+    date: date  # Last day of the period
+    inflow: Decimal
+    outflow: Decimal
+    net: Decimal
+    balance: Decimal
+
+
+class AccountForecastSchema(Schema):
+    """Schema for projected account balances from recurring transactions"""
+    account_id: int
+    account_name: str
+    currency: str
+    granularity: str  # 'daily' or 'monthly'
+    start_date: date
+    end_date: date
+    starting_balance: Decimal
+    recurring_count: int  # Recurring transactions included in the projection
+    points: list[ForecastPointSchema]
+
+
 class AccountListResponse(Schema):
     """Response schema for account list with pagination"""
     accounts: list[AccountSchema]
@@ -0,0 +1,33 @@
+from backend.serialization import ValuesSerializer, choice_display
+from .models import Account
+
+
+account_serializer = ValuesSerializer([
+    ('id', 'id'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('account_name', 'account_name'),
+    ('account_type', 'account_type'),
+    ('account_type_display', 'account_type', choice_display(Account, 'account_type')),
+    ('account_number', 'account_number'),
+    ('balance', 'balance'),
+    ('initial_balance', 'initial_balance'),
+    ('currency', 'currency'),
+    ('currency_display', 'currency', choice_display(Account, 'currency')),
+    ('description', 'description'),
+    ('is_active', 'is_active'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+])
+
+
+user_profile_serializer = ValuesSerializer([
+    ('id', 'id'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('phone_number', 'phone_number'),
+    ('date_of_birth', 'date_of_birth'),
+    ('address', 'address'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+])
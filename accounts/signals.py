@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.cache import bump_version
+from .models import Account
+
+
+@receiver([post_save, post_delete], sender=Account)
+def invalidate_account_caches(sender, **kwargs):
+    """Invalidate cached account responses when an account changes"""
+    bump_version('accounts')
@@ -1,3 +1,84 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+
+from transactions.forecast import forecast_account
+from transactions.models import Category, RecurringTransaction, Transaction
+from .models import Account, Budget
+
+
+class BudgetSpentAmountTests(TestCase):
+    """Budget spending is computed in bulk and includes subcategories"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', password='password123')
+        self.account = Account.objects.create(user=self.user, account_name='Checking')
+        self.food = Category.objects.create(name='Food & Dining')
+        self.groceries = Category.objects.create(name='Groceries', parent=self.food)
+        self.restaurants = Category.objects.create(name='Restaurants', parent=self.food)
+        self.travel = Category.objects.create(name='Travel')
+
+    def spend(self, category, amount):
+        Transaction.objects.create(
+            account=self.account, transaction_type='EXPENSE', amount=Decimal(amount),
+            title=category.name, category=category
+        )
+
+    def test_category_budget_includes_subcategories(self):
+        self.spend(self.groceries, '30.00')
+        self.spend(self.restaurants, '12.50')
+        self.spend(self.travel, '100.00')
+
+        food = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=Decimal('200.00'))
+        groceries = Budget.objects.create(
+            user=self.user, name='Groceries', category=self.groceries, amount=Decimal('50.00')
+        )
+        overall = Budget.objects.create(user=self.user, name='Overall', amount=Decimal('500.00'))
+
+        self.assertEqual(food.get_spent_amount(), Decimal('42.50'))
+        self.assertEqual(groceries.get_spent_amount(), Decimal('30.00'))
+        self.assertEqual(overall.get_spent_amount(), Decimal('142.50'))
+
+
+class AccountForecastTests(TestCase):
+    """Balances are projected from active recurring transactions"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='forecast', password='password123')
+        self.account = Account.objects.create(user=self.user, account_name='Checking', balance=Decimal('100.00'))
+
+    def recurring(self, transaction_type, amount, frequency, next_due_date, **kwargs):
+        return RecurringTransaction.objects.create(
+            user=self.user, account=self.account, transaction_type=transaction_type, amount=Decimal(amount),
+            title=transaction_type.title(), frequency=frequency, start_date=next_due_date,
+            next_due_date=next_due_date, **kwargs
+        )
+
+    def test_monthly_forecast(self):
+        self.recurring('INCOME', '1000.00', 'MONTHLY', date(2026, 1, 31))
+        self.recurring('EXPENSE', '100.00', 'WEEKLY', date(2026, 1, 5), end_date=date(2026, 1, 31))
+        self.recurring('EXPENSE', '999.00', 'DAILY', date(2026, 1, 1), is_active=False)
+        # Materialized without a target account, so the ledger posts nothing for it
+        self.recurring('TRANSFER', '50.00', 'MONTHLY', date(2026, 1, 20))
+
+        forecast = forecast_account(self.account, months=2, today=date(2026, 1, 15))
+        points = [(point['date'], point['inflow'], point['outflow'], point['balance']) for point in forecast['points']]
+        self.assertEqual(points, [
+            (date(2026, 1, 31), Decimal('1000.00'), Decimal('200.00'), Decimal('900.00')),
+            (date(2026, 2, 28), Decimal('1000.00'), Decimal('0.00'), Decimal('1900.00')),
+            (date(2026, 3, 15), Decimal('0.00'), Decimal('0.00'), Decimal('1900.00')),
+        ])
 
-# Create your tests here.
+    def test_forecast_endpoint_daily(self):
+        self.recurring('EXPENSE', '10.00', 'DAILY', timezone.now().date())
+        response = self.client.get(f'/api/v1/accounts/{self.account.id}/forecast/?months=1&granularity=daily')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['account_name'], 'Checking')
+        self.assertEqual(data['points'][0]['balance'], '90.00')
+        days = (date.fromisoformat(data['end_date']) - date.fromisoformat(data['start_date'])).days + 1
+        self.assertEqual(len(data['points']), days)
+        self.assertEqual(data['points'][-1]['balance'], str(Decimal('100.00') - 10 * days))
@@ -3,6 +3,12 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The read endpoints of the APIs are async views. Under ASGI each request runs
+its ORM calls in a thread of its own, so persistent connections are not
+reused across requests and would stay open until they time out.
+DATABASE_CONN_MAX_AGE therefore defaults to 0 here; deploy with
+DATABASE_POOL_MODE=pool (or pgbouncer) to reuse connections.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +18,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Persistent connections of finished request threads are never closed under ASGI
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
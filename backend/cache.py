@@ -0,0 +1,126 @@
+"""
+Response caching with version-key invalidation.
+
+Every cached response is stored under a key that embeds the current version of
+the data scopes it depends on (e.g. "transactions", "accounts"). Writes bump
+the version of the scopes they touch, which makes all older entries
+unreachable at once; they then simply expire through their TTL.
+
+Versions live in the configured cache backend, so with a shared backend
+(file or Redis) a write in one process invalidates responses cached by every
+process. With the default local-memory backend each process keeps its own
+versions and only sees its own writes before the TTL runs out.
+
+A request served by a read replica may see data from before the latest
+bump; its response is not cached until the replicas had time to catch up.
+
+Async views are supported too; they read and write the cache with the
+backend's async methods.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .db_routing import current_read_alias
+
+
+VERSION_KEY = 'data-version:{scope}'
+CHANGED_KEY = 'data-changed:{scope}'
+
+
+def get_versions(*scopes):
+    """Return the current data version of each scope with a single cache read"""
+    keys = [VERSION_KEY.format(scope=scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, 1, timeout=None)
+            versions[key] = cache.get(key, 1)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(*scopes):
+    """Async version of get_versions()"""
+    keys = [VERSION_KEY.format(scope=scope) for scope in scopes]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, 1, timeout=None)
+            versions[key] = await cache.aget(key, 1)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*scopes):
+    """
+    Invalidate everything cached for the given scopes.
+
+    When called inside an atomic block the bump is deferred until the
+    transaction commits, so a concurrent reader cannot cache pre-commit data
+    under the new version.
+    """
+    def bump():
+        for scope in scopes:
+            key = VERSION_KEY.format(scope=scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 2, timeout=None)
+        cache.set_many({CHANGED_KEY.format(scope=scope): time.time() for scope in scopes}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def cached_response(*scopes, timeout=None):
+    """
+    Cache the return value of a ninja view until one of its scopes changes.
+
+    The cache key combines the view name, the current version of every scope
+    and the request's query string. timeout defaults to settings.API_CACHE_TIMEOUT.
+    """
+    def decorator(view_func):
+        def cache_key(request, versions, kwargs):
+            arguments = f"{request.META.get('QUERY_STRING', '')}|{sorted(kwargs.items())}"
+            digest = hashlib.md5(arguments.encode()).hexdigest()
+            return f"response:{view_func.__module__}.{view_func.__name__}:{':'.join(map(str, versions))}:{digest}"
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                key = cache_key(request, await aget_versions(*scopes), kwargs)
+                response = await cache.aget(key)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                    if not (current_read_alias() and await achanged_recently(*scopes)):
+                        await cache.aset(key, response, timeout if timeout is not None else settings.API_CACHE_TIMEOUT)
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = cache_key(request, get_versions(*scopes), kwargs)
+            response = cache.get(key)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if not (current_read_alias() and changed_recently(*scopes)):
+                    cache.set(key, response, timeout if timeout is not None else settings.API_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def changed_recently(*scopes):
+    """Whether any scope was bumped within settings.DATABASE_REPLICA_PIN_SECONDS"""
+    changed = cache.get_many([CHANGED_KEY.format(scope=scope) for scope in scopes]).values()
+    return any(time.time() - value < settings.DATABASE_REPLICA_PIN_SECONDS for value in changed)
+
+
+async def achanged_recently(*scopes):
+    """Async version of changed_recently()"""
+    changed = (await cache.aget_many([CHANGED_KEY.format(scope=scope) for scope in scopes])).values()
+    return any(time.time() - value < settings.DATABASE_REPLICA_PIN_SECONDS for value in changed)
@@ -0,0 +1,140 @@
+"""
+Database connection and pool saturation metrics.
+
+Served as JSON by the internal endpoint /api/v1/_internal/db/, available to
+staff users and clients listed in settings.INTERNAL_IPS. For every database
+alias it reports how connections are reused (settings.DATABASE_POOL_MODE)
+and, depending on the mode:
+
+- pool: the psycopg pool's size, idle connections, waiting requests and
+  saturation (connections in use / max_size) for this process.
+- PostgreSQL in any mode: server-side connection counts by state and
+  saturation against max_connections.
+- pgbouncer: SHOW POOLS from the pgbouncer admin console, when
+  settings.PGBOUNCER_ADMIN_URL is set.
+"""
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
+
+
+def pool_metrics(connection):
+    """Stats of the psycopg pool of a connection, or None if it does not use one"""
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    in_use = stats.get('pool_size', 0) - stats.get('pool_available', 0)
+    return {
+        'min_size': stats.get('pool_min', pool.min_size),
+        'max_size': stats.get('pool_max', pool.max_size),
+        'size': stats.get('pool_size', 0),
+        'idle': stats.get('pool_available', 0),
+        'in_use': in_use,
+        'requests_waiting': stats.get('requests_waiting', 0),
+        'requests_total': stats.get('requests_num', 0),
+        'requests_queued': stats.get('requests_queued', 0),
+        'requests_wait_ms': stats.get('requests_wait_ms', 0),
+        'requests_errors': stats.get('requests_errors', 0),
+        'connections_errors': stats.get('connections_errors', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+        'saturation': round(in_use / pool.max_size, 3) if pool.max_size else None,
+    }
+
+
+def server_metrics(connection):
+    """Connection counts on the PostgreSQL server of a connection, by state"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT coalesce(state, 'unknown'), count(*) FROM pg_stat_activity "
+            "WHERE datname = current_database() GROUP BY 1"
+        )
+        by_state = dict(cursor.fetchall())
+        cursor.execute("SELECT setting::int FROM pg_settings WHERE name = 'max_connections'")
+        max_connections = cursor.fetchone()[0]
+    total = sum(by_state.values())
+    return {
+        'connections': total,
+        'by_state': by_state,
+        'max_connections': max_connections,
+        'saturation': round(total / max_connections, 3) if max_connections else None,
+    }
+
+
+def pgbouncer_metrics(url):
+    """SHOW POOLS of the pgbouncer admin console at url, one dict per pool"""
+    import dj_database_url
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    params = dj_database_url.parse(url)
+    wrapper = connections['default']
+    # Raise Django's DatabaseError instead of the driver's exceptions
+    with wrapper.wrap_database_errors:
+        connection = wrapper.Database.connect(
+            dbname=params['NAME'] or 'pgbouncer',
+            user=params['USER'],
+            password=params['PASSWORD'],
+            host=params['HOST'],
+            port=params['PORT'] or 6432,
+        )
+    try:
+        # The admin console only speaks the simple query protocol, without transactions
+        connection.autocommit = True
+        if is_psycopg3:
+            from psycopg import ClientCursor
+            cursor = ClientCursor(connection)
+        else:
+            cursor = connection.cursor()
+        with wrapper.wrap_database_errors:
+            cursor.execute('SHOW POOLS')
+            columns = [column[0] for column in cursor.description]
+            pools = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+    for pool in pools:
+        clients = pool.get('cl_active', 0) + pool.get('cl_waiting', 0)
+        servers = pool.get('sv_active', 0) + pool.get('sv_idle', 0) + pool.get('sv_used', 0)
+        pool['saturation'] = round(pool.get('sv_active', 0) / servers, 3) if servers else None
+        pool['clients'] = clients
+    return pools
+
+
+def database_metrics():
+    """Metrics of every configured database alias"""
+    databases = {}
+    for alias in connections:
+        connection = connections[alias]
+        metrics = {
+            'vendor': connection.vendor,
+            'mode': settings.DATABASE_POOL_MODE,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'connected': connection.connection is not None,
+        }
+        try:
+            if connection.vendor == 'postgresql':
+                metrics['pool'] = pool_metrics(connection)
+                metrics['server'] = server_metrics(connection)
+        except DatabaseError as exc:
+            metrics['error'] = str(exc)
+        databases[alias] = metrics
+
+    result = {'databases': databases}
+    if settings.PGBOUNCER_ADMIN_URL:
+        try:
+            result['pgbouncer'] = pgbouncer_metrics(settings.PGBOUNCER_ADMIN_URL)
+        except DatabaseError as exc:
+            result['pgbouncer'] = {'error': str(exc)}
+    return result
+
+
+def is_internal_request(request):
+    """Whether a request may use the internal endpoints: staff users and settings.INTERNAL_IPS"""
+    return request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS or request.user.is_staff
+
+
+def database_metrics_view(request):
+    """Internal endpoint: connection and pool saturation metrics as JSON"""
+    if not is_internal_request(request):
+        return JsonResponse({'detail': 'Forbidden'}, status=403)
+    return JsonResponse(database_metrics())
@@ -0,0 +1,245 @@
+"""
+Read-replica routing.
+
+Replicas are configured with DATABASE_REPLICA_URLS (see settings.py) and
+become the database aliases listed in settings.DATABASE_REPLICAS. Only GET
+and HEAD requests to the ninja APIs (settings.DATABASE_REPLICA_PATHS) read
+from a replica; the admin, every write and everything outside a request
+(management commands, shells) use the primary.
+
+- A replica is picked per request, round-robin or by lowest probed latency
+  (settings.DATABASE_REPLICA_STRATEGY).
+- Read-your-writes: a request that writes pins its own remaining reads to
+  the primary, and its response sets a short-lived cookie that keeps the
+  client on the primary for DATABASE_REPLICA_PIN_SECONDS, long enough for
+  the replicas to catch up.
+- Failover: a replica that cannot be connected to, or that fails a query
+  with a connection error, is skipped for DATABASE_REPLICA_RETRY_SECONDS;
+  a GET that failed on it is served again from the primary.
+
+Routing state is a context variable, so it follows the request into
+threads started with asgiref's sync_to_async. The middleware is async
+capable: under ASGI, async views run without a thread being held for the
+whole request.
+"""
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, InterfaceError, OperationalError, connections
+
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_primary_pin'
+READ_METHODS = ('GET', 'HEAD')
+
+# Weight of a new latency probe in the moving average
+LATENCY_SMOOTHING = 0.3
+
+
+class RoutingState:
+    """Database routing of the current request"""
+
+    def __init__(self, alias=None):
+        self.alias = alias  # Replica serving reads, None for the primary
+        self.wrote = False
+        self.failed = False
+
+
+_state = ContextVar('db_routing', default=None)
+
+
+def current_read_alias():
+    """The replica the current request reads from, or None when it reads from the primary"""
+    state = _state.get()
+    if state is None or state.wrote:
+        return None
+    return state.alias
+
+
+class ReplicaPool:
+    """Picks a healthy replica and keeps track of failed ones and their latency"""
+
+    def __init__(self, aliases, strategy='round_robin', retry_seconds=30):
+        self.aliases = list(aliases)
+        self.strategy = strategy
+        self.retry_seconds = retry_seconds
+        self.latency = {}
+        self.down_until = {}
+        self.probed_at = None
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def available(self):
+        now = time.monotonic()
+        return [alias for alias in self.aliases if self.down_until.get(alias, 0) <= now]
+
+    def mark_down(self, alias):
+        logger.warning('Database replica %s failed; using other databases for %ss', alias, self.retry_seconds)
+        self.down_until[alias] = time.monotonic() + self.retry_seconds
+        self.latency.pop(alias, None)
+
+    def record_latency(self, alias, seconds):
+        previous = self.latency.get(alias)
+        self.latency[alias] = seconds if previous is None else (
+            LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * previous
+        )
+
+    def probe(self):
+        """Time a trivial query on every available replica"""
+        for alias in self.available():
+            started = time.perf_counter()
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except (OperationalError, InterfaceError):
+                self.mark_down(alias)
+            else:
+                self.record_latency(alias, time.perf_counter() - started)
+
+    def choose(self):
+        """Return the alias of a replica to read from, or None if none is available"""
+        if self.strategy == 'least_latency':
+            with self._lock:
+                stale = self.probed_at is None or time.monotonic() - self.probed_at >= self.retry_seconds
+                if stale:
+                    self.probed_at = time.monotonic()
+            if stale:
+                self.probe()
+            candidates = self.available()
+            return min(candidates, key=lambda alias: self.latency.get(alias, 0.0)) if candidates else None
+
+        candidates = self.available()
+        return candidates[next(self._counter) % len(candidates)] if candidates else None
+
+    def connect(self):
+        """Like choose(), but only returns a replica that accepts a connection"""
+        while True:
+            alias = self.choose()
+            if alias is None:
+                return None
+            try:
+                connections[alias].ensure_connection()
+            except (OperationalError, InterfaceError):
+                self.mark_down(alias)
+            else:
+                return alias
+
+
+replicas = ReplicaPool(
+    getattr(settings, 'DATABASE_REPLICAS', []),
+    strategy=getattr(settings, 'DATABASE_REPLICA_STRATEGY', 'round_robin'),
+    retry_seconds=getattr(settings, 'DATABASE_REPLICA_RETRY_SECONDS', 30)
+)
+
+
+class ReplicaRouter:
+    """Sends reads to the replica chosen for the current request; writes always go to the primary"""
+
+    def db_for_read(self, model, **hints):
+        return current_read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas.aliases
+
+
+class ReplicaRoutingMiddleware:
+    """Chooses the database that serves the reads of each request"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def uses_replica(self, request):
+        return (
+            bool(replicas.aliases)
+            and request.method in READ_METHODS
+            and request.path.startswith(tuple(settings.DATABASE_REPLICA_PATHS))
+            and PIN_COOKIE not in request.COOKIES
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        alias = replicas.connect() if self.uses_replica(request) else None
+        state = RoutingState(alias)
+        token = _state.set(state)
+        try:
+            if alias is None:
+                response = self.get_response(request)
+            else:
+                with connections[alias].execute_wrapper(self.watch_replica):
+                    response = self.get_response(request)
+                if state.failed:
+                    replicas.mark_down(alias)
+                    state = RoutingState()
+                    _state.set(state)
+                    response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(request, state, response)
+
+    async def __acall__(self, request):
+        # Connections are thread-local: connect and install the watch in
+        # the thread that runs this request's ORM calls
+        alias = await sync_to_async(replicas.connect)() if self.uses_replica(request) else None
+        state = RoutingState(alias)
+        token = _state.set(state)
+        try:
+            if alias is None:
+                response = await self.get_response(request)
+            else:
+                await sync_to_async(self.set_watch)(alias, True)
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    await sync_to_async(self.set_watch)(alias, False)
+                if state.failed:
+                    replicas.mark_down(alias)
+                    state = RoutingState()
+                    _state.set(state)
+                    response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(request, state, response)
+
+    def process_response(self, request, state, response):
+        if state.wrote or request.method not in READ_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def set_watch(self, alias, enabled):
+        wrappers = connections[alias].execute_wrappers
+        if enabled:
+            wrappers.append(self.watch_replica)
+        else:
+            wrappers.remove(self.watch_replica)
+
+    def watch_replica(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        except (OperationalError, InterfaceError):
+            _state.get().failed = True
+            raise
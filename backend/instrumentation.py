@@ -0,0 +1,330 @@
+"""
+Per-endpoint instrumentation of the ninja APIs.
+
+ApiMetricsMiddleware times every request to settings.API_METRICS_PATHS and
+samples a fraction of them (settings.API_METRICS_SAMPLE_RATE) for the
+details that cost something to collect:
+
+- the number of SQL queries and the total time spent in them,
+- repeated queries: statements whose SQL was already run by the same
+  request, the usual sign of an N+1 pattern,
+- the slowest statement,
+- serialization time: response validation and rendering, from the moment
+  the handler returns (needs the API to be an InstrumentedNinjaAPI),
+- response size.
+
+Sampled responses carry the figures in a Server-Timing header, so they show
+up in the browser's developer tools. All figures are aggregated per endpoint
+(method and URL route) and served in Prometheus text format by
+/api/v1/_metrics, to staff users and settings.INTERNAL_IPS.
+
+Metrics are kept in memory per process: with several worker processes each
+scrape sees the process that served it, told apart by the pid label.
+"""
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from ninja import NinjaAPI
+
+from .db_metrics import is_internal_request
+
+
+# Upper bounds of the request duration histogram, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Longest SQL text kept for the slowest query of an endpoint
+SQL_LABEL_LENGTH = 300
+
+
+class RequestMetrics:
+    """Figures collected for one sampled request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.repeated_queries = 0
+        self.db_time = 0.0
+        self.slowest = (0.0, '')
+        self.serialization = 0.0
+        self.view_done = None
+        self.statements = set()
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        if sql in self.statements:
+            self.repeated_queries += 1
+        else:
+            self.statements.add(sql)
+        if duration > self.slowest[0]:
+            self.slowest = (duration, sql)
+
+
+_current = ContextVar('api_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing the queries of sampled requests"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+def watch_connections():
+    """Install record_query on this thread's connections"""
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if record_query not in wrappers:
+            wrappers.append(record_query)
+
+
+class EndpointMetrics:
+    """Totals of one endpoint"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.duration = 0.0
+        self.count = 0
+        self.sampled = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.repeated_queries = 0
+        self.db_time = 0.0
+        self.serialization = 0.0
+        self.response_bytes = 0
+        self.slowest = (0.0, '')
+
+
+class MetricsRegistry:
+    """Per-endpoint totals of this process"""
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.endpoints.clear()
+
+    def record(self, method, route, status, duration, metrics=None, response_bytes=None):
+        with self._lock:
+            endpoint = self.endpoints.get((method, route))
+            if endpoint is None:
+                endpoint = self.endpoints[method, route] = EndpointMetrics()
+            endpoint.statuses[status] = endpoint.statuses.get(status, 0) + 1
+            endpoint.count += 1
+            endpoint.duration += duration
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    endpoint.buckets[index] += 1
+            if metrics is None:
+                return
+            endpoint.sampled += 1
+            endpoint.queries += metrics.queries
+            endpoint.max_queries = max(endpoint.max_queries, metrics.queries)
+            endpoint.repeated_queries += metrics.repeated_queries
+            endpoint.db_time += metrics.db_time
+            endpoint.serialization += metrics.serialization
+            if response_bytes is not None:
+                endpoint.response_bytes += response_bytes
+            if metrics.slowest[0] > endpoint.slowest[0]:
+                endpoint.slowest = metrics.slowest
+
+    def render(self):
+        """The metrics in Prometheus text exposition format"""
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            pid = os.getpid()
+            lines = []
+
+            def family(name, kind, help_text, samples):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for suffix, labels, value in samples:
+                    label_text = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items())
+                    lines.append(f'{name}{suffix}{{{label_text}}} {value}')
+
+            def per_endpoint(attribute):
+                return [
+                    ('', {'pid': pid, 'method': method, 'route': route}, getattr(endpoint, attribute))
+                    for (method, route), endpoint in endpoints
+                ]
+
+            family('api_requests_total', 'counter', 'Requests handled, by status code.', [
+                ('', {'pid': pid, 'method': method, 'route': route, 'status': status}, count)
+                for (method, route), endpoint in endpoints
+                for status, count in sorted(endpoint.statuses.items())
+            ])
+            histogram = []
+            for (method, route), endpoint in endpoints:
+                labels = {'pid': pid, 'method': method, 'route': route}
+                for bound, count in zip(DURATION_BUCKETS, endpoint.buckets):
+                    histogram.append(('_bucket', dict(labels, le=bound), count))
+                histogram.append(('_bucket', dict(labels, le='+Inf'), endpoint.count))
+                histogram.append(('_sum', labels, round(endpoint.duration, 6)))
+                histogram.append(('_count', labels, endpoint.count))
+            family('api_request_duration_seconds', 'histogram', 'Time spent handling requests.', histogram)
+            family('api_sampled_requests_total', 'counter',
+                   'Requests sampled for the detailed metrics below.', per_endpoint('sampled'))
+            family('api_db_queries_total', 'counter', 'SQL queries run by sampled requests.', per_endpoint('queries'))
+            family('api_db_queries_max', 'gauge', 'Most SQL queries run by one sampled request.',
+                   per_endpoint('max_queries'))
+            family('api_db_repeated_queries_total', 'counter',
+                   'Queries of sampled requests whose SQL the same request had already run (N+1 suspects).',
+                   per_endpoint('repeated_queries'))
+            family('api_db_duration_seconds_total', 'counter', 'Time sampled requests spent in SQL queries.', [
+                (suffix, labels, round(value, 6)) for suffix, labels, value in per_endpoint('db_time')
+            ])
+            family('api_serialization_duration_seconds_total', 'counter',
+                   'Time sampled requests spent validating and rendering responses.', [
+                       (suffix, labels, round(value, 6)) for suffix, labels, value in per_endpoint('serialization')
+                   ])
+            family('api_response_size_bytes_total', 'counter', 'Size of the sampled responses, streamed ones excluded.',
+                   per_endpoint('response_bytes'))
+            family('api_db_slowest_query_seconds', 'gauge', 'Slowest SQL query seen in a sampled request.', [
+                ('', {'pid': pid, 'method': method, 'route': route, 'sql': endpoint.slowest[1][:SQL_LABEL_LENGTH]},
+                 round(endpoint.slowest[0], 6))
+                for (method, route), endpoint in endpoints if endpoint.slowest[1]
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def mark_view_done(view_func):
+    """Wrap a ninja handler to note when it returned, where serialization starts"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(*args, **kwargs):
+            result = await view_func(*args, **kwargs)
+            set_view_done()
+            return result
+    else:
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            result = view_func(*args, **kwargs)
+            set_view_done()
+            return result
+    wrapper.marks_view_done = True
+    return wrapper
+
+
+def set_view_done():
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.view_done = time.perf_counter()
+
+
+class InstrumentedNinjaAPI(NinjaAPI):
+    """NinjaAPI that reports the serialization time of its responses to ApiMetricsMiddleware"""
+
+    def _get_urls(self):
+        # Every operation is registered once the URLs are built
+        for _, router in self._routers:
+            for path_view in router.path_operations.values():
+                for operation in path_view.operations:
+                    if not getattr(operation.view_func, 'marks_view_done', False):
+                        operation.view_func = mark_view_done(operation.view_func)
+        return super()._get_urls()
+
+    def create_response(self, request, data, **kwargs):
+        response = super().create_response(request, data, **kwargs)
+        metrics = _current.get()
+        if metrics is not None and metrics.view_done is not None:
+            metrics.serialization += time.perf_counter() - metrics.view_done
+            metrics.view_done = None
+        return response
+
+
+class ApiMetricsMiddleware:
+    """Records per-endpoint metrics of the ninja APIs"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sample(self, request):
+        """Whether to collect the detailed metrics of a request, or None not to record it at all"""
+        if not request.path.startswith(tuple(settings.API_METRICS_PATHS)):
+            return None
+        return random.random() < settings.API_METRICS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        sampled = self.sample(request)
+        if sampled is None:
+            return self.get_response(request)
+        metrics = RequestMetrics() if sampled else None
+        if sampled:
+            watch_connections()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_response(request, response, time.perf_counter() - started, metrics)
+
+    async def __acall__(self, request):
+        sampled = self.sample(request)
+        if sampled is None:
+            return await self.get_response(request)
+        metrics = RequestMetrics() if sampled else None
+        if sampled:
+            # Connections are thread-local: watch those of the thread running this request's ORM calls
+            await sync_to_async(watch_connections)()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.process_response(request, response, time.perf_counter() - started, metrics)
+
+    def process_response(self, request, response, duration, metrics):
+        match = request.resolver_match
+        if match is None or match.app_name != 'ninja':
+            # Unknown URLs would give every path an endpoint of its own
+            return response
+
+        response_bytes = None if response.streaming else len(response.content)
+        registry.record(request.method, f'/{match.route}', response.status_code, duration, metrics, response_bytes)
+        if metrics is not None:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries, '
+                f'{metrics.repeated_queries} repeated"',
+                f'serialize;dur={metrics.serialization * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            ))
+        return response
+
+
+def api_metrics_view(request):
+    """Internal endpoint: per-endpoint API metrics in Prometheus text format"""
+    if not is_internal_request(request):
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -19,10 +19,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from accounts.api import api as accounts_api
+from backend.db_metrics import database_metrics_view
+from backend.instrumentation import api_metrics_view
 from transactions.api import api as transactions_api
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/v1/_internal/db/', database_metrics_view, name='database_metrics'),
+    path('api/v1/_metrics', api_metrics_view, name='api_metrics'),
     path('api/v1/', accounts_api.urls),
     path('api/v1/', transactions_api.urls),
 ]
@@ -0,0 +1,195 @@
+"""
+Compare API throughput served synchronously (WSGI) and asynchronously (ASGI).
+
+sync:  Django's WSGI handler called from a pool of --concurrency threads, like
+       a threaded gunicorn worker.
+async: Django's ASGI handler with --concurrency requests in flight on one
+       event loop, like a uvicorn worker.
+
+Requests go through the full middleware stack and URL routing but skip the
+network. Response caching is disabled unless --cache is given, so cached
+endpoints such as statistics run their queries every time. Runs against
+whatever data is in the configured database:
+
+    python manage.py create_sample_data
+    DATABASE_CONN_MAX_AGE=0 python -m benchmarks.async_api --requests 200 --concurrency 16
+
+Under ASGI every request runs its ORM calls in a thread of its own, so
+persistent connections are not reused; compare with DATABASE_CONN_MAX_AGE=0
+or DATABASE_POOL_MODE=pool.
+"""
+import argparse
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from statistics import quantiles
+
+
+ENDPOINTS = [
+    '/api/v1/transactions/?page_size=50',
+    '/api/v1/transactions/?pagination=cursor&page_size=50',
+    '/api/v1/transactions/statistics/',
+    '/api/v1/accounts/?page_size=50',
+    '/api/v1/accounts/statistics/',
+    '/api/v1/categories/',
+    '/api/v1/recurring-transactions/?page_size=50',
+]
+
+
+def setup_django(use_cache):
+    from benchmarks.serialization import setup_django as setup
+
+    setup()
+    from django.test.utils import override_settings
+
+    overrides = {'ALLOWED_HOSTS': ['*'], 'DEBUG': False}
+    if not use_cache:
+        overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    override_settings(**overrides).enable()
+
+
+def split(url):
+    path, _, query = url.partition('?')
+    return path, query
+
+
+def wsgi_get(app, url):
+    path, query = split(url)
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    result = app(environ, lambda status, headers, exc_info=None: statuses.append(int(status[:3])))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return statuses[0]
+
+
+async def asgi_get(app, url):
+    path, query = split(url)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    disconnected = asyncio.Event()
+    statuses = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The handler waits for a disconnect until the response is sent
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await app(scope, receive, send)
+    return statuses[0]
+
+
+def run_sync(url, requests, concurrency):
+    from django.core.wsgi import get_wsgi_application
+
+    app = get_wsgi_application()
+    tickets = count()
+    latencies = []
+
+    def worker():
+        while next(tickets) < requests:
+            started = time.perf_counter()
+            status = wsgi_get(app, url)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                raise RuntimeError(f'{url} returned {status}')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return time.perf_counter() - started, latencies
+
+
+def run_async(url, requests, concurrency):
+    from django.core.asgi import get_asgi_application
+
+    app = get_asgi_application()
+    tickets = count()
+    latencies = []
+
+    async def worker():
+        while next(tickets) < requests:
+            started = time.perf_counter()
+            status = await asgi_get(app, url)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                raise RuntimeError(f'{url} returned {status}')
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - started, latencies
+
+
+def p95(latencies):
+    return quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight (default: 16)')
+    parser.add_argument('--cache', action='store_true', help='Keep the configured response cache')
+    parser.add_argument('endpoints', nargs='*', default=ENDPOINTS, help='URLs to request (default: list and statistics endpoints)')
+    args = parser.parse_args()
+
+    setup_django(args.cache)
+
+    print(f'{args.requests} requests per endpoint, {args.concurrency} concurrent')
+    print(f"{'endpoint':<56}{'sync req/s':>12}{'p95 ms':>9}{'async req/s':>13}{'p95 ms':>9}{'speedup':>10}")
+    for url in args.endpoints:
+        # Warm up per-process caches (category tree, search index) first
+        run_sync(url, 1, 1)
+        sync_time, sync_latencies = run_sync(url, args.requests, args.concurrency)
+        async_time, async_latencies = run_async(url, args.requests, args.concurrency)
+        print(f'{url:<56}{args.requests / sync_time:>12,.0f}{p95(sync_latencies) * 1000:>9.1f}'
+              f'{args.requests / async_time:>13,.0f}{p95(async_latencies) * 1000:>9.1f}'
+              f'{sync_time / async_time:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Compare transaction list queries before and after the user and keyset indexes.
+
+For a matrix of list filters (owner, account, date range, type, verified
+status, payment method, amount range) runs the queries of a
+GET /api/v1/transactions/ page, the COUNT and the first page in list order:
+
+before: the index layout of migration 0006, with (account, date) in place of
+        the keyset indexes and the owner matched through the accounts join
+        (account__user_id). Set up inside a transaction that is rolled back.
+after:  the current schema, with the owner matched on Transaction.user_id.
+
+Runs against whatever data is in the configured database; the difference
+only shows with enough rows per user:
+
+    python manage.py create_sample_data --users 200 --transactions-per-account 2000
+    python -m benchmarks.indexes --repeat 20 --plans
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from statistics import median
+
+from benchmarks.serialization import setup_django
+
+
+# Indexes of migration 0007 on transactions_transaction, and the one it replaced
+NEW_INDEXES = (
+    'transaction_account_keyset_idx',
+    'transaction_user_keyset_idx',
+    'transaction_user_amount_idx',
+    'transaction_unverified_idx',
+)
+OLD_INDEX = ('transaction_account_4f6194_idx', ('account_id', 'date'))
+
+PAGE_SIZE = 20
+
+
+class Rollback(Exception):
+    """Raised to undo the 'before' index layout"""
+
+
+def get_filters():
+    """(label, filters) pairs picked from the data: the busiest user and account"""
+    from django.db.models import Count
+
+    from accounts.models import Account
+    from transactions.models import Transaction
+
+    busiest = Transaction.objects.order_by().values('account_id').annotate(rows=Count('id')).order_by('-rows').first()
+    if busiest is None:
+        raise SystemExit('No transactions; run python manage.py create_sample_data first')
+    account = Account.objects.get(pk=busiest['account_id'])
+    since = (date.today() - timedelta(days=90)).isoformat()
+    user = {'user_id': account.user_id}
+    return [
+        ('user', user),
+        ('user, last 90 days', dict(user, date_from=since)),
+        ('user, expenses, last 90 days', dict(user, transaction_type='EXPENSE', date_from=since)),
+        ('user, unverified', dict(user, is_verified=False)),
+        ('user, payment method', dict(user, payment_method='CREDIT_CARD')),
+        ('user, amount 100-500', dict(user, min_amount=100, max_amount=500)),
+        ('account', {'account_id': account.id}),
+        ('account, last 90 days', {'account_id': account.id, 'date_from': since}),
+        ('unverified', {'is_verified': False}),
+        ('no filter', {}),
+    ]
+
+
+def build_querysets(filters, legacy):
+    """The COUNT and first page querysets of the list endpoint for filters"""
+    from transactions.api import filter_transactions
+    from transactions.models import Transaction
+    from transactions.serializers import transaction_serializer
+
+    filters = dict(filters)
+    user_id = filters.pop('user_id', None)
+    queryset = filter_transactions(Transaction.objects.all(), **filters)
+    if user_id:
+        queryset = queryset.filter(account__user_id=user_id) if legacy else queryset.filter(user_id=user_id)
+    return queryset, transaction_serializer.values_list(queryset)[:PAGE_SIZE]
+
+
+def measure(filters, legacy, repeat):
+    """Median milliseconds of the COUNT and page queries, and the page query plan"""
+    counted, page = build_querysets(filters, legacy)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        counted.count()
+        list(page)
+        timings.append((time.perf_counter() - started) * 1000)
+    return median(timings), page
+
+
+def explain(queryset, analyze):
+    from django.db import connection
+
+    if analyze and connection.vendor == 'postgresql':
+        return queryset.explain(analyze=True, buffers=True)
+    return queryset.explain()
+
+
+def old_layout(connection):
+    """Drop the new indexes and restore (account, date), inside the current transaction"""
+    from transactions.models import Transaction
+
+    qn = connection.ops.quote_name
+    table = qn(Transaction._meta.db_table)
+    name, columns = OLD_INDEX
+    with connection.cursor() as cursor:
+        for index in NEW_INDEXES:
+            cursor.execute(f'DROP INDEX {qn(index)}')
+        cursor.execute(f"CREATE INDEX {qn(name)} ON {table} ({', '.join(qn(column) for column in columns)})")
+
+
+def run(filters, repeat, plans, analyze):
+    """{label: (before ms, after ms, before plan, after plan)}"""
+    from django.db import connection, transaction
+
+    results = {label: [] for label, _ in filters}
+    try:
+        with transaction.atomic():
+            old_layout(connection)
+            for label, params in filters:
+                elapsed, page = measure(params, True, repeat)
+                results[label] += [elapsed, explain(page, analyze) if plans else None]
+            raise Rollback
+    except Rollback:
+        pass
+
+    for label, params in filters:
+        elapsed, page = measure(params, False, repeat)
+        results[label] += [elapsed, explain(page, analyze) if plans else None]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10, help='Runs of every query pair (default: 10)')
+    parser.add_argument('--plans', action='store_true', help='Print the page query plans before and after')
+    parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE the plans (PostgreSQL)')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    filters = get_filters()
+    # Fill caches such as the category tree and warm the table before timing
+    for _, params in filters:
+        measure(params, False, 1)
+    results = run(filters, args.repeat, args.plans, args.analyze)
+
+    print(f'{connection.vendor}, page size {PAGE_SIZE}, median of {args.repeat} runs of COUNT + page')
+    print(f"{'filters':<34}{'before ms':>11}{'after ms':>10}{'speedup':>10}")
+    for label, (before, _, after, _) in results.items():
+        print(f'{label:<34}{before:>11.2f}{after:>10.2f}{before / after:>9.1f}x')
+
+    if args.plans:
+        for label, (_, before_plan, _, after_plan) in results.items():
+            print(f'\n== {label}\n-- before\n{before_plan}\n-- after\n{after_plan}')
+
+
+if __name__ == '__main__':
+    main()
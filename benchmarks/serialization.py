@@ -0,0 +1,151 @@
+"""
+Compare list endpoint serialization paths in rows/sec.
+
+legacy: model instances with select_related(), one Schema(...) per row, then
+        the response validation ninja performs when rendering.
+values: ValuesSerializer over .values_list(), plain dicts, validated once.
+
+Both paths end with the same response validation and JSON rendering, so the
+numbers include everything a list endpoint does after building the queryset.
+Runs against whatever data is in the configured database:
+
+    python manage.py create_sample_data
+    python -m benchmarks.serialization --rows 2000 --repeat 5
+"""
+import argparse
+import os
+import time
+from functools import lru_cache
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+
+def get_endpoints():
+    from accounts.models import Account, UserProfile
+    from accounts.schemas import AccountListResponse, AccountSchema, UserProfileListResponse, UserProfileSchema
+    from accounts.serializers import account_serializer, user_profile_serializer
+    from transactions.models import RecurringTransaction, Transaction
+    from transactions.schemas import (
+        RecurringTransactionListResponse, RecurringTransactionSchema,
+        TransactionListResponse, TransactionSchema,
+    )
+    from transactions.serializers import recurring_transaction_serializer, transaction_serializer
+
+    # (name, queryset, related, item schema, list response, list key, serializer)
+    return [
+        ('transactions', Transaction.objects.all(),
+         ['account', 'account__user', 'category', 'to_account', 'created_by'],
+         TransactionSchema, TransactionListResponse, 'transactions', transaction_serializer),
+        ('recurring-transactions', RecurringTransaction.objects.all(),
+         ['user', 'account', 'category'],
+         RecurringTransactionSchema, RecurringTransactionListResponse, 'recurring_transactions',
+         recurring_transaction_serializer),
+        ('accounts', Account.objects.all(), ['user'],
+         AccountSchema, AccountListResponse, 'accounts', account_serializer),
+        ('user-profiles', UserProfile.objects.all(), ['user'],
+         UserProfileSchema, UserProfileListResponse, 'profiles', user_profile_serializer),
+    ]
+
+
+def resolve(obj, lookup):
+    """Follow a values_list() lookup through instance attributes, like the legacy views did"""
+    *path, field = lookup.split('__')
+    for name in path:
+        obj = getattr(obj, name)
+        if obj is None:
+            return None
+    return getattr(obj, field)
+
+
+def legacy_items(queryset, related, schema, serializer):
+    items = []
+    for obj in queryset.select_related(*related):
+        values = {}
+        for name, index, transform in serializer.fields:
+            lookup = serializer.lookups[index]
+            if name.endswith('_display'):
+                values[name] = getattr(obj, f'get_{lookup}_display')()
+            elif name == 'tags_list':
+                values[name] = obj.get_tags_list()
+            elif name == 'category_name':
+                values[name] = resolve(obj, 'category__name')
+            else:
+                value = resolve(obj, lookup)
+                values[name] = transform(value) if transform else value
+        items.append(schema(**values))
+    return items
+
+
+def values_items(queryset, serializer):
+    return serializer.serialize(queryset)
+
+
+def list_payload(key, items):
+    return {key: items, 'total_count': len(items), 'page': 1, 'page_size': len(items), 'total_pages': 1}
+
+
+@lru_cache
+def response_wrapper(response_model):
+    """The model ninja wraps a view's response schema in"""
+    from ninja import Schema
+    from pydantic import create_model
+
+    return create_model('Response', __base__=Schema, response=(response_model, ...))
+
+
+def render(response_model, result):
+    """Validate and render a view's return value the way ninja does"""
+    from ninja.operation import ResponseObject
+    from ninja.renderers import JSONRenderer
+
+    validated = response_wrapper(response_model).model_validate(ResponseObject(result)).model_dump(by_alias=True)['response']
+    return JSONRenderer().render(None, validated, response_status=200)
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return rows, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000, help='Rows per endpoint (default: 1000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best one is reported (default: 5)')
+    args = parser.parse_args()
+
+    setup_django()
+
+    print(f"{'endpoint':<24}{'rows':>8}{'legacy rows/s':>16}{'values rows/s':>16}{'speedup':>10}")
+    for name, queryset, related, schema, response_model, key, serializer in get_endpoints():
+        queryset = queryset.order_by('pk')[:args.rows]
+
+        def legacy():
+            items = legacy_items(queryset, related, schema, serializer)
+            render(response_model, response_model(**list_payload(key, items)))
+            return len(items)
+
+        def values():
+            items = values_items(queryset, serializer)
+            render(response_model, list_payload(key, items))
+            return len(items)
+
+        rows, legacy_time = measure(legacy, args.repeat)
+        _, values_time = measure(values, args.repeat)
+        if not rows:
+            print(f'{name:<24}{0:>8}  (no data)')
+            continue
+        print(f'{name:<24}{rows:>8}{rows / legacy_time:>16,.0f}{rows / values_time:>16,.0f}'
+              f'{legacy_time / values_time:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
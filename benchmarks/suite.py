@@ -0,0 +1,424 @@
+"""
+Reproducible benchmark suite for every API endpoint.
+
+Creates a throwaway test database, seeds it with create_sample_data at a
+fixed size and seed, and drives each ninja endpoint in-process through
+Django's test client (or the async test client with --asgi). Scenarios cover
+list pages at several depths and filter combinations, detail pages,
+summaries, forecasts, statistics with a cold and a warm response cache,
+export, the near-duplicate report and the two write endpoints (run last, and
+idempotent after their first iteration).
+
+For each scenario it reports p50/p95/p99 latency, database queries per
+request and rows/sec, and can write the results as JSON. Comparing against
+an earlier results file flags scenarios whose p95 latency or query count
+grew, and exits with status 1 if any did:
+
+    python -m benchmarks.suite --size small --output baseline.json
+    python -m benchmarks.suite --size small --compare baseline.json
+
+The configured database only provides the server; the data lives in its
+test database (test_<NAME>), which is destroyed afterwards.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+
+# users, transactions per account (3 accounts per user), years of history
+SIZES = {
+    'small': (5, 200, 1),
+    'medium': (20, 1000, 2),
+    'large': (50, 5000, 3),
+}
+
+PAGE_SIZE = 50
+
+# Keys of the row lists in list responses
+LIST_KEYS = (
+    'transactions', 'accounts', 'profiles', 'budgets', 'categories',
+    'recurring_transactions', 'pairs', 'points'
+)
+
+Scenario = namedtuple('Scenario', ['name', 'group', 'method', 'path', 'params', 'setup'], defaults=[None, None])
+
+
+def setup_django():
+    from benchmarks.serialization import setup_django as setup
+
+    setup()
+
+
+def seed(size, seed_value, workers):
+    """Fill the test database with sample data of the given size"""
+    from django.core.management import call_command
+
+    users, per_account, years = size
+    call_command(
+        'create_sample_data',
+        users=users,
+        transactions_per_account=per_account,
+        years=years,
+        seed=seed_value,
+        workers=workers,
+        stdout=io.StringIO()
+    )
+    seed_recurring()
+
+
+def seed_recurring():
+    """Give every checking account a salary and a rent schedule, for the forecast and recurring endpoints"""
+    from decimal import Decimal
+
+    from accounts.models import Account
+    from transactions.models import RecurringTransaction
+
+    start = date.today().replace(day=1)
+    schedules = []
+    for account in Account.objects.filter(account_type='CHECKING'):
+        for title, transaction_type, amount in (('Salary', 'INCOME', '4500.00'), ('Rent', 'EXPENSE', '1600.00')):
+            schedules.append(RecurringTransaction(
+                user_id=account.user_id,
+                account=account,
+                transaction_type=transaction_type,
+                amount=Decimal(amount),
+                title=title,
+                frequency='MONTHLY',
+                start_date=start,
+                next_due_date=start
+            ))
+    RecurringTransaction.objects.bulk_create(schedules)
+
+
+def cursor_at(queryset, offset):
+    """Cursor token of the page starting after the row at offset, in keyset order"""
+    from transactions.pagination import KEYSET_ORDERING, encode_cursor
+
+    key = queryset.order_by(*KEYSET_ORDERING).values_list('date', 'time', 'id')[offset:offset + 1].first()
+    return encode_cursor(key, 'next') if key else None
+
+
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+def get_scenarios():
+    """Build the scenarios from the ids and sizes of the seeded data"""
+    from accounts.models import Account, Budget, UserProfile
+    from transactions.models import Category, RecurringTransaction, Transaction
+
+    account = Account.objects.filter(account_type='CHECKING').order_by('id').first()
+    transaction = Transaction.objects.filter(account=account).order_by('id').first()
+    parent = Category.objects.filter(subcategories__isnull=False).order_by('id').first()
+    profile = UserProfile.objects.order_by('id').first()
+    budget = Budget.objects.order_by('id').first()
+    recurring = RecurringTransaction.objects.order_by('id').first()
+    transaction_count = Transaction.objects.count()
+    last_page = max((transaction_count + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    today = date.today()
+
+    page = {'page_size': PAGE_SIZE}
+    scenarios = [
+        # Transaction list: depth
+        Scenario('transactions page 1', 'list', 'get', '/api/v1/transactions/', dict(page, page=1)),
+        Scenario('transactions page middle', 'list', 'get', '/api/v1/transactions/',
+                 dict(page, page=max(last_page // 2, 1))),
+        Scenario('transactions page last', 'list', 'get', '/api/v1/transactions/', dict(page, page=last_page)),
+        Scenario('transactions cursor first', 'list', 'get', '/api/v1/transactions/', dict(page, pagination='cursor')),
+        Scenario('transactions cursor middle', 'list', 'get', '/api/v1/transactions/',
+                 dict(page, cursor=cursor_at(Transaction.objects.all(), transaction_count // 2))),
+        Scenario('transactions cursor last', 'list', 'get', '/api/v1/transactions/',
+                 dict(page, cursor=cursor_at(Transaction.objects.all(), max(transaction_count - PAGE_SIZE - 1, 0)))),
+        # Transaction list: filters
+        Scenario('transactions by type', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, transaction_type='EXPENSE')),
+        Scenario('transactions by account', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, account_id=account.id)),
+        Scenario('transactions by user', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, user_id=account.user_id)),
+        Scenario('transactions by category tree', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, category_id=parent.id, include_descendants='true')),
+        Scenario('transactions by date range', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, date_from=(today - timedelta(days=30)).isoformat(), date_to=today.isoformat())),
+        Scenario('transactions by amount range', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, min_amount=20, max_amount=100)),
+        Scenario('transactions combined filters', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, account_id=account.id, transaction_type='EXPENSE', min_amount=10,
+                      date_from=(today - timedelta(days=90)).isoformat())),
+        Scenario('transactions combined filters cursor', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, account_id=account.id, transaction_type='EXPENSE', pagination='cursor',
+                      include_total='true')),
+        Scenario('transactions search contains', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, search='foods')),
+        Scenario('transactions search fulltext', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, search='whole foods', search_mode='fulltext')),
+        Scenario('transactions search prefix', 'filter', 'get', '/api/v1/transactions/',
+                 dict(page, search='star', search_mode='prefix')),
+        # Other lists
+        Scenario('accounts list', 'list', 'get', '/api/v1/accounts/', dict(page)),
+        Scenario('accounts list filtered', 'filter', 'get', '/api/v1/accounts/',
+                 dict(page, account_type='CHECKING', is_active='true')),
+        Scenario('user profiles list', 'list', 'get', '/api/v1/user-profiles/', dict(page)),
+        Scenario('budgets list', 'list', 'get', '/api/v1/budgets/', dict(page)),
+        Scenario('categories list', 'list', 'get', '/api/v1/categories/', dict(page)),
+        Scenario('categories roots', 'filter', 'get', '/api/v1/categories/', dict(page, parent_id=0)),
+        Scenario('recurring transactions list', 'list', 'get', '/api/v1/recurring-transactions/', dict(page)),
+        # Details
+        Scenario('account detail', 'detail', 'get', f'/api/v1/accounts/{account.id}/'),
+        Scenario('user profile detail', 'detail', 'get', f'/api/v1/user-profiles/{profile.id}/'),
+        Scenario('budget detail', 'detail', 'get', f'/api/v1/budgets/{budget.id}/'),
+        Scenario('category detail', 'detail', 'get', f'/api/v1/categories/{parent.id}/'),
+        Scenario('transaction detail', 'detail', 'get', f'/api/v1/transactions/{transaction.id}/'),
+        Scenario('recurring transaction detail', 'detail', 'get', f'/api/v1/recurring-transactions/{recurring.id}/'),
+        # Summaries and forecasts
+        Scenario('account summary', 'summary', 'get', f'/api/v1/accounts/{account.id}/summary/'),
+        Scenario('transaction summary', 'summary', 'get', f'/api/v1/transactions/{transaction.id}/summary/'),
+        Scenario('account forecast monthly', 'summary', 'get', f'/api/v1/accounts/{account.id}/forecast/',
+                 {'months': 12}),
+        Scenario('account forecast daily', 'summary', 'get', f'/api/v1/accounts/{account.id}/forecast/',
+                 {'months': 3, 'granularity': 'daily'}),
+        # Statistics, recomputed and from the response cache
+        Scenario('transaction statistics cold', 'statistics', 'get', '/api/v1/transactions/statistics/',
+                 setup=clear_cache),
+        Scenario('transaction statistics warm', 'statistics', 'get', '/api/v1/transactions/statistics/'),
+        Scenario('account statistics cold', 'statistics', 'get', '/api/v1/accounts/statistics/', setup=clear_cache),
+        Scenario('account statistics warm', 'statistics', 'get', '/api/v1/accounts/statistics/'),
+        # Reports
+        Scenario('export ndjson account', 'export', 'get', '/api/v1/transactions/export/',
+                 {'account_id': account.id}),
+        Scenario('export csv expenses', 'export', 'get', '/api/v1/transactions/export/',
+                 {'format': 'csv', 'transaction_type': 'EXPENSE', 'date_from': (today - timedelta(days=90)).isoformat()}),
+        Scenario('near duplicates account', 'report', 'get', '/api/v1/transactions/duplicates/',
+                 {'account_id': account.id}),
+    ]
+
+    # Writes come last so the reads above see the seeded data only. The
+    # same rows are sent every time: later iterations find them all duplicate.
+    rows = [
+        {
+            'account_id': account.id,
+            'transaction_type': 'EXPENSE',
+            'amount': f'{10 + index % 50}.25',
+            'title': f'Benchmark purchase {index}',
+            'merchant': 'Benchmark Store',
+            'date': (today - timedelta(days=index % 28)).isoformat(),
+        }
+        for index in range(200)
+    ]
+    statement = 'Date,Description,Amount\n' + ''.join(
+        f"{(today - timedelta(days=index % 28)).isoformat()},Statement line {index},-{5 + index % 40}.10\n"
+        for index in range(200)
+    )
+    scenarios += [
+        Scenario('bulk ingest 200 rows', 'write', 'post', '/api/v1/transactions/bulk/',
+                 {'transactions': rows, 'on_duplicate': 'skip'}),
+        Scenario('statement import 200 rows', 'write', 'post', '/api/v1/transactions/import/',
+                 {'account_id': account.id, 'format': 'csv', 'file': statement}),
+    ]
+    return scenarios
+
+
+class Driver:
+    """Sends scenario requests through the sync or async test client"""
+
+    def __init__(self, use_asgi):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient, Client
+
+        self.use_asgi = use_asgi
+        if use_asgi:
+            client = AsyncClient()
+            self.get = async_to_sync(client.get)
+            self.post = async_to_sync(client.post)
+        else:
+            client = Client()
+            self.get = client.get
+            self.post = client.post
+
+    def request(self, scenario):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        if scenario.method == 'get':
+            params = {key: value for key, value in (scenario.params or {}).items() if value is not None}
+            return self.get(scenario.path, params)
+        params = dict(scenario.params)
+        if 'file' in params:
+            params['file'] = SimpleUploadedFile('statement.csv', params['file'].encode(), 'text/csv')
+            return self.post(scenario.path, params)
+        return self.post(scenario.path, json.dumps(params), content_type='application/json')
+
+
+def read_response(response):
+    """Return the number of rows in a response, consuming streamed content"""
+    if response.streaming:
+        lines = b''.join(response.streaming_content).count(b'\n')
+        return lines - 1 if response['Content-Type'].startswith('text/csv') else lines
+    data = response.json()
+    if isinstance(data, dict):
+        for key in LIST_KEYS:
+            if isinstance(data.get(key), list):
+                return len(data[key])
+        if 'row_count' in data:
+            return data['row_count']
+        if 'created_count' in data:
+            return data['created_count'] + data['duplicate_count']
+    return 1
+
+
+def run_scenario(driver, scenario, iterations, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencies, queries, rows = [], [], 0
+    for iteration in range(warmup + iterations):
+        if scenario.setup:
+            scenario.setup()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = driver.request(scenario)
+            count = read_response(response) if response.status_code < 400 else 0
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{scenario.name}: {scenario.path} returned {response.status_code}: {response.content[:500]!r}'
+            )
+        if iteration >= warmup:
+            latencies.append(elapsed)
+            queries.append(len(captured))
+            rows += count
+
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'name': scenario.name,
+        'group': scenario.group,
+        'method': scenario.method.upper(),
+        'path': scenario.path,
+        'params': {key: value for key, value in (scenario.params or {}).items() if key not in ('transactions', 'file')},
+        'iterations': iterations,
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'queries': statistics.median_low(queries),
+        'max_queries': max(queries),
+        'rows_per_request': rows / iterations,
+        'rows_per_sec': round(rows / sum(latencies), 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change against a baseline run; return the names of regressed scenarios"""
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('started_at', 'baseline')} (threshold {threshold:.0%})")
+    print(f"{'scenario':<40}{'p95 ms':>10}{'change':>9}{'queries':>9}{'before':>8}  status")
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None:
+            print(f"{result['name']:<40}{result['p95_ms']:>10.1f}{'':>9}{result['queries']:>9}{'':>8}  new")
+            continue
+        change = result['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0.0
+        regressed = change > threshold or result['queries'] > before['queries']
+        if regressed:
+            regressions.append(result['name'])
+        print(f"{result['name']:<40}{result['p95_ms']:>10.1f}{change:>+9.0%}{result['queries']:>9}"
+              f"{before['queries']:>8}  {'REGRESSION' if regressed else 'ok'}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', choices=SIZES, default='small', help='Dataset size (default: small)')
+    parser.add_argument('--seed', type=int, default=42, help='Sample data seed (default: 42)')
+    parser.add_argument('--workers', type=int, default=1, help='Processes seeding transactions (default: 1)')
+    parser.add_argument('--iterations', type=int, default=20, help='Measured requests per scenario (default: 20)')
+    parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per scenario first (default: 2)')
+    parser.add_argument('--asgi', action='store_true', help='Use the async test client')
+    parser.add_argument('--group', action='append', help='Only run scenarios of this group (repeatable)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='p95 increase counted as a regression, as a fraction (default: 0.2)')
+    args = parser.parse_args()
+    if args.iterations < 1 or args.warmup < 0:
+        parser.error('--iterations must be positive and --warmup not negative')
+
+    setup_django()
+    import django
+    from django.db import connection
+    from django.test.utils import (
+        override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+    )
+
+    setup_test_environment()
+    # A process-local cache, so a shared cache backend is left alone
+    cache_override = override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}}
+    )
+    cache_override.enable()
+    databases = setup_databases(verbosity=0, interactive=False)
+    try:
+        started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        seeding = time.perf_counter()
+        seed(SIZES[args.size], args.seed, args.workers)
+        seeding = time.perf_counter() - seeding
+
+        from transactions.models import Transaction
+        meta = {
+            'started_at': started_at,
+            'size': args.size,
+            'seed': args.seed,
+            'transactions': Transaction.objects.count(),
+            'seed_seconds': round(seeding, 1),
+            'client': 'asgi' if args.asgi else 'wsgi',
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+        print(f"{meta['transactions']:,} transactions ({args.size}, seeded in {meta['seed_seconds']}s), "
+              f"{meta['client']} client, {args.iterations} iterations")
+
+        scenarios = [
+            scenario for scenario in get_scenarios() if not args.group or scenario.group in args.group
+        ]
+        driver = Driver(args.asgi)
+        print(f"{'scenario':<40}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'rows/s':>12}")
+        results = []
+        for scenario in scenarios:
+            result = run_scenario(driver, scenario, args.iterations, args.warmup)
+            results.append(result)
+            print(f"{result['name']:<40}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                  f"{result['queries']:>9}{result['rows_per_sec']:>12,.0f}")
+    finally:
+        teardown_databases(databases, verbosity=0)
+        cache_override.disable()
+        teardown_test_environment()
+
+    report = {'meta': meta, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        for key in ('size', 'client', 'database'):
+            if baseline['meta'].get(key) != meta[key]:
+                print(f"\nWarning: baseline was run with {key} {baseline['meta'].get(key)}, this run with {meta[key]}")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
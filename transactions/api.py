@@ -1,24 +1,44 @@
-from ninja import NinjaAPI, Query
-from django.shortcuts import get_object_or_404
+import io
+
+from asgiref.sync import sync_to_async
+from ninja import Query, File, Form, UploadedFile
+from ninja.errors import HttpError
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
 from django.db.models import Q, Sum, Count
-from django.core.paginator import Paginator
 from typing import Optional
 from math import ceil
-from decimal import Decimal
 
+from accounts.models import Account
+from backend.cache import cached_response
+from backend.instrumentation import InstrumentedNinjaAPI
+from backend.serialization import afetch
+from .category_tree import get_category_tree
+from .closure import descendant_ids
 from .models import Transaction, Category, RecurringTransaction
+from .pagination import apaginate, apaginate_by_cursor, InvalidCursor
+from . import archive
+from .ingest import ingest_transactions, IngestError
+from .export import aiter_csv, aiter_ndjson, iter_csv, iter_ndjson
+from .dedupe import find_near_duplicates
+from .search import search_transactions
+from .statements import import_statement, StatementError
+from .serializers import transaction_serializer, recurring_transaction_serializer
 from .schemas import (
     TransactionSchema, CategorySchema, RecurringTransactionSchema,
     TransactionListResponse, CategoryListResponse, RecurringTransactionListResponse,
-    TransactionSummarySchema
+    TransactionSummarySchema, TransactionBulkIngestRequest, TransactionBulkIngestResponse,
+    TransactionBulkIngestErrorResponse, StatementImportResponse, NearDuplicateReportResponse
 )
 
 
 # Create API instance
-api = NinjaAPI(
+api = InstrumentedNinjaAPI(
     title="Transactions API",
     description="Read-only API for transactions, categories, and recurring transactions",
-    version="1.0.0"
+    version="1.0.0",
+    urls_namespace="transactions_api"
 )
 
 
@@ -32,18 +52,77 @@ def get_account_name(account):
     return account.account_name if account else None
 
 
-def get_category_name(category):
-    """Helper function to get category name from category object"""
-    return category.name if category else None
+def get_archived_transaction(transaction_id):
+    """Serialized archived transaction, for ids no longer in the database; raises Http404 if not archived"""
+    record = archive.get_archived(transaction_id)
+    if record is None:
+        raise Http404("No Transaction matches the given query.")
+    return transaction_serializer.serialize_rows(archive.values_rows([record], transaction_serializer.lookups))[0]
 
 
-def get_parent_category_name(category):
-    """Helper function to get parent category name from category object"""
-    return category.parent.name if category and category.parent else None
+def filter_transactions(
+    queryset,
+    transaction_type=None,
+    account_id=None,
+    category_id=None,
+    include_descendants=False,
+    payment_method=None,
+    is_recurring=None,
+    is_verified=None,
+    date_from=None,
+    date_to=None,
+    min_amount=None,
+    max_amount=None,
+    search=None,
+    search_mode='contains',
+    user_id=None
+):
+    """Apply the transaction list filters shared by the list and export endpoints"""
+    if transaction_type:
+        queryset = queryset.filter(transaction_type=transaction_type)
+    
+    if account_id:
+        queryset = queryset.filter(account_id=account_id)
+    
+    if category_id:
+        if include_descendants:
+            # One indexed IN over the category closure table
+            queryset = queryset.filter(category_id__in=descendant_ids(category_id))
+        else:
+            queryset = queryset.filter(category_id=category_id)
+    
+    if payment_method:
+        queryset = queryset.filter(payment_method=payment_method)
+    
+    if is_recurring is not None:
+        queryset = queryset.filter(is_recurring=is_recurring)
+    
+    if is_verified is not None:
+        queryset = queryset.filter(is_verified=is_verified)
+    
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    
+    if min_amount is not None:
+        queryset = queryset.filter(amount__gte=min_amount)
+    
+    if max_amount is not None:
+        queryset = queryset.filter(amount__lte=max_amount)
+    
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+    
+    if search:
+        queryset = search_transactions(queryset, search, search_mode)
+    
+    return queryset
 
 
 @api.get("/categories/", response=CategoryListResponse)
-def list_categories(
+async def list_categories(
     request,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
@@ -55,7 +134,7 @@ def list_categories(
     """
     List all categories with optional filtering and pagination.
     """
-    queryset = Category.objects.select_related('parent').all()
+    queryset = Category.objects.all()
     
     # Apply filters
     if category_type:
@@ -78,13 +157,14 @@ def list_categories(
         )
     
     # Pagination
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
+    page_obj, total_count = await apaginate(queryset, page, page_size)
     
-    # Convert to schema
+    # Convert to dicts; they are validated once by the response schema.
+    # Parent names and full paths come from the category tree cache.
+    tree = await sync_to_async(get_category_tree)()
     categories = []
     for category in page_obj:
-        categories.append(CategorySchema(
+        categories.append(dict(
             id=category.id,
             name=category.name,
             category_type=category.category_type,
@@ -94,27 +174,28 @@ def list_categories(
             description=category.description,
             is_active=category.is_active,
             parent_id=category.parent_id,
-            parent_name=get_parent_category_name(category),
-            full_path=category.get_full_path(),
+            parent_name=tree.name(category.parent_id),
+            full_path=tree.full_path(category.id),
             created_at=category.created_at,
             updated_at=category.updated_at
         ))
     
-    return CategoryListResponse(
-        categories=categories,
-        total_count=paginator.count,
-        page=page,
-        page_size=page_size,
-        total_pages=ceil(paginator.count / page_size)
-    )
+    return {
+        "categories": categories,
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": ceil(total_count / page_size)
+    }
 
 
 @api.get("/categories/{category_id}/", response=CategorySchema)
-def get_category(request, category_id: int):
+async def get_category(request, category_id: int):
     """
     Get a specific category by ID.
     """
-    category = get_object_or_404(Category.objects.select_related('parent'), id=category_id)
+    category = await aget_object_or_404(Category, id=category_id)
+    tree = await sync_to_async(get_category_tree)()
     
     return CategorySchema(
         id=category.id,
@@ -126,21 +207,22 @@ def get_category(request, category_id: int):
         description=category.description,
         is_active=category.is_active,
         parent_id=category.parent_id,
-        parent_name=get_parent_category_name(category),
-        full_path=category.get_full_path(),
+        parent_name=tree.name(category.parent_id),
+        full_path=tree.full_path(category.id),
         created_at=category.created_at,
         updated_at=category.updated_at
     )
 
 
 @api.get("/transactions/", response=TransactionListResponse)
-def list_transactions(
+async def list_transactions(
     request,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     transaction_type: Optional[str] = Query(None, description="Filter by transaction type"),
     account_id: Optional[int] = Query(None, description="Filter by account ID"),
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    include_descendants: bool = Query(False, description="Also match subcategories of category_id"),
     payment_method: Optional[str] = Query(None, description="Filter by payment method"),
     is_recurring: Optional[bool] = Query(None, description="Filter by recurring status"),
     is_verified: Optional[bool] = Query(None, description="Filter by verified status"),
@@ -149,114 +231,258 @@ def list_transactions(
     min_amount: Optional[float] = Query(None, description="Filter by minimum amount"),
     max_amount: Optional[float] = Query(None, description="Filter by maximum amount"),
     search: Optional[str] = Query(None, description="Search in title, description, and merchant"),
-    user_id: Optional[int] = Query(None, description="Filter by user ID")
+    search_mode: str = Query(
+        "contains", pattern="^(contains|fulltext|prefix)$",
+        description="'contains' (substring), 'fulltext' (ranked word match) or 'prefix' (ranked word-prefix match)"
+    ),
+    user_id: Optional[int] = Query(None, description="Filter by user ID"),
+    pagination: str = Query("page", pattern="^(page|cursor)$", description="Pagination mode: 'page' or 'cursor'"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor token from next_cursor/prev_cursor (implies cursor mode)"),
+    include_total: bool = Query(False, description="Also compute total_count in cursor mode")
 ):
     """
     List all transactions with optional filtering and pagination.
+
+    Page mode (default) uses page/page_size and always returns total_count.
+    Cursor mode uses keyset pagination on (-date, -time, id): every page costs
+    the same regardless of depth and the COUNT query is skipped unless
+    include_total is set.
+
+    Archived transactions are merged in when the date range reaches the
+    archived dates (see transactions.archive).
     """
-    queryset = Transaction.objects.select_related(
-        'account', 'account__user', 'category', 'to_account', 'created_by'
-    ).all()
-    
-    # Apply filters
-    if transaction_type:
-        queryset = queryset.filter(transaction_type=transaction_type)
-    
-    if account_id:
-        queryset = queryset.filter(account_id=account_id)
-    
-    if category_id:
-        queryset = queryset.filter(category_id=category_id)
-    
-    if payment_method:
-        queryset = queryset.filter(payment_method=payment_method)
-    
-    if is_recurring is not None:
-        queryset = queryset.filter(is_recurring=is_recurring)
+    filters = dict(
+        transaction_type=transaction_type,
+        account_id=account_id,
+        category_id=category_id,
+        include_descendants=include_descendants,
+        payment_method=payment_method,
+        is_recurring=is_recurring,
+        is_verified=is_verified,
+        date_from=date_from,
+        date_to=date_to,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        search=search,
+        search_mode=search_mode,
+        user_id=user_id
+    )
+    # Search may look up the in-process index, which loads from the database
+    queryset = await sync_to_async(filter_transactions)(Transaction.objects.all(), **filters)
     
-    if is_verified is not None:
-        queryset = queryset.filter(is_verified=is_verified)
+    # Old transactions may have been moved to archive segments (see transactions.archive)
+    boundary = await sync_to_async(archive.archive_boundary)(date_from, account_id)
+    archived = archive.ArchivedRows(boundary, transaction_serializer.lookups, filters) if boundary else None
     
-    if date_from:
-        queryset = queryset.filter(date__gte=date_from)
-    
-    if date_to:
-        queryset = queryset.filter(date__lte=date_to)
+    # Pagination
+    rows = transaction_serializer.values_list(queryset)
+    row_key = transaction_serializer.key('date', 'time', 'id')
+    if pagination == 'cursor' or cursor:
+        try:
+            if archived:
+                rows, next_cursor, prev_cursor = await archive.apaginate_by_cursor_with_archive(
+                    rows, archived, page_size, cursor, row_key
+                )
+            else:
+                rows, next_cursor, prev_cursor = await apaginate_by_cursor(rows, page_size, cursor, row_key=row_key)
+        except InvalidCursor:
+            raise HttpError(400, "Invalid cursor")
+        total_count = None
+        if include_total:
+            total_count = await queryset.acount() + (await archived.acount() if archived else 0)
+        page = None
+    elif archived:
+        # Ranked search orders live rows by relevance; archived matches follow them
+        rows, total_count = await archive.apaginate_with_archive(
+            rows, archived, page, page_size, row_key, interleave=not search or search_mode == 'contains'
+        )
+        next_cursor = prev_cursor = None
+    else:
+        rows, total_count = await apaginate(rows, page, page_size)
+        next_cursor = prev_cursor = None
     
-    if min_amount is not None:
-        queryset = queryset.filter(amount__gte=min_amount)
+    # Plain dicts are validated once by the response schema
+    return {
+        "transactions": await transaction_serializer.aserialize_rows(rows),
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": ceil(total_count / page_size) if total_count is not None else None,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor
+    }
+
+
+@api.get("/transactions/export/")
+def export_transactions(
+    request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Export format: 'ndjson' or 'csv'"),
+    chunk_size: int = Query(2000, ge=100, le=10000, description="Rows fetched from the database per round trip"),
+    transaction_type: Optional[str] = Query(None, description="Filter by transaction type"),
+    account_id: Optional[int] = Query(None, description="Filter by account ID"),
+    category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    include_descendants: bool = Query(False, description="Also match subcategories of category_id"),
+    payment_method: Optional[str] = Query(None, description="Filter by payment method"),
+    is_recurring: Optional[bool] = Query(None, description="Filter by recurring status"),
+    is_verified: Optional[bool] = Query(None, description="Filter by verified status"),
+    date_from: Optional[str] = Query(None, description="Filter transactions from date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Filter transactions to date (YYYY-MM-DD)"),
+    min_amount: Optional[float] = Query(None, description="Filter by minimum amount"),
+    max_amount: Optional[float] = Query(None, description="Filter by maximum amount"),
+    search: Optional[str] = Query(None, description="Search in title, description, and merchant"),
+    search_mode: str = Query(
+        "contains", pattern="^(contains|fulltext|prefix)$",
+        description="'contains' (substring), 'fulltext' (ranked word match) or 'prefix' (ranked word-prefix match)"
+    ),
+    user_id: Optional[int] = Query(None, description="Filter by user ID")
+):
+    """
+    Stream all matching transactions as NDJSON or CSV.
+
+    Accepts the same filters as the transaction list. Rows are read from a
+    server-side cursor and written one at a time, so memory use does not
+    depend on the size of the export. Under ASGI the content is an async
+    generator over the async ORM: Django would read a sync iterator into
+    memory in full before sending it.
+    """
+    queryset = filter_transactions(
+        Transaction.objects.all(),
+        transaction_type=transaction_type,
+        account_id=account_id,
+        category_id=category_id,
+        include_descendants=include_descendants,
+        payment_method=payment_method,
+        is_recurring=is_recurring,
+        is_verified=is_verified,
+        date_from=date_from,
+        date_to=date_to,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        search=search,
+        search_mode=search_mode,
+        user_id=user_id
+    )
     
-    if max_amount is not None:
-        queryset = queryset.filter(amount__lte=max_amount)
+    served_async = isinstance(request, ASGIRequest)
+    if format == 'csv':
+        content = (aiter_csv if served_async else iter_csv)(queryset, chunk_size)
+        response = StreamingHttpResponse(content, content_type='text/csv')
+    else:
+        content = (aiter_ndjson if served_async else iter_ndjson)(queryset, chunk_size)
+        response = StreamingHttpResponse(content, content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="transactions.{format}"'
+    return response
+
+
+@api.post(
+    "/transactions/bulk/",
+    response={201: TransactionBulkIngestResponse, 422: TransactionBulkIngestErrorResponse}
+)
+def bulk_ingest_transactions(request, payload: TransactionBulkIngestRequest):
+    """
+    Create many transactions at once.
+
+    Rows are validated as a batch, inserted with bulk_create and account
+    balances are updated with one aggregated change per account. If any row
+    is invalid nothing is written and the row errors are returned. Rows that
+    were ingested before are rejected, skipped or merged per on_duplicate.
+    """
+    # Only the fields the client sent, so a merge leaves the others as stored
+    rows = [row.dict(exclude_unset=True) for row in payload.transactions]
+    created_by = request.user if request.user.is_authenticated else None
     
-    if user_id:
-        queryset = queryset.filter(account__user_id=user_id)
+    try:
+        result = ingest_transactions(rows, created_by=created_by, on_duplicate=payload.on_duplicate)
+    except IngestError as exc:
+        return 422, {"detail": str(exc), "errors": exc.errors}
     
-    if search:
-        queryset = queryset.filter(
-            Q(title__icontains=search) | 
-            Q(description__icontains=search) |
-            Q(merchant__icontains=search)
+    return 201, result
+
+
+@api.post(
+    "/transactions/import/",
+    response={201: StatementImportResponse, 422: TransactionBulkIngestErrorResponse}
+)
+def import_statement_file(
+    request,
+    file: UploadedFile = File(...),
+    account_id: int = Form(...),
+    format: Optional[str] = Form(None, pattern="^(csv|ofx)$"),
+    date_format: Optional[str] = Form(None)
+):
+    """
+    Import a CSV or OFX bank statement into an account.
+
+    Transactions the account already holds are skipped, so overlapping
+    statements can be uploaded again. If any row is invalid nothing is
+    written and the row errors are returned. The response reports the
+    measured import throughput.
+    """
+    account = get_object_or_404(Account, id=account_id)
+    file_format = format or ('ofx' if file.name.lower().endswith(('.ofx', '.qfx')) else 'csv')
+    created_by = request.user if request.user.is_authenticated else None
+
+    handle = io.TextIOWrapper(file.file, encoding='utf-8-sig', newline='')
+    try:
+        result = import_statement(
+            handle, account, file_format=file_format, date_format=date_format, created_by=created_by
         )
-    
-    # Pagination
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
-    
-    # Convert to schema
-    transactions = []
-    for transaction in page_obj:
-        transactions.append(TransactionSchema(
-            id=transaction.id,
-            account_id=transaction.account_id,
-            account_name=get_account_name(transaction.account),
-            username=get_username(transaction.account.user),
-            transaction_type=transaction.transaction_type,
-            transaction_type_display=transaction.get_transaction_type_display(),
-            category_id=transaction.category_id,
-            category_name=get_category_name(transaction.category),
-            amount=transaction.amount,
-            title=transaction.title,
-            description=transaction.description,
-            date=transaction.date,
-            time=transaction.time,
-            payment_method=transaction.payment_method,
-            payment_method_display=transaction.get_payment_method_display(),
-            to_account_id=transaction.to_account_id,
-            to_account_name=get_account_name(transaction.to_account),
-            merchant=transaction.merchant,
-            location=transaction.location,
-            tags=transaction.tags,
-            tags_list=transaction.get_tags_list(),
-            receipt_image=str(transaction.receipt_image) if transaction.receipt_image else None,
-            is_recurring=transaction.is_recurring,
-            is_verified=transaction.is_verified,
-            created_at=transaction.created_at,
-            updated_at=transaction.updated_at,
-            created_by_id=transaction.created_by_id,
-            created_by_username=get_username(transaction.created_by)
-        ))
-    
-    return TransactionListResponse(
-        transactions=transactions,
-        total_count=paginator.count,
-        page=page,
-        page_size=page_size,
-        total_pages=ceil(paginator.count / page_size)
+    except StatementError as exc:
+        raise HttpError(400, str(exc))
+    except IngestError as exc:
+        return 422, {"detail": str(exc), "errors": exc.errors}
+    except UnicodeDecodeError:
+        raise HttpError(400, "Statement files must be UTF-8 encoded")
+    finally:
+        handle.detach()
+
+    return 201, result
+
+
+@api.get("/transactions/duplicates/", response=NearDuplicateReportResponse)
+def list_near_duplicates(
+    request,
+    account_id: Optional[int] = Query(None, description="Filter by account ID"),
+    user_id: Optional[int] = Query(None, description="Filter by user ID (account owner)"),
+    date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
+    days: int = Query(3, ge=0, le=31, description="Maximum number of days between the two transactions"),
+    min_similarity: float = Query(0.6, ge=0, le=1, description="Minimum merchant/title similarity (0-1)"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum number of pairs")
+):
+    """
+    List suspected duplicate transactions for review.
+
+    Pairs transactions of the same account, type and amount dated close
+    together with similar merchant and title, e.g. a manual entry and the
+    imported bank line for the same payment. Newest first.
+    """
+    queryset = filter_transactions(
+        Transaction.objects.all(),
+        account_id=account_id,
+        date_from=date_from,
+        date_to=date_to,
+        user_id=user_id
     )
+    pairs = find_near_duplicates(queryset, days=days, min_similarity=min_similarity, limit=limit)
+    return {"count": len(pairs), "pairs": pairs}
 
 
-@api.get("/transactions/{transaction_id}/", response=TransactionSchema)
-def get_transaction(request, transaction_id: int):
+@api.get("/transactions/{int:transaction_id}/", response=TransactionSchema)
+async def get_transaction(request, transaction_id: int):
     """
     Get a specific transaction by ID.
     """
-    transaction = get_object_or_404(
-        Transaction.objects.select_related(
-            'account', 'account__user', 'category', 'to_account', 'created_by'
-        ), 
-        id=transaction_id
-    )
+    try:
+        transaction = await aget_object_or_404(
+            Transaction.objects.select_related(
+                'account', 'account__user', 'to_account', 'created_by'
+            ), 
+            id=transaction_id
+        )
+    except Http404:
+        archived = await sync_to_async(get_archived_transaction)(transaction_id)
+        return TransactionSchema(**archived)
     
     return TransactionSchema(
         id=transaction.id,
@@ -266,7 +492,7 @@ def get_transaction(request, transaction_id: int):
         transaction_type=transaction.transaction_type,
         transaction_type_display=transaction.get_transaction_type_display(),
         category_id=transaction.category_id,
-        category_name=get_category_name(transaction.category),
+        category_name=(await sync_to_async(get_category_tree)()).name(transaction.category_id),
         amount=transaction.amount,
         title=transaction.title,
         description=transaction.description,
@@ -290,27 +516,33 @@ def get_transaction(request, transaction_id: int):
     )
 
 
-@api.get("/transactions/{transaction_id}/summary/", response=TransactionSummarySchema)
+@api.get("/transactions/{int:transaction_id}/summary/", response=TransactionSummarySchema)
 def get_transaction_summary(request, transaction_id: int):
     """
     Get transaction summary with aggregated data.
     """
-    transaction = get_object_or_404(
-        Transaction.objects.select_related(
-            'account', 'account__user', 'category'
-        ), 
-        id=transaction_id
-    )
-    
-    # Calculate summary data for the account
-    account_transactions = Transaction.objects.filter(account=transaction.account)
-    total_income = account_transactions.filter(transaction_type='INCOME').aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0')
+    try:
+        transaction = get_object_or_404(
+            Transaction.objects.select_related(
+                'account', 'account__user'
+            ), 
+            id=transaction_id
+        )
+    except Http404:
+        archived = get_archived_transaction(transaction_id)
+        # Daily rollups still count archived transactions
+        totals = Account(pk=archived['account_id']).get_totals()
+        return TransactionSummarySchema(
+            **archived,
+            total_income=totals['income'],
+            total_expense=totals['expense'],
+            net_amount=totals['income'] - totals['expense']
+        )
     
-    total_expense = account_transactions.filter(transaction_type='EXPENSE').aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0')
+    # Calculate summary data for the account from its daily rollups
+    totals = transaction.account.get_totals()
+    total_income = totals['income']
+    total_expense = totals['expense']
     
     net_amount = total_income - total_expense
     
@@ -322,7 +554,7 @@ def get_transaction_summary(request, transaction_id: int):
         transaction_type=transaction.transaction_type,
         transaction_type_display=transaction.get_transaction_type_display(),
         category_id=transaction.category_id,
-        category_name=get_category_name(transaction.category),
+        category_name=get_category_tree().name(transaction.category_id),
         amount=transaction.amount,
         title=transaction.title,
         date=transaction.date,
@@ -339,7 +571,7 @@ def get_transaction_summary(request, transaction_id: int):
 
 
 @api.get("/recurring-transactions/", response=RecurringTransactionListResponse)
-def list_recurring_transactions(
+async def list_recurring_transactions(
     request,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
@@ -353,9 +585,7 @@ def list_recurring_transactions(
     """
     List all recurring transactions with optional filtering and pagination.
     """
-    queryset = RecurringTransaction.objects.select_related(
-        'user', 'account', 'category'
-    ).all()
+    queryset = RecurringTransaction.objects.all()
     
     # Apply filters
     if user_id:
@@ -380,52 +610,25 @@ def list_recurring_transactions(
         )
     
     # Pagination
-    paginator = Paginator(queryset, page_size)
-    page_obj = paginator.get_page(page)
-    
-    # Convert to schema
-    recurring_transactions = []
-    for recurring in page_obj:
-        recurring_transactions.append(RecurringTransactionSchema(
-            id=recurring.id,
-            user_id=recurring.user_id,
-            username=get_username(recurring.user),
-            account_id=recurring.account_id,
-            account_name=get_account_name(recurring.account),
-            transaction_type=recurring.transaction_type,
-            transaction_type_display=recurring.get_transaction_type_display(),
-            category_id=recurring.category_id,
-            category_name=get_category_name(recurring.category),
-            amount=recurring.amount,
-            title=recurring.title,
-            description=recurring.description,
-            frequency=recurring.frequency,
-            frequency_display=recurring.get_frequency_display(),
-            start_date=recurring.start_date,
-            end_date=recurring.end_date,
-            next_due_date=recurring.next_due_date,
-            is_active=recurring.is_active,
-            auto_create=recurring.auto_create,
-            created_at=recurring.created_at,
-            updated_at=recurring.updated_at
-        ))
+    rows, total_count = await apaginate(recurring_transaction_serializer.values_list(queryset), page, page_size)
     
-    return RecurringTransactionListResponse(
-        recurring_transactions=recurring_transactions,
-        total_count=paginator.count,
-        page=page,
-        page_size=page_size,
-        total_pages=ceil(paginator.count / page_size)
-    )
+    # Plain dicts are validated once by the response schema
+    return {
+        "recurring_transactions": await recurring_transaction_serializer.aserialize_rows(rows),
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": ceil(total_count / page_size)
+    }
 
 
 @api.get("/recurring-transactions/{recurring_id}/", response=RecurringTransactionSchema)
-def get_recurring_transaction(request, recurring_id: int):
+async def get_recurring_transaction(request, recurring_id: int):
     """
     Get a specific recurring transaction by ID.
     """
-    recurring = get_object_or_404(
-        RecurringTransaction.objects.select_related('user', 'account', 'category'), 
+    recurring = await aget_object_or_404(
+        RecurringTransaction.objects.select_related('user', 'account'), 
         id=recurring_id
     )
     
@@ -438,7 +641,7 @@ def get_recurring_transaction(request, recurring_id: int):
         transaction_type=recurring.transaction_type,
         transaction_type_display=recurring.get_transaction_type_display(),
         category_id=recurring.category_id,
-        category_name=get_category_name(recurring.category),
+        category_name=(await sync_to_async(get_category_tree)()).name(recurring.category_id),
         amount=recurring.amount,
         title=recurring.title,
         description=recurring.description,
@@ -455,14 +658,16 @@ def get_recurring_transaction(request, recurring_id: int):
 
 
 @api.get("/transactions/statistics/")
-def get_transactions_statistics(request):
+@cached_response('transactions', 'categories')
+async def get_transactions_statistics(request):
     """
     Get general statistics about transactions.
+
+    The statistics cover the transactions in the database only: archived
+    transactions (see transactions.archive) are left out, as their payment
+    method, category and verification breakdowns are not rolled up. Account
+    balances, totals and monthly summaries do include them.
     """
-    total_transactions = Transaction.objects.count()
-    verified_transactions = Transaction.objects.filter(is_verified=True).count()
-    recurring_transactions = Transaction.objects.filter(is_recurring=True).count()
-    
     # Transaction type distribution
     transaction_types = Transaction.objects.values('transaction_type').annotate(
         count=Count('id')
@@ -491,14 +696,27 @@ def get_transactions_statistics(request):
         count=Count('id')
     ).order_by('-month')[:12]
     
+    # Awaited one after another: the async ORM runs them on this request's
+    # connection in a single thread either way
+    counts = await Transaction.objects.aaggregate(
+        total=Count('id'),
+        verified=Count('id', filter=Q(is_verified=True)),
+        recurring=Count('id', filter=Q(is_recurring=True))
+    )
+    transaction_types = await afetch(transaction_types)
+    payment_methods = await afetch(payment_methods)
+    amounts_by_type = await afetch(amounts_by_type)
+    categories = await afetch(categories)
+    monthly_counts = await afetch(monthly_counts)
+    
     return {
-        "total_transactions": total_transactions,
-        "verified_transactions": verified_transactions,
-        "unverified_transactions": total_transactions - verified_transactions,
-        "recurring_transactions": recurring_transactions,
-        "transaction_types": list(transaction_types),
-        "payment_methods": list(payment_methods),
-        "amounts_by_type": list(amounts_by_type),
-        "categories": list(categories),
-        "monthly_counts": list(monthly_counts)
+        "total_transactions": counts['total'],
+        "verified_transactions": counts['verified'],
+        "unverified_transactions": counts['total'] - counts['verified'],
+        "recurring_transactions": counts['recurring'],
+        "transaction_types": transaction_types,
+        "payment_methods": payment_methods,
+        "amounts_by_type": amounts_by_type,
+        "categories": categories,
+        "monthly_counts": monthly_counts
     }
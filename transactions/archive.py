@@ -0,0 +1,733 @@
+"""
+Cold storage of old transactions in compressed Parquet files.
+
+The archive_transactions command moves the transactions dated before a
+cutoff out of the database into settings.TRANSACTION_ARCHIVE_DIR, one
+zstd-compressed Parquet segment per account and month:
+
+    account=<account_id>/month=<YYYY-MM>/<archive_id>.parquet
+    manifests/<archive_id>.json
+
+Every account archived by a run is one archive: its rows are locked, written
+to segments and deleted in a single database transaction, and its manifest
+lists the segments with their row counts, date and id ranges and SHA-256
+checksums. The manifest is written as 'pending' before the delete and marked
+'complete' once it has committed; readers only use complete archives. If the
+command dies in between, the next run settles pending archives: complete if
+their rows are gone from the database, discarded otherwise.
+
+The list endpoint merges archived rows into its pages when the requested date
+range reaches the archived dates, and the transaction detail and summary
+endpoints fall back to the archive for ids that are no longer in the
+database. Account balances and daily rollups keep counting archived
+transactions, so account summaries and the account statistics are unchanged.
+The transaction statistics and budget spending are computed from the
+transaction table and leave archived rows out. rebuild_rollups and
+rebuild_balances, which would leave archived rows out too, refuse to run on
+archived accounts. Manifests also list the fingerprints of the archived rows,
+which bulk ingest and statement imports check like stored ones (see
+transactions.dedupe), so importing a statement of archived dates again does
+not bring its rows back.
+
+Reading and writing the archive needs pyarrow.
+"""
+import hashlib
+import heapq
+import json
+import os
+import threading
+import uuid
+from datetime import date
+from itertools import islice
+from math import ceil
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from backend.cache import bump_version
+from .models import CategoryClosure, Transaction
+from .pagination import KEYSET_ORDERING, _cursor_page, _keyset_page, decode_cursor
+from .search import SEARCH_MODES, invalidate_search_index, tokenize
+
+
+COMPRESSION = 'zstd'
+MANIFEST_VERSION = 1
+
+# Transaction columns stored in the segments; user_id is left out, it follows
+# the account's current owner
+ARCHIVE_FIELDS = (
+    'id', 'account_id', 'transaction_type', 'category_id', 'amount', 'title', 'description', 'date', 'time',
+    'payment_method', 'to_account_id', 'merchant', 'location', 'tags', 'receipt_image', 'is_recurring',
+    'is_verified', 'created_at', 'updated_at', 'created_by_id', 'fingerprint',
+)
+
+# Related lookups of values_list() rows, and the archived record keys they are resolved to
+RELATED_LOOKUPS = {
+    'account__account_name': 'account_name',
+    'account__user__username': 'username',
+    'to_account__account_name': 'to_account_name',
+    'created_by__username': 'created_by_username',
+}
+
+DELETE_BATCH_SIZE = 1000
+
+
+class ArchiveError(Exception):
+    """Raised when an archive does not match the database or its manifest"""
+
+
+def archive_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('id', pa.int64()),
+        ('account_id', pa.int64()),
+        ('transaction_type', pa.string()),
+        ('category_id', pa.int64()),
+        ('amount', pa.decimal128(10, 2)),
+        ('title', pa.string()),
+        ('description', pa.string()),
+        ('date', pa.date32()),
+        ('time', pa.time64('us')),
+        ('payment_method', pa.string()),
+        ('to_account_id', pa.int64()),
+        ('merchant', pa.string()),
+        ('location', pa.string()),
+        ('tags', pa.string()),
+        ('receipt_image', pa.string()),
+        ('is_recurring', pa.bool_()),
+        ('is_verified', pa.bool_()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('updated_at', pa.timestamp('us', tz='UTC')),
+        ('created_by_id', pa.int64()),
+        ('fingerprint', pa.string()),
+    ])
+
+
+def archive_dir():
+    return Path(settings.TRANSACTION_ARCHIVE_DIR)
+
+
+def manifest_path(archive_id):
+    return archive_dir() / 'manifests' / f'{archive_id}.json'
+
+
+def segment_path(account_id, month, archive_id):
+    """Path of a segment relative to the archive directory"""
+    return f'account={account_id}/month={month}/{archive_id}.parquet'
+
+
+def _write_json(path, data):
+    """Write a JSON file atomically: readers see the old content or the new one"""
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(data, indent=2, default=str))
+    os.replace(temporary, path)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_manifests_lock = threading.Lock()
+_manifests_cache = {}
+
+
+def load_manifests(status='complete'):
+    """
+    Manifests of the archive directory with the given status (None for all), oldest first.
+
+    Manifests are cached per process until the manifests directory changes,
+    so requests that do not reach the archive only pay for a stat().
+    """
+    directory = archive_dir() / 'manifests'
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+
+    return [manifest for manifest in _cached_manifests(directory, mtime)['manifests']
+            if status is None or manifest['status'] == status]
+
+
+def _cached_manifests(directory, mtime):
+    with _manifests_lock:
+        cached = _manifests_cache.get(directory)
+        if cached is None or cached['mtime'] != mtime:
+            manifests = [json.loads(path.read_text()) for path in sorted(directory.glob('*.json'))]
+            cached = _manifests_cache[directory] = {'mtime': mtime, 'manifests': manifests, 'fingerprints': None}
+        return cached
+
+
+def archived_fingerprints():
+    """Fingerprints of the transactions in complete archives, cached like the manifests"""
+    directory = archive_dir() / 'manifests'
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except FileNotFoundError:
+        return frozenset()
+
+    cached = _cached_manifests(directory, mtime)
+    if cached['fingerprints'] is None:
+        cached['fingerprints'] = frozenset(
+            value
+            for manifest in cached['manifests'] if manifest['status'] == 'complete'
+            for value in manifest['fingerprints']
+        )
+    return cached['fingerprints']
+
+
+def archived_segments(account_ids=None, date_from=None, date_to=None, transaction_id=None):
+    """Segments of complete archives that may hold rows of the given accounts, dates or id"""
+    segments = []
+    for manifest in load_manifests():
+        for segment in manifest['segments']:
+            if account_ids is not None and segment['account_id'] not in account_ids:
+                continue
+            if date_from is not None and date.fromisoformat(segment['max_date']) < date_from:
+                continue
+            if date_to is not None and date.fromisoformat(segment['min_date']) > date_to:
+                continue
+            if transaction_id is not None and not segment['min_id'] <= transaction_id <= segment['max_id']:
+                continue
+            segments.append(segment)
+    return segments
+
+
+def check_not_archived(account_ids=None):
+    """
+    Raise ArchiveError if complete archives hold transactions of the accounts (all accounts if None).
+
+    For code that recomputes account data from the transaction table, which
+    would leave the archived rows out.
+    """
+    archived = {manifest['account_id'] for manifest in load_manifests()}
+    if account_ids is not None:
+        archived &= set(account_ids)
+    if archived:
+        raise ArchiveError(
+            f"Transactions of accounts {', '.join(map(str, sorted(archived)))} are archived; "
+            f"recomputing them from the transaction table would leave the archived rows out"
+        )
+
+
+def archive_boundary(date_from=None, account_id=None):
+    """
+    Latest archived date a list query can reach, or None if it does not reach the archive.
+
+    Every archived row is dated on or before the boundary, so live rows dated
+    after it come before all archived rows in list order.
+    """
+    dates = [
+        date.fromisoformat(segment['max_date'])
+        for segment in archived_segments(account_ids={account_id} if account_id else None)
+    ]
+    if not dates:
+        return None
+    boundary = max(dates)
+    if date_from and Transaction._meta.get_field('date').to_python(date_from) > boundary:
+        return None
+    return boundary
+
+
+def _write_segment(rows, account_id, month, archive_id):
+    """Write one account and month of values_list() rows in ARCHIVE_FIELDS order; returns its manifest entry"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows.sort(key=keyset_sort_key(lambda row: (row[7], row[8], row[0])))
+    table = pa.Table.from_pylist([dict(zip(ARCHIVE_FIELDS, row)) for row in rows], schema=archive_schema())
+    relative = segment_path(account_id, month, archive_id)
+    path = archive_dir() / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix('.tmp')
+    pq.write_table(table, temporary, compression=COMPRESSION)
+    os.replace(temporary, path)
+
+    ids = [row[0] for row in rows]
+    dates = [row[7] for row in rows]
+    return {
+        'path': relative,
+        'account_id': account_id,
+        'month': month,
+        'rows': len(rows),
+        'min_date': min(dates).isoformat(),
+        'max_date': max(dates).isoformat(),
+        'min_id': min(ids),
+        'max_id': max(ids),
+        'bytes': path.stat().st_size,
+        'sha256': _sha256(path),
+    }
+
+
+def _remove_archive(manifest):
+    for segment in manifest['segments']:
+        (archive_dir() / segment['path']).unlink(missing_ok=True)
+    manifest_path(manifest['archive_id']).unlink(missing_ok=True)
+
+
+def _delete_rows(ids):
+    """Delete transactions by id without posting them: balances and rollups keep archived rows"""
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start:start + DELETE_BATCH_SIZE]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def archive_account(account_id, cutoff, run_id):
+    """
+    Archive the transactions of one account dated before cutoff.
+
+    Returns the complete manifest, or None if the account has nothing to archive.
+    """
+    archive_id = f'{run_id}-a{account_id}'
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'archive_id': archive_id,
+        'status': 'pending',
+        'account_id': account_id,
+        'cutoff': cutoff.isoformat(),
+        'created_at': timezone.now().isoformat(),
+        'compression': COMPRESSION,
+        'rows': 0,
+        'segments': [],
+        'fingerprints': [],
+    }
+    manifest_path(archive_id).parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with transaction.atomic():
+            # Locked until the delete commits, so no update is lost between reading and deleting
+            rows = Transaction.objects.select_for_update().filter(
+                account_id=account_id, date__lt=cutoff
+            ).order_by('date').values_list(*ARCHIVE_FIELDS).iterator(chunk_size=2000)
+
+            ids = []
+            month, batch = None, []
+            for row in rows:
+                row_month = f'{row[7]:%Y-%m}'
+                if row_month != month and batch:
+                    manifest['segments'].append(_write_segment(batch, account_id, month, archive_id))
+                    batch = []
+                month = row_month
+                batch.append(row)
+                ids.append(row[0])
+                if row[20]:
+                    manifest['fingerprints'].append(row[20])
+            if batch:
+                manifest['segments'].append(_write_segment(batch, account_id, month, archive_id))
+            if not ids:
+                return None
+
+            manifest['rows'] = len(ids)
+            _write_json(manifest_path(archive_id), manifest)
+            deleted = _delete_rows(ids)
+            if deleted != len(ids):
+                raise ArchiveError(f'Archive {archive_id}: wrote {len(ids)} rows but deleted {deleted}')
+    except BaseException:
+        _remove_archive(manifest)
+        raise
+
+    manifest['status'] = 'complete'
+    _write_json(manifest_path(archive_id), manifest)
+    invalidate_search_index()
+    bump_version('transactions', 'accounts')
+    return manifest
+
+
+def archive_transactions(cutoff, account_ids=None):
+    """
+    Move the transactions dated before cutoff to the archive, one archive per account.
+
+    Returns the manifests of the new archives. Run settle_pending() first
+    after an interrupted run.
+    """
+    accounts = Transaction.objects.filter(date__lt=cutoff)
+    if account_ids is not None:
+        accounts = accounts.filter(account_id__in=account_ids)
+    run_id = f'{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+    manifests = []
+    for account_id in accounts.order_by('account_id').values_list('account_id', flat=True).distinct():
+        manifest = archive_account(account_id, cutoff, run_id)
+        if manifest is not None:
+            manifests.append(manifest)
+    return manifests
+
+
+def settle_pending():
+    """
+    Resolve the archives left pending by an interrupted run.
+
+    An archive whose rows are gone from the database committed: it is marked
+    complete. One whose rows are still there did not: its files are removed.
+    Returns the (archive_id, status) of the settled archives.
+    """
+    import pyarrow.parquet as pq
+
+    settled = []
+    for manifest in load_manifests(status='pending'):
+        ids = []
+        for segment in manifest['segments']:
+            path = archive_dir() / segment['path']
+            if path.exists():
+                ids.extend(pq.read_table(path, columns=['id']).column('id').to_pylist())
+        if ids and len(ids) == manifest['rows'] and not Transaction.objects.filter(id__in=ids).exists():
+            manifest['status'] = 'complete'
+            _write_json(manifest_path(manifest['archive_id']), manifest)
+        else:
+            _remove_archive(manifest)
+            manifest['status'] = 'discarded'
+        settled.append((manifest['archive_id'], manifest['status']))
+    return settled
+
+
+def verify_archives():
+    """Check the segments of complete archives against their manifests; returns a list of problems"""
+    problems = []
+    for manifest in load_manifests():
+        for segment in manifest['segments']:
+            path = archive_dir() / segment['path']
+            if not path.exists():
+                problems.append(f"{manifest['archive_id']}: missing {segment['path']}")
+            elif _sha256(path) != segment['sha256']:
+                problems.append(f"{manifest['archive_id']}: checksum mismatch for {segment['path']}")
+    return problems
+
+
+def keyset_sort_key(row_key):
+    """Sort key putting rows in KEYSET_ORDERING (-date, -time, id); row_key extracts (date, time, id)"""
+    def key(row):
+        row_date, row_time, row_id = row_key(row)
+        seconds = (row_time.hour * 60 + row_time.minute) * 60 + row_time.second
+        return -row_date.toordinal(), -(seconds * 1_000_000 + row_time.microsecond), row_id
+    return key
+
+
+def _matches_search(record, terms, mode):
+    """Ranked search modes: every term matches a word of the title, merchant or description"""
+    words = set(tokenize(record['title']) + tokenize(record['merchant']) + tokenize(record['description']))
+    if mode == 'prefix':
+        return all(any(word.startswith(term) for word in words) for term in terms)
+    return all(term in words for term in terms)
+
+
+def _resolve_related(records):
+    """Add account, owner and creator names to archived records; rows of deleted accounts are dropped"""
+    from django.contrib.auth.models import User
+    from accounts.models import Account
+
+    account_ids = {record['account_id'] for record in records}
+    account_ids.update(record['to_account_id'] for record in records if record['to_account_id'])
+    accounts = {
+        account_id: (name, username)
+        for account_id, name, username in Account.objects.filter(
+            id__in=account_ids
+        ).values_list('id', 'account_name', 'user__username')
+    }
+    user_ids = {record['created_by_id'] for record in records if record['created_by_id']}
+    users = dict(User.objects.filter(id__in=user_ids).values_list('id', 'username')) if user_ids else {}
+
+    resolved = []
+    for record in records:
+        if record['account_id'] not in accounts:
+            continue
+        record['account_name'], record['username'] = accounts[record['account_id']]
+        record['to_account_name'] = accounts.get(record['to_account_id'], (None, None))[0]
+        record['created_by_username'] = users.get(record['created_by_id'])
+        resolved.append(record)
+    return resolved
+
+
+def _archived_query(
+    transaction_type=None,
+    account_id=None,
+    category_id=None,
+    include_descendants=False,
+    payment_method=None,
+    is_recurring=None,
+    is_verified=None,
+    date_from=None,
+    date_to=None,
+    min_amount=None,
+    max_amount=None,
+    search=None,
+    search_mode='contains',
+    user_id=None
+):
+    """
+    The segments, Parquet filter expression and record predicate of the filters of filter_transactions().
+
+    Segments are picked from the manifests by account and date range, and
+    segments of deleted accounts are left out; the remaining filters are
+    pushed down to the Parquet reader except ranked search, which is the
+    predicate (None if every record passes).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from accounts.models import Account
+
+    if search and search_mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {search_mode}")
+
+    to_date = Transaction._meta.get_field('date').to_python
+    date_from = to_date(date_from) if date_from else None
+    date_to = to_date(date_to) if date_to else None
+
+    account_ids = None
+    if account_id:
+        account_ids = {account_id}
+    if user_id:
+        # Archived rows belong to whoever owns the account now
+        owned = set(Account.objects.filter(user_id=user_id).values_list('id', flat=True))
+        account_ids = owned if account_ids is None else account_ids & owned
+    segments = archived_segments(account_ids, date_from, date_to)
+    if segments:
+        existing = set(Account.objects.filter(
+            id__in={segment['account_id'] for segment in segments}
+        ).values_list('id', flat=True))
+        segments = [segment for segment in segments if segment['account_id'] in existing]
+    if not segments:
+        return [], None, None
+
+    conditions = []
+    if transaction_type:
+        conditions.append(pc.field('transaction_type') == transaction_type)
+    if account_id:
+        conditions.append(pc.field('account_id') == account_id)
+    if category_id:
+        category_ids = [category_id]
+        if include_descendants:
+            category_ids = list(
+                CategoryClosure.objects.filter(ancestor_id=category_id).values_list('descendant_id', flat=True)
+            )
+        conditions.append(pc.field('category_id').isin(category_ids))
+    if payment_method:
+        conditions.append(pc.field('payment_method') == payment_method)
+    if is_recurring is not None:
+        conditions.append(pc.field('is_recurring') == is_recurring)
+    if is_verified is not None:
+        conditions.append(pc.field('is_verified') == is_verified)
+    if date_from:
+        conditions.append(pc.field('date') >= pa.scalar(date_from, pa.date32()))
+    if date_to:
+        conditions.append(pc.field('date') <= pa.scalar(date_to, pa.date32()))
+    if min_amount is not None:
+        conditions.append(pc.field('amount').cast(pa.float64()) >= float(min_amount))
+    if max_amount is not None:
+        conditions.append(pc.field('amount').cast(pa.float64()) <= float(max_amount))
+    if search and search_mode == 'contains':
+        conditions.append(
+            pc.match_substring(pc.field('title'), search, ignore_case=True) |
+            pc.match_substring(pc.field('description'), search, ignore_case=True) |
+            pc.match_substring(pc.field('merchant'), search, ignore_case=True)
+        )
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    predicate = None
+    if search and search_mode != 'contains':
+        terms = tokenize(search)
+
+        def predicate(record):
+            return _matches_search(record, terms, search_mode)
+    return segments, expression, predicate
+
+
+def _dataset(segments):
+    import pyarrow.dataset as ds
+
+    return ds.dataset(
+        [str(archive_dir() / segment['path']) for segment in segments], schema=archive_schema(), format='parquet'
+    )
+
+
+def read_archived(limit=None, after=None, before=None, **filters):
+    """
+    Archived transactions matching the filters of filter_transactions(), as dicts in KEYSET_ORDERING.
+
+    Only the first limit records are returned if limit is given: months are
+    read newest first and reading stops once the older months cannot hold
+    any of them. after and before are (date, time, id) positions in
+    KEYSET_ORDERING; only the records after or before them are returned.
+    Records carry the related names of a values_list() row.
+    """
+    to_date = Transaction._meta.get_field('date').to_python
+    if after is not None:
+        filters['date_to'] = min(to_date(filters['date_to']), after[0]) if filters.get('date_to') else after[0]
+    if before is not None:
+        filters['date_from'] = max(to_date(filters['date_from']), before[0]) if filters.get('date_from') else before[0]
+    segments, expression, predicate = _archived_query(**filters)
+
+    key = keyset_sort_key(lambda record: (record['date'], record['time'], record['id']))
+    position = keyset_sort_key(lambda row: row)
+    months = {}
+    for segment in segments:
+        months.setdefault(segment['month'], []).append(segment)
+
+    records = []
+    for month in sorted(months, reverse=True):
+        if limit is not None and len(records) >= limit:
+            records.sort(key=key)
+            del records[limit:]
+            if max(date.fromisoformat(segment['max_date']) for segment in months[month]) < records[-1]['date']:
+                break
+        batch = _dataset(months[month]).to_table(filter=expression).to_pylist()
+        if predicate is not None:
+            batch = [record for record in batch if predicate(record)]
+        if after is not None:
+            batch = [record for record in batch if key(record) > position(after)]
+        if before is not None:
+            batch = [record for record in batch if key(record) < position(before)]
+        records += batch
+
+    records.sort(key=key)
+    if limit is not None:
+        del records[limit:]
+    return _resolve_related(records)
+
+
+def count_archived(**filters):
+    """
+    Number of archived transactions matching the filters of filter_transactions().
+
+    Taken from the manifest row counts when no filter reaches into the
+    segments, otherwise counted by the Parquet reader; ranked search reads
+    only the searched columns.
+    """
+    segments, expression, predicate = _archived_query(**filters)
+    if not segments:
+        return 0
+    if expression is None and predicate is None:
+        return sum(segment['rows'] for segment in segments)
+    if predicate is None:
+        return _dataset(segments).count_rows(filter=expression)
+    table = _dataset(segments).to_table(columns=['title', 'merchant', 'description'], filter=expression)
+    return sum(1 for record in table.to_pylist() if predicate(record))
+
+
+def get_archived(transaction_id):
+    """The archived transaction with the given id as a record dict, or None"""
+    import pyarrow.compute as pc
+
+    segments = archived_segments(transaction_id=transaction_id)
+    if not segments:
+        return None
+    records = _resolve_related(_dataset(segments).to_table(filter=pc.field('id') == transaction_id).to_pylist())
+    return records[0] if records else None
+
+
+def values_rows(records, lookups):
+    """Archived records as values_list() rows of the given lookups, e.g. ValuesSerializer.lookups"""
+    keys = [RELATED_LOOKUPS.get(lookup, lookup) for lookup in lookups]
+    return [tuple(record[key] for key in keys) for record in records]
+
+
+class ArchivedRows:
+    """Archived rows matching a list query as values_list() rows, read as far as a page needs them"""
+
+    def __init__(self, boundary, lookups, filters):
+        self.boundary = boundary
+        self.lookups = lookups
+        self.filters = filters
+        self._rows = None  # The first rows in KEYSET_ORDERING
+        self._complete = False
+        self._count = None
+
+    def load(self, limit=None):
+        """The first limit rows (all if None) in KEYSET_ORDERING"""
+        if self._rows is None or not self._complete and (limit is None or limit > len(self._rows)):
+            self._rows = self.read(limit)
+            self._complete = limit is None or len(self._rows) < limit
+        return self._rows[:limit]
+
+    def read(self, limit=None, after=None, before=None):
+        """Uncached read_archived() of the query as rows"""
+        return values_rows(read_archived(limit, after, before, **self.filters), self.lookups)
+
+    def count(self):
+        """Number of rows, counted without reading them unless they are all loaded"""
+        if self._count is None:
+            self._count = len(self._rows) if self._complete else count_archived(**self.filters)
+        return self._count
+
+    async def aload(self, limit=None):
+        return await sync_to_async(self.load)(limit)
+
+    async def aread(self, limit=None, after=None, before=None):
+        return await sync_to_async(self.read)(limit, after, before)
+
+    async def acount(self):
+        return await sync_to_async(self.count)()
+
+
+async def apaginate_with_archive(queryset, archived, page, page_size, row_key, interleave=True):
+    """
+    apaginate() over the live rows of queryset followed or interleaved by archived rows.
+
+    With interleave, pages are in KEYSET_ORDERING: live rows dated after the
+    archive boundary come first, then live and archived rows older than it,
+    merged. Otherwise the queryset keeps its own order (e.g. search
+    relevance) and archived rows follow all live ones. The archived rows are
+    counted without reading them, and only pages past the recent live rows
+    read the archived rows up to their end.
+    """
+    if interleave:
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+        counts = await queryset.aaggregate(total=Count('id'), recent=Count('id', filter=Q(date__gt=archived.boundary)))
+        live_total, recent = counts['total'], counts['recent']
+    else:
+        live_total = recent = await queryset.acount()
+
+    total_count = live_total + await archived.acount()
+    page = min(page, max(ceil(total_count / page_size), 1))
+    offset = (page - 1) * page_size
+    end = min(offset + page_size, total_count)
+
+    rows = []
+    if offset < recent:
+        rows = [row async for row in queryset[offset:min(end, recent)]]
+    if end > recent:
+        start, stop = max(offset - recent, 0), end - recent
+        older = []
+        if live_total > recent:
+            older = [row async for row in queryset.filter(date__lte=archived.boundary)[:stop]]
+        archived_rows = await archived.aload(stop)
+        rows += islice(heapq.merge(older, archived_rows, key=keyset_sort_key(row_key)), start, stop)
+    return rows, total_count
+
+
+async def apaginate_by_cursor_with_archive(queryset, archived, page_size, cursor, row_key):
+    """apaginate_by_cursor() over the live rows of queryset and the archived rows, merged"""
+    ordered, direction = _keyset_page(queryset, cursor)
+    rows = [row async for row in ordered[:page_size + 1]]
+    position = decode_cursor(cursor)[0] if cursor else None
+
+    # Archived rows are dated on or before the boundary, after every newer live row
+    if direction == 'next':
+        needed = len(rows) <= page_size or row_key(rows[-1])[0] <= archived.boundary
+    else:
+        needed = position[0] <= archived.boundary
+    if needed:
+        if position is None:
+            archived_rows = await archived.aload(page_size + 1)
+        elif direction == 'next':
+            archived_rows = await archived.aread(page_size + 1, after=position)
+        else:
+            # Nearest to the position first, like the live rows of a 'prev' page
+            archived_rows = list(reversed(await archived.aread(before=position)))
+        key = keyset_sort_key(row_key)
+        rows = list(islice(heapq.merge(rows, archived_rows, key=key, reverse=direction == 'prev'), page_size + 1))
+    return _cursor_page(rows, page_size, cursor, direction, row_key)
@@ -0,0 +1,119 @@
+"""
+In-process cache of the category tree.
+
+Categories are few and rarely change but are needed on almost every
+request (names in transaction lists, full paths, subcategory lookups), so
+the whole tree is loaded with one query and kept in memory. It is rebuilt
+when:
+
+- a Category is saved or deleted in this process (see signals.py),
+- the "categories" data version changes, which also covers writes made by
+  other processes when a shared cache backend is configured,
+- it is older than settings.API_CACHE_TIMEOUT, or
+- a lookup misses, which only happens when the tree is stale.
+"""
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from backend.cache import get_versions
+
+
+PATH_SEPARATOR = ' > '
+
+CategoryNode = namedtuple('CategoryNode', ['id', 'name', 'parent_id', 'full_path', 'depth'])
+
+
+class CategoryTree:
+    """Immutable snapshot of all categories, indexed by id"""
+
+    def __init__(self, rows):
+        """rows is an iterable of (id, name, parent_id) tuples"""
+        rows = {category_id: (name, parent_id) for category_id, name, parent_id in rows}
+
+        self.children = {}
+        for category_id, (_, parent_id) in rows.items():
+            self.children.setdefault(parent_id, []).append(category_id)
+
+        # Walk down from the roots so every parent is resolved before its
+        # children; rows that are not reachable from a root (dangling
+        # parents, cycles) are left out.
+        self.nodes = {}
+        stack = [(category_id, None, 0) for category_id in self.children.get(None, [])]
+        while stack:
+            category_id, parent, depth = stack.pop()
+            name, parent_id = rows[category_id]
+            full_path = f'{parent.full_path}{PATH_SEPARATOR}{name}' if parent else name
+            node = self.nodes[category_id] = CategoryNode(category_id, name, parent_id, full_path, depth)
+            stack.extend((child_id, node, depth + 1) for child_id in self.children.get(category_id, []))
+
+        self._descendants = {}
+
+    def get(self, category_id):
+        """Return the CategoryNode for category_id, or None"""
+        if category_id is None:
+            return None
+        node = self.nodes.get(category_id)
+        if node is None:
+            # Every category a row can reference exists, so a miss means this
+            # snapshot predates the category; retry once on a fresh tree.
+            latest = get_category_tree()
+            if latest is self:
+                latest = get_category_tree(reload=True)
+            node = latest.nodes.get(category_id)
+        return node
+
+    def name(self, category_id):
+        node = self.get(category_id)
+        return node.name if node else None
+
+    def parent_name(self, category_id):
+        node = self.get(category_id)
+        return self.name(node.parent_id) if node else None
+
+    def full_path(self, category_id):
+        node = self.get(category_id)
+        return node.full_path if node else None
+
+    def descendant_ids(self, category_id):
+        """Return a frozenset of category_id and the ids of all its subcategories"""
+        descendants = self._descendants.get(category_id)
+        if descendants is None:
+            ids = []
+            stack = [category_id]
+            while stack:
+                current = stack.pop()
+                ids.append(current)
+                stack.extend(self.children.get(current, []))
+            descendants = self._descendants[category_id] = frozenset(ids)
+        return descendants
+
+
+_state = {'tree': None, 'version': None, 'loaded_at': 0.0}
+
+
+def load_category_tree():
+    """Build a CategoryTree from the database"""
+    from .models import Category
+
+    return CategoryTree(Category.objects.order_by().values_list('id', 'name', 'parent_id'))
+
+
+def get_category_tree(reload=False):
+    """Return the cached CategoryTree, rebuilding it if it may be stale"""
+    version = get_versions('categories')[0]
+    tree = _state['tree']
+    if (
+        reload or tree is None or _state['version'] != version or
+        time.monotonic() - _state['loaded_at'] > settings.API_CACHE_TIMEOUT
+    ):
+        loaded_at = time.monotonic()
+        tree = load_category_tree()
+        _state.update(tree=tree, version=version, loaded_at=loaded_at)
+    return tree
+
+
+def invalidate_category_tree():
+    """Drop the cached tree so the next get_category_tree() call rebuilds it"""
+    _state['tree'] = None
@@ -0,0 +1,100 @@
+"""
+Category closure table maintenance.
+
+CategoryClosure holds one row per (ancestor, descendant) pair of the
+category tree, including every category paired with itself at depth 0, so
+"category X and all its subcategories" is a single indexed lookup on
+ancestor_id instead of a recursive walk of Category.parent.
+
+Rows are written by Category.save(); deletes cascade through the foreign
+keys.
+"""
+from django.db.models import Subquery
+
+
+def descendant_ids(category_id):
+    """Subquery selecting category_id and the ids of all its subcategories"""
+    from .models import CategoryClosure
+
+    return Subquery(CategoryClosure.objects.filter(ancestor_id=category_id).values('descendant_id'))
+
+
+def insert_category(category):
+    """Add closure rows for a newly created category"""
+    from .models import CategoryClosure
+
+    links = [CategoryClosure(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+    if category.parent_id:
+        links.extend(
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+            for ancestor_id, depth in CategoryClosure.objects.filter(
+                descendant_id=category.parent_id
+            ).values_list('ancestor_id', 'depth')
+        )
+    CategoryClosure.objects.bulk_create(links)
+
+
+def move_category(category):
+    """
+    Re-link a category and its subtree after its parent changed.
+
+    Links from the old ancestors into the subtree are deleted and every
+    ancestor of the new parent is linked to every node of the subtree.
+    Raises ValueError if the new parent is inside the subtree.
+    """
+    from .models import CategoryClosure
+
+    subtree = dict(CategoryClosure.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+    if category.parent_id in subtree:
+        raise ValueError('A category cannot be moved under itself or one of its subcategories')
+
+    CategoryClosure.objects.filter(descendant_id__in=subtree).exclude(ancestor_id__in=subtree).delete()
+    if category.parent_id:
+        ancestors = CategoryClosure.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth')
+        CategoryClosure.objects.bulk_create(
+            [
+                CategoryClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=descendant_id,
+                    depth=ancestor_depth + descendant_depth + 1
+                )
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, descendant_depth in subtree.items()
+            ],
+            batch_size=1000
+        )
+
+
+def iter_closure_links(parents):
+    """
+    Yield (ancestor_id, descendant_id, depth) for every pair of a tree given
+    as {category_id: parent_id}. Categories caught in a parent cycle are skipped.
+    """
+    for category_id in parents:
+        chain = [category_id]
+        parent_id = parents.get(category_id)
+        while parent_id is not None and parent_id not in chain:
+            chain.append(parent_id)
+            parent_id = parents.get(parent_id)
+        if parent_id is not None:
+            continue
+        for depth, ancestor_id in enumerate(chain):
+            yield ancestor_id, category_id, depth
+
+
+def rebuild_closure(batch_size=1000):
+    """Recompute the whole closure table from Category.parent; returns the number of rows written"""
+    from django.db import transaction
+    from .models import Category, CategoryClosure
+
+    parents = dict(Category.objects.order_by().values_list('id', 'parent_id'))
+    with transaction.atomic():
+        CategoryClosure.objects.all().delete()
+        created = CategoryClosure.objects.bulk_create(
+            (
+                CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+                for ancestor_id, descendant_id, depth in iter_closure_links(parents)
+            ),
+            batch_size=batch_size
+        )
+    return len(created)
@@ -0,0 +1,166 @@
+"""
+Duplicate detection for imported transactions.
+
+Rows that arrive through bulk ingest or a statement import get a
+fingerprint: a hash of account, date, amount, type and normalized merchant
+and title, plus the row's occurrence number among identical rows of the
+import, so two identical coffees on one day get two fingerprints. A
+partial unique index on Transaction (fingerprint, date) makes the database
+reject a second copy of an imported row. Transactions entered one at a time have no
+fingerprint and are not constrained.
+
+The fingerprint identifies the source row and is not recomputed when the
+transaction is edited later, so importing the same row again is still
+recognised. Archived transactions keep their fingerprints in the archive
+manifests, which are checked too.
+
+Near-duplicates the index cannot catch, such as a manual entry and the
+matching bank line, are listed for review by find_near_duplicates().
+"""
+import hashlib
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from difflib import SequenceMatcher
+
+from django.db.models import Exists, F, OuterRef, Q
+
+
+NORMALIZE_RE = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_label(text):
+    """Lower-case text and reduce it to single-space separated letters and digits"""
+    return NORMALIZE_RE.sub(' ', (text or '').lower()).strip()
+
+
+def fingerprint_key(account_id, date, amount, transaction_type, merchant, title):
+    """The identifying content of a transaction, before occurrence numbering"""
+    return '|'.join((
+        str(account_id),
+        date.isoformat(),
+        f'{Decimal(amount):.2f}',
+        transaction_type,
+        normalize_label(merchant),
+        normalize_label(title),
+    ))
+
+
+def fingerprint(key, occurrence=1):
+    return hashlib.md5(f'{key}|{occurrence}'.encode()).hexdigest()
+
+
+def assign_fingerprints(objects, occurrences=None):
+    """
+    Set the fingerprint of unsaved Transaction objects.
+
+    occurrences is a Counter of fingerprint keys seen so far; pass the same
+    Counter to consecutive calls that import one file in several batches.
+    """
+    occurrences = Counter() if occurrences is None else occurrences
+    for obj in objects:
+        key = fingerprint_key(obj.account_id, obj.date, obj.amount, obj.transaction_type, obj.merchant, obj.title)
+        occurrences[key] += 1
+        obj.fingerprint = fingerprint(key, occurrences[key])
+    return objects
+
+
+def existing_fingerprints(fingerprints, chunk_size=1000):
+    """
+    Return the subset of fingerprints already stored, with one query per chunk.
+
+    Fingerprints of archived transactions (see transactions.archive) count as stored.
+    """
+    from .archive import archived_fingerprints
+    from .models import Transaction
+
+    fingerprints = list(fingerprints)
+    found = set(archived_fingerprints().intersection(fingerprints))
+    for start in range(0, len(fingerprints), chunk_size):
+        found.update(
+            Transaction.objects.filter(
+                fingerprint__in=fingerprints[start:start + chunk_size]
+            ).order_by().values_list('fingerprint', flat=True)
+        )
+    return found
+
+
+def find_near_duplicates(queryset, days=3, min_similarity=0.6, limit=100, chunk_size=500):
+    """
+    List pairs of transactions in queryset that look like the same payment.
+
+    A transaction is paired with the most similar earlier transaction (by
+    id) of the same account, type and amount dated at most `days` apart, if
+    their normalized merchant/title similarity reaches min_similarity.
+    Newest pairs come first. Transactions with any candidate are read in
+    keyset chunks of chunk_size, newest first, with one more query per chunk
+    for their candidates; reading stops once limit pairs are found.
+    """
+    from .models import Transaction
+
+    window = timedelta(days=days)
+    candidates = Transaction.objects.filter(
+        account_id=OuterRef('account_id'),
+        transaction_type=OuterRef('transaction_type'),
+        amount=OuterRef('amount'),
+        date__gte=OuterRef('date') - window,
+        date__lte=OuterRef('date') + window,
+        id__lt=OuterRef('id')
+    )
+
+    fields = ('id', 'account_id', 'transaction_type', 'amount', 'date', 'title', 'merchant', 'fingerprint')
+    ordered = queryset.filter(Exists(candidates)).order_by(F('date').desc(), F('id').desc()).values(*fields)
+
+    def label(row):
+        return normalize_label(f"{row['merchant']} {row['title']}")
+
+    pairs = []
+    position = None
+    while len(pairs) < limit:
+        chunk = ordered
+        if position is not None:
+            last_date, last_id = position
+            chunk = chunk.filter(Q(date__lte=last_date) & (Q(date__lt=last_date) | Q(date=last_date, id__lt=last_id)))
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            break
+        position = rows[-1]['date'], rows[-1]['id']
+
+        groups = defaultdict(list)
+        for candidate in Transaction.objects.filter(
+            account_id__in={row['account_id'] for row in rows},
+            amount__in={row['amount'] for row in rows},
+            date__range=(min(row['date'] for row in rows) - window, max(row['date'] for row in rows) + window)
+        ).order_by().values(*fields):
+            groups[candidate['account_id'], candidate['transaction_type'], candidate['amount']].append(candidate)
+
+        for row in rows:
+            best, best_similarity = None, min_similarity
+            for candidate in groups[row['account_id'], row['transaction_type'], row['amount']]:
+                if candidate['id'] >= row['id'] or abs(candidate['date'] - row['date']) > window:
+                    continue
+                similarity = SequenceMatcher(None, label(row), label(candidate)).ratio()
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+            if best is None:
+                continue
+            pairs.append({
+                'transaction_id': row['id'],
+                'duplicate_of_id': best['id'],
+                'account_id': row['account_id'],
+                'transaction_type': row['transaction_type'],
+                'amount': row['amount'],
+                'date': row['date'],
+                'duplicate_of_date': best['date'],
+                'title': row['title'],
+                'duplicate_of_title': best['title'],
+                'similarity': round(best_similarity, 3),
+                'imported': bool(row['fingerprint'] or best['fingerprint']),
+            })
+            if len(pairs) >= limit:
+                break
+
+        if len(rows) < chunk_size:
+            break
+    return pairs
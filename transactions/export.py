@@ -0,0 +1,115 @@
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .pagination import KEYSET_ORDERING
+
+
+# (output column, queryset lookup) pairs written by the export endpoint
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('account_id', 'account_id'),
+    ('account_name', 'account__account_name'),
+    ('username', 'account__user__username'),
+    ('transaction_type', 'transaction_type'),
+    ('category_id', 'category_id'),
+    ('category_name', 'category__name'),
+    ('amount', 'amount'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('date', 'date'),
+    ('time', 'time'),
+    ('payment_method', 'payment_method'),
+    ('to_account_id', 'to_account_id'),
+    ('merchant', 'merchant'),
+    ('location', 'location'),
+    ('tags', 'tags'),
+    ('is_recurring', 'is_recurring'),
+    ('is_verified', 'is_verified'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('created_by_id', 'created_by_id'),
+]
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object that returns what is written, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(queryset):
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    return queryset.order_by(*KEYSET_ORDERING).values_list(*lookups)
+
+
+def iter_export_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield transactions as tuples in EXPORT_COLUMNS order.
+
+    Rows are read through .iterator(), which uses a server-side cursor on
+    PostgreSQL, so only chunk_size rows are held in memory at a time.
+    """
+    return _export_rows(queryset).iterator(chunk_size=chunk_size)
+
+
+async def aiter_export_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Async version of iter_export_rows(), pulling chunk_size rows at a time in the ORM thread.
+
+    values_list().aiterator() is not used: Django fetches its chunks through
+    sync_to_async, but creates the sync iterator in the event loop thread
+    first, and ValuesListIterable.__iter__() is not a generator, so it runs
+    the query right there and raises SynchronousOnlyOperation. The
+    generator of .iterator() used here does not query until it is advanced,
+    which only happens in the ORM thread.
+    """
+    rows = iter_export_rows(queryset, chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while True:
+        chunk = await next_chunk()
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            break
+
+
+def _ndjson_encoder():
+    names = [name for name, _ in EXPORT_COLUMNS]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    return lambda row: encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def iter_ndjson(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield one JSON document per transaction, newline delimited"""
+    encode = _ndjson_encoder()
+    for row in iter_export_rows(queryset, chunk_size):
+        yield encode(row)
+
+
+async def aiter_ndjson(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Async version of iter_ndjson()"""
+    encode = _ndjson_encoder()
+    async for row in aiter_export_rows(queryset, chunk_size):
+        yield encode(row)
+
+
+def iter_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a CSV header followed by one CSV line per transaction"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in iter_export_rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+async def aiter_csv(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Async version of iter_csv()"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    async for row in aiter_export_rows(queryset, chunk_size):
+        yield writer.writerow(row)
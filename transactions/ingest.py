@@ -0,0 +1,182 @@
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Account
+from backend.cache import bump_version
+from .dedupe import assign_fingerprints, existing_fingerprints
+from .ledger import LedgerPosting
+from .models import Category, Transaction
+from .search import invalidate_search_index
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Fields a caller may set when ingesting transactions
+INGEST_FIELDS = (
+    'account_id', 'transaction_type', 'category_id', 'amount', 'title', 'description',
+    'date', 'time', 'payment_method', 'to_account_id', 'merchant', 'location', 'tags',
+    'is_recurring', 'is_verified',
+)
+
+# What to do with rows whose fingerprint is already stored (see dedupe.py)
+DUPLICATE_MODES = ('error', 'skip', 'merge')
+
+# Fields a merge copies from a duplicate row onto the stored transaction;
+# the others either make up the fingerprint or move balances
+MERGE_FIELDS = (
+    'category_id', 'description', 'time', 'payment_method', 'location', 'tags',
+    'is_recurring', 'is_verified',
+)
+
+# Relations are checked in bulk instead of once per row by full_clean()
+RELATION_FIELDS = ['account', 'to_account', 'category', 'created_by', 'receipt_image']
+
+
+class IngestError(Exception):
+    """Raised when rows of a batch fail validation; nothing is written"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid row(s)')
+        self.errors = errors  # [{'row': index, 'errors': {field: [messages]}}]
+
+
+def _clean_relation_ids(obj):
+    """Coerce raw foreign key values (e.g. strings from a CSV file) to ids"""
+    errors = {}
+    for name in ('account', 'to_account', 'category'):
+        field = Transaction._meta.get_field(name)
+        value = getattr(obj, field.attname)
+        if value is None:
+            continue
+        try:
+            setattr(obj, field.attname, field.target_field.to_python(value))
+        except ValidationError as exc:
+            errors[field.attname] = exc.messages
+    if errors:
+        raise ValidationError(errors)
+
+
+def build_transactions(rows, created_by=None):
+    """
+    Build and validate unsaved Transaction objects from dicts of INGEST_FIELDS.
+
+    Field validation uses the model's own validators; account and category
+    references are checked with one query per related model for the batch.
+    """
+    objects = []
+    errors = []
+    for index, row in enumerate(rows):
+        unknown = set(row) - set(INGEST_FIELDS)
+        if unknown:
+            errors.append({'row': index, 'errors': {field: ['Unknown field.'] for field in sorted(unknown)}})
+            continue
+
+        obj = Transaction(**{key: value for key, value in row.items() if value is not None}, created_by=created_by)
+        try:
+            _clean_relation_ids(obj)
+            obj.full_clean(exclude=RELATION_FIELDS, validate_unique=False, validate_constraints=False)
+        except ValidationError as exc:
+            errors.append({'row': index, 'errors': exc.message_dict})
+            continue
+        objects.append((index, obj))
+
+    account_ids = {obj.account_id for _, obj in objects} | {obj.to_account_id for _, obj in objects}
+    owners = dict(Account.objects.filter(pk__in=account_ids).values_list('pk', 'user_id'))
+    category_ids = {obj.category_id for _, obj in objects if obj.category_id}
+    existing_categories = set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+
+    for index, obj in objects:
+        row_errors = {}
+        if obj.account_id not in owners:
+            row_errors['account_id'] = ['Account does not exist.']
+        if obj.to_account_id and obj.to_account_id not in owners:
+            row_errors['to_account_id'] = ['Account does not exist.']
+        if obj.category_id and obj.category_id not in existing_categories:
+            row_errors['category_id'] = ['Category does not exist.']
+        if obj.transaction_type == 'TRANSFER' and not obj.to_account_id:
+            row_errors['to_account_id'] = ['Transfers require a target account.']
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+        obj.user_id = owners.get(obj.account_id)
+
+    if errors:
+        raise IngestError(sorted(errors, key=lambda error: error['row']))
+    return [obj for _, obj in objects]
+
+
+def ingest_transactions(rows, created_by=None, chunk_size=DEFAULT_CHUNK_SIZE, on_duplicate='error', occurrences=None):
+    """
+    Validate and insert a batch of transactions.
+
+    Rows are inserted with bulk_create in chunks of chunk_size; account
+    balances and daily rollups are then moved with one aggregated delta per
+    affected account, so the number of queries depends on the number of chunks
+    and accounts rather than on the number of rows. The whole batch is written atomically; if any
+    row is invalid IngestError is raised and nothing is written.
+
+    Every row is fingerprinted, and rows matching an already stored
+    fingerprint are handled per on_duplicate: 'error' rejects the batch,
+    'skip' leaves them out and 'merge' copies their MERGE_FIELDS onto the
+    stored transactions with one bulk UPDATE. The unique index on
+    (fingerprint, date) also rejects copies inserted concurrently by another
+    ingest. occurrences is passed on to assign_fingerprints().
+    """
+    if on_duplicate not in DUPLICATE_MODES:
+        raise ValueError(f"Unknown duplicate mode: {on_duplicate}")
+
+    objects = build_transactions(rows, created_by=created_by)
+    assign_fingerprints(objects, occurrences)
+
+    with transaction.atomic():
+        existing = existing_fingerprints((obj.fingerprint for obj in objects), chunk_size)
+        duplicates = [(index, obj) for index, obj in enumerate(objects) if obj.fingerprint in existing]
+        if duplicates and on_duplicate == 'error':
+            raise IngestError([
+                {'row': index, 'errors': {NON_FIELD_ERRORS: ['Duplicate of an existing transaction.']}}
+                for index, _ in duplicates
+            ])
+        if duplicates and on_duplicate == 'merge':
+            merge_duplicates([(rows[index], obj) for index, obj in duplicates], chunk_size)
+
+        objects = [obj for obj in objects if obj.fingerprint not in existing]
+        posting = LedgerPosting()
+        for obj in objects:
+            posting.add_transaction(obj)
+
+        created = Transaction.objects.bulk_create(objects, batch_size=chunk_size)
+        posting.post()
+        if created or duplicates:
+            # bulk_create and bulk_update do not send post_save, so invalidate caches explicitly
+            invalidate_search_index()
+            bump_version('transactions', 'accounts')
+
+    return {
+        'created_count': len(created),
+        'duplicate_count': len(duplicates),
+        'account_ids': posting.account_ids,
+    }
+
+
+def merge_duplicates(pairs, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Copy the MERGE_FIELDS given in each row onto the stored transaction with
+    the same fingerprint. pairs is a list of (row dict, built Transaction).
+    """
+    stored = {
+        obj.fingerprint: obj
+        for obj in Transaction.objects.filter(fingerprint__in=[duplicate.fingerprint for _, duplicate in pairs])
+    }
+    now = timezone.now()
+    fields = set()
+    for row, duplicate in pairs:
+        target = stored.get(duplicate.fingerprint)
+        if target is None:
+            # Archived transactions are read-only
+            continue
+        for name in MERGE_FIELDS:
+            if name in row:
+                setattr(target, name, getattr(duplicate, name))
+                fields.add(name)
+        target.updated_at = now
+    Transaction.objects.bulk_update(stored.values(), [*sorted(fields), 'updated_at'], batch_size=chunk_size)
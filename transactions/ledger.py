@@ -0,0 +1,257 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Account
+from backend.cache import bump_version
+
+
+# Transaction fields that determine its effect on balances and daily rollups
+POSTING_FIELDS = ('transaction_type', 'account_id', 'to_account_id', 'amount', 'date')
+
+
+class LedgerPosting:
+    """
+    Accumulates the effects of transaction writes and applies them in bulk.
+
+    Effects are aggregated per account (balances) and per (account, date,
+    transaction_type) (daily rollups), so posting one transaction or a
+    hundred thousand costs one UPDATE per affected account plus a couple of
+    queries for the rollup rows. post() must run inside transaction.atomic()
+    together with the writes that caused the effects.
+    """
+
+    def __init__(self):
+        self.balance_deltas = defaultdict(Decimal)
+        self.rollup_deltas = defaultdict(lambda: [Decimal('0.00'), 0])
+
+    def add(self, state, sign=1, count=1):
+        """
+        Add the effect of a transaction given as a POSTING_FIELDS tuple.
+
+        Use sign=-1 to reverse a previously posted transaction. The state may
+        also stand for count transactions of the same type, accounts and date,
+        with amount their total.
+        """
+        transaction_type, account_id, to_account_id, amount, date = state
+        amount = Decimal(str(amount)) * sign
+
+        if transaction_type == 'INCOME':
+            self.balance_deltas[account_id] += amount
+        elif transaction_type == 'EXPENSE':
+            self.balance_deltas[account_id] -= amount
+        elif transaction_type == 'TRANSFER' and to_account_id:
+            self.balance_deltas[account_id] -= amount
+            self.balance_deltas[to_account_id] += amount
+
+        rollup = self.rollup_deltas[(account_id, date, transaction_type)]
+        rollup[0] += amount
+        rollup[1] += sign * count
+
+    def add_transaction(self, obj, sign=1):
+        """Add the effect of an (unsaved or saved) Transaction instance"""
+        self.add(get_posting_state(obj), sign)
+
+    @property
+    def account_ids(self):
+        """Accounts whose balance changes when this posting is applied"""
+        return sorted(account_id for account_id, delta in self.balance_deltas.items() if delta)
+
+    def post(self):
+        post_balance_deltas(self.balance_deltas)
+        post_rollup_deltas(self.rollup_deltas)
+
+
+def get_posting_state(obj):
+    """Return the POSTING_FIELDS of a Transaction as a tuple"""
+    transaction_type, account_id, to_account_id, amount, date = (getattr(obj, field) for field in POSTING_FIELDS)
+    # The date default is timezone.now, so unsaved instances may hold a datetime
+    date = obj._meta.get_field('date').to_python(date)
+    return transaction_type, account_id, to_account_id, amount, date
+
+
+def post_balance_deltas(deltas):
+    """
+    Apply {account_id: delta} to account balances.
+
+    Each account gets a single UPDATE with a database-side F() expression, so
+    concurrent writers never overwrite each other's changes. Accounts are
+    updated in primary key order to keep lock ordering consistent across
+    concurrent callers.
+    """
+    now = timezone.now()
+    for account_id in sorted(deltas):
+        delta = deltas[account_id]
+        if delta:
+            Account.objects.filter(pk=account_id).update(
+                balance=F('balance') + delta,
+                updated_at=now
+            )
+
+
+def post_rollup_deltas(deltas):
+    """
+    Apply {(account_id, date, transaction_type): [amount, count]} to the daily rollups.
+
+    Existing rollup rows are locked and updated with bulk_update and missing
+    ones are inserted with bulk_create. If a concurrent writer inserts one of
+    the missing rows first, the remaining keys fall back to one F() update
+    (or insert) per key.
+    """
+    from .models import AccountDailyRollup
+
+    deltas = {key: value for key, value in deltas.items() if value[0] or value[1]}
+    if not deltas:
+        return
+
+    account_ids = {account_id for account_id, _, _ in deltas}
+    dates = [date for _, date, _ in deltas]
+    existing = {
+        (rollup.account_id, rollup.date, rollup.transaction_type): rollup
+        for rollup in AccountDailyRollup.objects.select_for_update().order_by().filter(
+            account_id__in=account_ids,
+            date__range=[min(dates), max(dates)]
+        )
+    }
+
+    updated = []
+    missing = []
+    for key in sorted(deltas):
+        amount, count = deltas[key]
+        rollup = existing.get(key)
+        if rollup is None:
+            account_id, date, transaction_type = key
+            missing.append(AccountDailyRollup(
+                account_id=account_id,
+                date=date,
+                transaction_type=transaction_type,
+                total_amount=amount,
+                transaction_count=count
+            ))
+        else:
+            rollup.total_amount += amount
+            rollup.transaction_count += count
+            updated.append(rollup)
+
+    if updated:
+        AccountDailyRollup.objects.bulk_update(updated, ['total_amount', 'transaction_count'], batch_size=1000)
+
+    if missing:
+        try:
+            with transaction.atomic():
+                AccountDailyRollup.objects.bulk_create(missing, batch_size=1000)
+        except IntegrityError:
+            for rollup in missing:
+                _upsert_rollup(rollup)
+
+
+def _upsert_rollup(rollup):
+    """Add one rollup delta, creating the row if it does not exist yet"""
+    from .models import AccountDailyRollup
+
+    lookup = {
+        'account_id': rollup.account_id,
+        'date': rollup.date,
+        'transaction_type': rollup.transaction_type,
+    }
+    changes = {
+        'total_amount': F('total_amount') + rollup.total_amount,
+        'transaction_count': F('transaction_count') + rollup.transaction_count,
+    }
+    if not AccountDailyRollup.objects.filter(**lookup).update(**changes):
+        try:
+            with transaction.atomic():
+                rollup.save(force_insert=True)
+        except IntegrityError:
+            AccountDailyRollup.objects.filter(**lookup).update(**changes)
+
+
+def rebuild_rollups(account_ids=None, batch_size=1000):
+    """
+    Recompute daily rollups from the Transaction table.
+
+    Rebuilds every account, or only the given account_ids, with one grouped
+    aggregate query. Returns the number of rollup rows written. Raises
+    ArchiveError for accounts with archived transactions (see
+    transactions.archive).
+    """
+    from django.db.models import Count, Sum
+    from .archive import check_not_archived
+    from .models import AccountDailyRollup, Transaction
+
+    check_not_archived(account_ids)
+
+    transactions = Transaction.objects.all()
+    rollups = AccountDailyRollup.objects.all()
+    if account_ids is not None:
+        transactions = transactions.filter(account_id__in=account_ids)
+        rollups = rollups.filter(account_id__in=account_ids)
+
+    rows = transactions.order_by().values('account_id', 'date', 'transaction_type').annotate(
+        total=Sum('amount'),
+        count=Count('id')
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        created = AccountDailyRollup.objects.bulk_create(
+            (
+                AccountDailyRollup(
+                    account_id=row['account_id'],
+                    date=row['date'],
+                    transaction_type=row['transaction_type'],
+                    total_amount=row['total'],
+                    transaction_count=row['count']
+                )
+                for row in rows.iterator(chunk_size=batch_size)
+            ),
+            batch_size=batch_size
+        )
+    bump_version('transactions', 'accounts')
+    return len(created)
+
+
+def rebuild_balances(account_ids=None):
+    """
+    Recompute account balances as initial_balance plus the effect of every transaction.
+
+    Uses the same rules as LedgerPosting and a single UPDATE with correlated
+    subqueries, so it is one statement however many accounts and
+    transactions there are. Returns the number of accounts updated. Raises
+    ArchiveError for accounts with archived transactions.
+    """
+    from django.db.models import Case, DecimalField, OuterRef, Q, Subquery, Sum, Value, When
+    from django.db.models.functions import Coalesce
+    from .archive import check_not_archived
+    from .models import Transaction
+
+    check_not_archived(account_ids)
+
+    zero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    outgoing = Transaction.objects.filter(account=OuterRef('pk')).order_by().values('account').annotate(
+        total=Sum(Case(
+            When(transaction_type='INCOME', then=F('amount')),
+            When(Q(transaction_type='EXPENSE') | Q(transaction_type='TRANSFER', to_account__isnull=False),
+                 then=-F('amount')),
+            default=zero
+        ))
+    ).values('total')
+    incoming = Transaction.objects.filter(
+        to_account=OuterRef('pk'),
+        transaction_type='TRANSFER'
+    ).order_by().values('to_account').annotate(total=Sum('amount')).values('total')
+
+    accounts = Account.objects.all()
+    if account_ids is not None:
+        accounts = accounts.filter(pk__in=account_ids)
+    updated = accounts.update(
+        balance=F('initial_balance') + Coalesce(Subquery(outgoing), zero) + Coalesce(Subquery(incoming), zero),
+        updated_at=timezone.now()
+    )
+    # A queryset update() does not send post_save, so invalidate caches explicitly
+    bump_version('transactions', 'accounts')
+    return updated
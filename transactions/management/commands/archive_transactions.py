@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move old transactions out of the database into compressed Parquet segments per account and month '
+        '(settings.TRANSACTION_ARCHIVE_DIR); the API keeps serving them from there'
+    )
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument(
+            '--before',
+            help='Archive the transactions dated before this date (YYYY-MM-DD)'
+        )
+        cutoff.add_argument(
+            '--older-than-days',
+            type=int,
+            help='Archive the transactions dated more than this many days ago'
+        )
+        parser.add_argument(
+            '--account',
+            type=int,
+            action='append',
+            dest='accounts',
+            help='Only archive this account ID (can be repeated)'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List the archives and check their segments against the manifests, without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for manifest in archive.load_manifests(status=None):
+                self.stdout.write(
+                    f"{manifest['archive_id']:<40} {manifest['status']:<9} before {manifest['cutoff']} "
+                    f"{manifest['rows']} rows in {len(manifest['segments'])} segments"
+                )
+            for problem in archive.verify_archives():
+                self.stdout.write(self.style.ERROR(problem))
+            return
+
+        if options['before']:
+            try:
+                cutoff = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['before']}")
+        elif options['older_than_days'] is not None:
+            cutoff = date.today() - timedelta(days=options['older_than_days'])
+        else:
+            raise CommandError('Give a cutoff with --before or --older-than-days')
+
+        for archive_id, status in archive.settle_pending():
+            self.stdout.write(f'Settled interrupted archive {archive_id}: {status}')
+
+        manifests = archive.archive_transactions(cutoff, account_ids=options['accounts'])
+        for manifest in manifests:
+            self.stdout.write(
+                f"Archived {manifest['rows']} transactions of account {manifest['account_id']} "
+                f"in {len(manifest['segments'])} segments ({manifest['archive_id']})"
+            )
+        total = sum(manifest['rows'] for manifest in manifests)
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} transactions dated before {cutoff}'))
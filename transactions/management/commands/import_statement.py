@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Account
+from transactions.ingest import DEFAULT_CHUNK_SIZE, IngestError
+from transactions.statements import STATEMENT_FORMATS, StatementError, import_statement
+
+
+class Command(BaseCommand):
+    help = 'Import a CSV or OFX bank statement into an account, skipping transactions already imported'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Statement file')
+        parser.add_argument(
+            '--account',
+            type=int,
+            required=True,
+            help='ID of the account the statement belongs to'
+        )
+        parser.add_argument(
+            '--format',
+            choices=STATEMENT_FORMATS,
+            default=None,
+            help='File format (default: guessed from the file extension)'
+        )
+        parser.add_argument(
+            '--column',
+            action='append',
+            default=[],
+            metavar='HEADER=FIELD',
+            help='Map a CSV header to a transaction field, e.g. "Booking Text=title" (repeatable)'
+        )
+        parser.add_argument(
+            '--date-format',
+            help='strptime format of the date column, e.g. %%d/%%m/%%Y (default: ISO dates)'
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='File encoding'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Number of rows parsed and staged per batch'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as created_by on the new transactions'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('ofx' if path.lower().endswith(('.ofx', '.qfx')) else 'csv')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        columns = {}
+        for mapping in options['column']:
+            header, separator, field = mapping.rpartition('=')
+            if not separator or not header:
+                raise CommandError(f"--column expects HEADER=FIELD, got '{mapping}'")
+            columns[header] = field
+
+        try:
+            account = Account.objects.get(pk=options['account'])
+        except Account.DoesNotExist:
+            raise CommandError(f"Account {options['account']} does not exist")
+
+        created_by = None
+        if options['user']:
+            try:
+                created_by = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        with open(path, newline='', encoding=options['encoding']) as handle:
+            try:
+                result = import_statement(
+                    handle,
+                    account,
+                    file_format=file_format,
+                    columns=columns,
+                    date_format=options['date_format'],
+                    created_by=created_by,
+                    chunk_size=options['chunk_size']
+                )
+            except StatementError as exc:
+                raise CommandError(str(exc))
+            except IngestError as exc:
+                for error in exc.errors[:20]:
+                    self.stderr.write(f"Row {error['row'] + 1}: {error['errors']}")
+                raise CommandError(f'{exc}; nothing was imported')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result['created_count']} of {result['row_count']} rows into {account} "
+                f"({result['duplicate_count']} duplicates skipped) in {result['elapsed']:.1f}s "
+                f"({result['rows_per_sec']:.0f} rows/sec)"
+            )
+        )
@@ -0,0 +1,108 @@
+import csv
+import json
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.ingest import DEFAULT_CHUNK_SIZE, DUPLICATE_MODES, IngestError, ingest_transactions
+
+
+class Command(BaseCommand):
+    help = 'Bulk ingest transactions from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV file with a header row, or NDJSON file with one transaction per line'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            default=None,
+            help='File format (default: guessed from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Number of rows validated and written per batch'
+        )
+        parser.add_argument(
+            '--on-duplicate',
+            choices=DUPLICATE_MODES,
+            default='error',
+            help='What to do with rows that were ingested before: stop, skip them or merge them into the stored rows'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as created_by on the new transactions'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        created_by = None
+        if options['user']:
+            try:
+                created_by = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        created_count = 0
+        duplicate_count = 0
+        offset = 0
+        # Shared across batches, so identical rows in different batches are told apart
+        occurrences = Counter()
+        started = time.perf_counter()
+
+        with open(path, newline='', encoding='utf-8') as handle:
+            rows = self.read_rows(handle, file_format)
+            while True:
+                batch = list(islice(rows, chunk_size))
+                if not batch:
+                    break
+                try:
+                    result = ingest_transactions(
+                        batch,
+                        created_by=created_by,
+                        chunk_size=chunk_size,
+                        on_duplicate=options['on_duplicate'],
+                        occurrences=occurrences
+                    )
+                except IngestError as exc:
+                    for error in exc.errors[:20]:
+                        self.stderr.write(f"Row {offset + error['row'] + 1}: {error['errors']}")
+                    raise CommandError(
+                        f'{exc} in batch starting at row {offset + 1}; '
+                        f'{created_count} transactions were ingested before it'
+                    )
+                created_count += result['created_count']
+                duplicate_count += result['duplicate_count']
+                offset += len(batch)
+                self.stdout.write(f'Ingested {created_count} transactions...')
+
+        elapsed = time.perf_counter() - started
+        rate = created_count / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Ingested {created_count} transactions ({duplicate_count} duplicates) '
+                f'in {elapsed:.1f}s ({rate:.0f} rows/sec)'
+            )
+        )
+
+    def read_rows(self, handle, file_format):
+        """Yield one dict per transaction, skipping empty CSV values"""
+        if file_format == 'ndjson':
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(handle):
+                yield {key: value for key, value in row.items() if value != ''}
@@ -0,0 +1,102 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from transactions import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain the date partitions of the transaction table (PostgreSQL): create the partitions of the '
+        'coming periods, and detach or re-attach old ones'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=settings.TRANSACTION_PARTITIONS_AHEAD,
+            help='Number of future periods to create partitions for (default: settings.TRANSACTION_PARTITIONS_AHEAD)'
+        )
+        parser.add_argument(
+            '--from',
+            dest='first',
+            help='Also create the partitions of the periods since this date (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--detach-before',
+            help=(
+                'Detach the partitions that end on or before this date (YYYY-MM-DD); their rows leave the API '
+                'but stay counted in balances and daily rollups'
+            )
+        )
+        parser.add_argument(
+            '--attach',
+            action='append',
+            default=[],
+            metavar='NAME',
+            help='Attach a detached partition again; may be repeated'
+        )
+        parser.add_argument(
+            '--tablespace',
+            help='Tablespace to move detached partitions to, or attached ones back to'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List the partitions and their estimated row counts, without changing anything'
+        )
+
+    def parse_date(self, value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}')
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            raise CommandError(
+                f'{partitions.TABLE} is not partitioned; partitioning needs PostgreSQL and migration 0008'
+            )
+
+        if options['list']:
+            for name, start, end, rows in partitions.list_partitions():
+                bounds = f'{start} .. {end}' if start else 'default'
+                self.stdout.write(f'{name:<40} {bounds:<26} ~{rows} rows')
+            return
+
+        interval = settings.TRANSACTION_PARTITION_INTERVAL
+        today = date.today()
+        last = today
+        for _ in range(options['ahead']):
+            last = partitions.period_end(partitions.period_start(last, interval), interval)
+        first = self.parse_date(options['first']) if options['first'] else today
+
+        for name in options['attach']:
+            try:
+                partitions.attach_partition(name, tablespace=options['tablespace'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f'Attached {name}')
+
+        created = partitions.create_partitions(first, last, interval)
+        self.stdout.write(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else ''}")
+
+        if options['detach_before']:
+            cutoff = self.parse_date(options['detach_before'])
+            for name, start, end, rows in partitions.list_partitions():
+                if start is not None and end <= cutoff:
+                    partitions.detach_partition(name, tablespace=options['tablespace'])
+                    self.stdout.write(f'Detached {name} (~{rows} rows)')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{partitions.DEFAULT_PARTITION}"')
+            outside = cursor.fetchone()[0]
+        if outside:
+            self.stdout.write(self.style.WARNING(
+                f'{outside} transactions are dated outside every partition and sit in '
+                f'{partitions.DEFAULT_PARTITION}; create their partitions with --from'
+            ))
+        self.stdout.write(self.style.SUCCESS('Partitions are up to date'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.archive import ArchiveError
+from transactions.ledger import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-account daily rollups from the transactions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--account',
+            type=int,
+            action='append',
+            dest='accounts',
+            help='Only rebuild this account ID (can be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows written per INSERT'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            count = rebuild_rollups(account_ids=options['accounts'], batch_size=options['batch_size'])
+        except ArchiveError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily rollup rows'))
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.recurring import DEFAULT_BATCH_SIZE, materialize_recurring
+
+
+class Command(BaseCommand):
+    help = 'Create the due transactions of every auto_create recurring transaction, catching up missed periods'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Create occurrences due on or before this date (YYYY-MM-DD, default: today)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Number of recurring transactions locked and processed per database transaction'
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        templates, created = materialize_recurring(today=today, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} transactions from {templates} recurring transactions'
+        ))
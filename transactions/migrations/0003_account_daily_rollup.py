@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:16
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    AccountDailyRollup = apps.get_model('transactions', 'AccountDailyRollup')
+
+    rows = Transaction.objects.order_by().values('account_id', 'date', 'transaction_type').annotate(
+        total=models.Sum('amount'),
+        count=models.Count('id')
+    )
+    AccountDailyRollup.objects.bulk_create(
+        (
+            AccountDailyRollup(
+                account_id=row['account_id'],
+                date=row['date'],
+                transaction_type=row['transaction_type'],
+                total_amount=row['total'],
+                transaction_count=row['count']
+            )
+            for row in rows.iterator(chunk_size=1000)
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('transactions', '0002_transaction_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('INCOME', 'Income'), ('EXPENSE', 'Expense'), ('TRANSFER', 'Transfer')], max_length=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='accounts.account')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('account', 'date', 'transaction_type'), name='unique_account_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
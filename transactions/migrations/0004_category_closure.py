@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_closure(apps, schema_editor):
+    Category = apps.get_model('transactions', 'Category')
+    CategoryClosure = apps.get_model('transactions', 'CategoryClosure')
+
+    parents = dict(Category.objects.order_by().values_list('id', 'parent_id'))
+    links = []
+    for category_id in parents:
+        chain = [category_id]
+        parent_id = parents[category_id]
+        while parent_id is not None and parent_id not in chain:
+            chain.append(parent_id)
+            parent_id = parents.get(parent_id)
+        if parent_id is not None:
+            continue
+        links.extend(
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth)
+            for depth, ancestor_id in enumerate(chain)
+        )
+    CategoryClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_account_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='transactions.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='transactions.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='category_closure_desc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_category_closure')],
+            },
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+# search_vector is a stored generated column, so PostgreSQL keeps it up to
+# date on every INSERT/UPDATE, including bulk_create and queryset.update().
+# It is not declared on the model; transactions.search queries it directly.
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE transactions_transaction ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(merchant, '')), 'B') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX transaction_search_idx ON transactions_transaction USING GIN (search_vector)",
+    # icontains compiles to UPPER(column) LIKE UPPER(%s) on PostgreSQL
+    "CREATE INDEX transaction_title_trgm_idx ON transactions_transaction USING GIN (UPPER(title) gin_trgm_ops)",
+    "CREATE INDEX transaction_merchant_trgm_idx ON transactions_transaction USING GIN (UPPER(merchant) gin_trgm_ops)",
+    "CREATE INDEX transaction_description_trgm_idx "
+    "ON transactions_transaction USING GIN (UPPER(description) gin_trgm_ops)",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS transaction_description_trgm_idx",
+    "DROP INDEX IF EXISTS transaction_merchant_trgm_idx",
+    "DROP INDEX IF EXISTS transaction_title_trgm_idx",
+    "DROP INDEX IF EXISTS transaction_search_idx",
+    "ALTER TABLE transactions_transaction DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_category_closure'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(POSTGRESQL_FORWARD), run_on_postgresql(POSTGRESQL_BACKWARD)),
+    ]
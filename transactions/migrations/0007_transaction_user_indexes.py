@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_users(apps, schema_editor):
+    Account = apps.get_model('accounts', 'Account')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    Transaction.objects.update(
+        user_id=models.Subquery(Account.objects.filter(pk=models.OuterRef('account_id')).values('user_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('transactions', '0006_transaction_fingerprint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False, help_text='Owner of the account (denormalized from account.user)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to=settings.AUTH_USER_MODEL),
+        ),
+        # Before the indexes on user, so they are built once
+        migrations.RunPython(backfill_users, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', '-date', '-time', 'id'], name='transaction_account_keyset_idx'),
+        ),
+        # Leads with the same columns as the index above
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_account_4f6194_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-time', 'id'], name='transaction_user_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'amount'], name='transaction_user_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('is_verified', False)), fields=['user', '-date', '-time', 'id'], name='transaction_unverified_idx'),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:14
+
+from datetime import date
+
+from django.conf import settings
+from django.db import migrations, models
+
+from transactions.partitions import (
+    DEFAULT_PARTITION, TABLE, create_partition_sql, period_end, period_start, periods, stored_columns
+)
+
+
+OLD_TABLE = f'{TABLE}_old'
+MAX_YEARS_BACK = 50
+
+
+def rebuild_table(schema_editor, partitioned):
+    """
+    Copy transactions_transaction into a new table partitioned by RANGE (date), or back into a plain one.
+
+    Indexes, foreign keys and check constraints are read from the catalog
+    and recreated on the new table once the rows are in, so the search
+    indexes of 0005 come along. The primary key becomes (id, date) on the
+    partitioned table, as PostgreSQL requires.
+    """
+    execute = schema_editor.execute
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(%s) AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid AND c.conrelid = x.indrelid
+            )
+            """,
+            [TABLE]
+        )
+        # Indexes of a partitioned table are created ON ONLY the parent
+        indexes = [definition.replace(' ON ONLY ', ' ON ') for _, definition in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'u', 'f', 'c', 'x')",
+            [TABLE]
+        )
+        constraints = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f'SELECT min(date), max(date) FROM "{TABLE}"')
+        first, last = cursor.fetchone()
+
+    execute(f'ALTER TABLE "{TABLE}" RENAME TO "{OLD_TABLE}"')
+    execute(f'ALTER SEQUENCE {sequence} RENAME TO "{OLD_TABLE}_id_seq"')
+    execute(
+        f'CREATE TABLE "{TABLE}" (LIKE "{OLD_TABLE}" INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING GENERATED '
+        f'INCLUDING STORAGE)' + (' PARTITION BY RANGE (date)' if partitioned else '')
+    )
+    if partitioned:
+        interval = settings.TRANSACTION_PARTITION_INTERVAL
+        today = date.today()
+        ahead = today
+        for _ in range(settings.TRANSACTION_PARTITIONS_AHEAD):
+            ahead = period_end(period_start(ahead, interval), interval)
+        # Dates further back are most likely typos; they go to the default partition
+        first = max(first or today, today.replace(year=today.year - MAX_YEARS_BACK, month=1, day=1))
+        for start, end in periods(min(first, today), max(last or today, ahead), interval):
+            execute(create_partition_sql(start, end, interval))
+        execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        columns = stored_columns(cursor, OLD_TABLE)
+    execute(f'INSERT INTO "{TABLE}" ({columns}) SELECT {columns} FROM "{OLD_TABLE}"')
+    execute(f'DROP TABLE "{OLD_TABLE}"')
+    execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), coalesce(max(id), 0) + 1, false) FROM \"{TABLE}\""
+    )
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = 'PRIMARY KEY (id, date)' if partitioned else 'PRIMARY KEY (id)'
+        execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+    for definition in indexes:
+        execute(definition)
+    execute(f'ANALYZE "{TABLE}"')
+
+
+def partition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_table(schema_editor, partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('transactions', '0007_transaction_user_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='transaction',
+            name='transaction_fingerprint_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint__isnull', False)), fields=('fingerprint', 'date'), name='transaction_fingerprint_unique'),
+        ),
+        migrations.RunPython(partition, unpartition),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.utils import timezone
@@ -37,10 +38,60 @@ class Category(models.Model):
 
     def get_full_path(self):
         """Get full category path including parent categories"""
+        from .category_tree import get_category_tree
+
+        # Saved, unmodified categories are resolved from the tree cache
+        node = get_category_tree().get(self.pk) if self.pk else None
+        if node and node.name == self.name and node.parent_id == self.parent_id:
+            return node.full_path
         if self.parent:
             return f"{self.parent.get_full_path()} > {self.name}"
         return self.name
 
+    def clean(self):
+        if self.pk and self.parent_id and (
+            self.parent_id == self.pk or
+            CategoryClosure.objects.filter(ancestor_id=self.pk, descendant_id=self.parent_id).exists()
+        ):
+            raise ValidationError({'parent': 'A category cannot be moved under itself or one of its subcategories.'})
+
+    def save(self, *args, **kwargs):
+        """Override save to keep the category closure table in sync"""
+        from .closure import insert_category, move_category
+
+        with transaction.atomic():
+            adding = self._state.adding
+            if not adding:
+                old_parent_id = Category.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+            super().save(*args, **kwargs)
+            if adding:
+                insert_category(self)
+            elif old_parent_id != self.parent_id:
+                move_category(self)
+
+
+class CategoryClosure(models.Model):
+    """
+    Ancestor/descendant pairs of the category tree, maintained by Category.save().
+
+    Every category is also paired with itself at depth 0, so filtering on
+    ancestor selects a category together with all of its subcategories.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_category_closure'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor'], name='category_closure_desc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
 
 class Transaction(models.Model):
     """Transaction model for recording financial transactions"""
@@ -62,6 +113,17 @@ class Transaction(models.Model):
     ]
 
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions')
+    # Copy of account.user, so lists can filter by owner without joining accounts;
+    # set by save() and by every bulk insert, and updated when an account changes owner
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        editable=False,
+        db_index=False,
+        related_name='transactions',
+        help_text="Owner of the account (denormalized from account.user)"
+    )
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions')
     amount = models.DecimalField(
@@ -96,64 +158,105 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_transactions')
+    fingerprint = models.CharField(
+        max_length=32,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Identifies the source row of an imported transaction (see transactions.dedupe)"
+    )
 
     class Meta:
         ordering = ['-date', '-time']
+        constraints = [
+            # Only imported transactions carry a fingerprint. It hashes the
+            # date, so adding date changes nothing but lets the index exist on
+            # a table partitioned by date (see transactions.partitions)
+            models.UniqueConstraint(
+                fields=['fingerprint', 'date'],
+                condition=models.Q(fingerprint__isnull=False),
+                name='transaction_fingerprint_unique'
+            ),
+        ]
         indexes = [
-            models.Index(fields=['account', 'date']),
             models.Index(fields=['transaction_type', 'date']),
             models.Index(fields=['category', 'date']),
+            # Match the keyset ordering used by cursor pagination, alone and
+            # after the account and user filters, so filtered pages are read
+            # in order without a sort
+            models.Index(fields=['-date', '-time', 'id'], name='transaction_keyset_idx'),
+            models.Index(fields=['account', '-date', '-time', 'id'], name='transaction_account_keyset_idx'),
+            models.Index(fields=['user', '-date', '-time', 'id'], name='transaction_user_keyset_idx'),
+            models.Index(fields=['user', 'amount'], name='transaction_user_amount_idx'),
+            # Unverified transactions are the few awaiting reconciliation
+            models.Index(
+                fields=['user', '-date', '-time', 'id'],
+                condition=models.Q(is_verified=False),
+                name='transaction_unverified_idx'
+            ),
         ]
 
     def __str__(self):
         return f"{self.title} - {self.amount} ({self.transaction_type})"
 
+    def _get_posted_state(self):
+        """
+        Posting fields stored in the database for this transaction, or None if it is not stored.
+
+        The row is locked until the surrounding transaction ends, so the
+        posting is computed against what is stored rather than against what
+        this instance read earlier (it may be stale); run inside transaction.atomic().
+        """
+        from .ledger import POSTING_FIELDS
+
+        return Transaction.objects.select_for_update().filter(pk=self.pk).values_list(*POSTING_FIELDS).first()
+
     def save(self, *args, **kwargs):
-        """Override save to update account balance"""
+        """Override save to update account balance and daily rollups"""
+        from .ledger import POSTING_FIELDS, LedgerPosting, get_posting_state
+
         is_new = self.pk is None
-        old_amount = None
-        old_type = None
-
-        if not is_new:
-            # Get old values if updating
-            old_transaction = Transaction.objects.get(pk=self.pk)
-            old_amount = old_transaction.amount
-            old_type = old_transaction.transaction_type
-
-        super().save(*args, **kwargs)
-
-        # Update account balance
-        if is_new:
-            if self.transaction_type == 'INCOME':
-                self.account.update_balance(self.amount)
-            elif self.transaction_type == 'EXPENSE':
-                self.account.update_balance(-self.amount)
-            elif self.transaction_type == 'TRANSFER' and self.to_account:
-                self.account.update_balance(-self.amount)
-                self.to_account.update_balance(self.amount)
-        else:
-            # Handle updates
-            if old_type == 'INCOME':
-                self.account.update_balance(-old_amount)
-            elif old_type == 'EXPENSE':
-                self.account.update_balance(old_amount)
-
-            if self.transaction_type == 'INCOME':
-                self.account.update_balance(self.amount)
-            elif self.transaction_type == 'EXPENSE':
-                self.account.update_balance(-self.amount)
+        update_fields = kwargs.get('update_fields')
+        posting = LedgerPosting()
+
+        def is_saved(field):
+            return update_fields is None or field in update_fields or field.removesuffix('_id') in update_fields
+
+        with transaction.atomic():
+            posts = any(is_saved(field) for field in POSTING_FIELDS)
+            old_state = self._get_posted_state() if posts and not is_new else None
+            if is_new or (posts and old_state is None):
+                self.user_id = self.account.user_id
+                posting.add_transaction(self)
+            elif posts:
+                # Fields left out of update_fields keep their stored value
+                new_state = tuple(
+                    new if is_saved(field) else old
+                    for field, new, old in zip(POSTING_FIELDS, get_posting_state(self), old_state)
+                )
+                if new_state != old_state:
+                    posting.add(old_state, sign=-1)
+                    posting.add(new_state)
+                if is_saved('account_id') and self.account_id != old_state[1]:
+                    self.user_id = self.account.user_id
+                    if update_fields is not None:
+                        kwargs['update_fields'] = [*update_fields, 'user']
+
+            super().save(*args, **kwargs)
+            posting.post()
 
     def delete(self, *args, **kwargs):
-        """Override delete to update account balance"""
-        if self.transaction_type == 'INCOME':
-            self.account.update_balance(-self.amount)
-        elif self.transaction_type == 'EXPENSE':
-            self.account.update_balance(self.amount)
-        elif self.transaction_type == 'TRANSFER' and self.to_account:
-            self.account.update_balance(self.amount)
-            self.to_account.update_balance(-self.amount)
-
-        super().delete(*args, **kwargs)
+        """Override delete to update account balance and daily rollups"""
+        from .ledger import LedgerPosting
+
+        posting = LedgerPosting()
+        with transaction.atomic():
+            old_state = self._get_posted_state()
+            if old_state is not None:
+                posting.add(old_state, sign=-1)
+            result = super().delete(*args, **kwargs)
+            posting.post()
+        return result
 
     def get_tags_list(self):
         """Return tags as a list"""
@@ -162,6 +265,27 @@ class Transaction(models.Model):
         return []
 
 
+class AccountDailyRollup(models.Model):
+    """Per-account daily totals by transaction type, kept in sync by Transaction writes"""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    transaction_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'date', 'transaction_type'],
+                name='unique_account_daily_rollup'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} {self.date} {self.transaction_type}: {self.total_amount} ({self.transaction_count})"
+
+
 class RecurringTransaction(models.Model):
     """Model for setting up recurring transactions"""
 
@@ -201,38 +325,46 @@ class RecurringTransaction(models.Model):
     def __str__(self):
         return f"{self.title} - {self.frequency} ({self.amount})"
 
-    def create_transaction(self):
-        """Create a transaction from this recurring template"""
-        transaction = Transaction.objects.create(
-            account=self.account,
-            transaction_type=self.transaction_type,
-            category=self.category,
-            amount=self.amount,
-            title=self.title,
-            description=self.description,
-            date=self.next_due_date,
-            is_recurring=True,
-            created_by=self.user
-        )
-
-        # Update next due date
+    def get_next_date(self, date):
+        """Return the occurrence that follows date, one period later"""
         from datetime import timedelta
+        from dateutil.relativedelta import relativedelta
+
         if self.frequency == 'DAILY':
-            self.next_due_date += timedelta(days=1)
+            return date + timedelta(days=1)
         elif self.frequency == 'WEEKLY':
-            self.next_due_date += timedelta(weeks=1)
+            return date + timedelta(weeks=1)
         elif self.frequency == 'BIWEEKLY':
-            self.next_due_date += timedelta(weeks=2)
+            return date + timedelta(weeks=2)
         elif self.frequency == 'MONTHLY':
             # Handle month-end dates properly
-            from dateutil.relativedelta import relativedelta
-            self.next_due_date += relativedelta(months=1)
+            return date + relativedelta(months=1)
         elif self.frequency == 'QUARTERLY':
-            from dateutil.relativedelta import relativedelta
-            self.next_due_date += relativedelta(months=3)
+            return date + relativedelta(months=3)
         elif self.frequency == 'YEARLY':
-            from dateutil.relativedelta import relativedelta
-            self.next_due_date += relativedelta(years=1)
+            return date + relativedelta(years=1)
+        return date
 
+    def build_transaction(self, date=None):
+        """Return an unsaved transaction for the occurrence on date (next_due_date by default)"""
+        return Transaction(
+            account_id=self.account_id,
+            transaction_type=self.transaction_type,
+            category_id=self.category_id,
+            amount=self.amount,
+            title=self.title,
+            description=self.description,
+            date=date or self.next_due_date,
+            is_recurring=True,
+            created_by_id=self.user_id
+        )
+
+    def create_transaction(self):
+        """Create a transaction from this recurring template"""
+        transaction = self.build_transaction()
+        transaction.save()
+
+        # Update next due date
+        self.next_due_date = self.get_next_date(self.next_due_date)
         self.save()
         return transaction
@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import date, time
+from math import ceil
+from operator import attrgetter
+
+from django.db.models import Q
+
+
+# Keyset ordering used by cursor pagination. It extends Transaction.Meta.ordering
+# with the primary key so that every row has a unique, stable position.
+KEYSET_ORDERING = ('-date', '-time', 'id')
+REVERSE_KEYSET_ORDERING = ('date', 'time', '-id')
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def encode_cursor(key, direction):
+    """Encode a (date, time, id) keyset position as an opaque cursor token"""
+    key_date, key_time, key_id = key
+    payload = {
+        'd': key_date.isoformat(),
+        't': key_time.isoformat(),
+        'i': key_id,
+        'dir': direction,
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token into ((date, time, id), direction)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = (
+            date.fromisoformat(payload['d']),
+            time.fromisoformat(payload['t']),
+            int(payload['i']),
+        )
+        direction = payload['dir']
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+    if direction not in ('next', 'prev'):
+        raise InvalidCursor('Invalid cursor')
+    return key, direction
+
+
+def _after(key):
+    """Rows that come after key in KEYSET_ORDERING"""
+    key_date, key_time, key_id = key
+    # The redundant date bound lets PostgreSQL skip the partitions (see
+    # transactions.partitions) and index ranges on the wrong side of the key
+    return Q(date__lte=key_date) & (
+        Q(date__lt=key_date) |
+        Q(date=key_date, time__lt=key_time) |
+        Q(date=key_date, time=key_time, id__gt=key_id)
+    )
+
+
+def _before(key):
+    """Rows that come before key in KEYSET_ORDERING"""
+    key_date, key_time, key_id = key
+    return Q(date__gte=key_date) & (
+        Q(date__gt=key_date) |
+        Q(date=key_date, time__gt=key_time) |
+        Q(date=key_date, time=key_time, id__lt=key_id)
+    )
+
+
+def _keyset_page(queryset, cursor):
+    """Filter and order queryset for the page after/before cursor; returns (queryset, direction)"""
+    direction = 'next'
+    if cursor:
+        position, direction = decode_cursor(cursor)
+        if direction == 'next':
+            queryset = queryset.filter(_after(position))
+        else:
+            queryset = queryset.filter(_before(position))
+
+    if direction == 'next':
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+    else:
+        queryset = queryset.order_by(*REVERSE_KEYSET_ORDERING)
+    return queryset, direction
+
+
+def _cursor_page(rows, page_size, cursor, direction, row_key):
+    """Trim the page_size + 1 fetched rows to a page and compute its cursors"""
+    row_key = row_key or attrgetter('date', 'time', 'id')
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if direction == 'prev':
+        rows.reverse()
+        has_next = cursor is not None
+        has_prev = has_more
+    else:
+        has_next = has_more
+        has_prev = cursor is not None
+
+    next_cursor = encode_cursor(row_key(rows[-1]), 'next') if rows and has_next else None
+    prev_cursor = encode_cursor(row_key(rows[0]), 'prev') if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def paginate_by_cursor(queryset, page_size, cursor=None, row_key=None):
+    """
+    Fetch one page of transactions using keyset pagination.
+
+    Returns (rows, next_cursor, prev_cursor). Only page_size + 1 rows are read
+    regardless of how deep the page is, and no COUNT query is issued. row_key
+    extracts (date, time, id) from a row; it defaults to attribute access,
+    pass e.g. ValuesSerializer.key() for values_list() querysets.
+    """
+    queryset, direction = _keyset_page(queryset, cursor)
+    rows = list(queryset[:page_size + 1])
+    return _cursor_page(rows, page_size, cursor, direction, row_key)
+
+
+async def apaginate_by_cursor(queryset, page_size, cursor=None, row_key=None):
+    """Async version of paginate_by_cursor()"""
+    queryset, direction = _keyset_page(queryset, cursor)
+    rows = [row async for row in queryset[:page_size + 1]]
+    return _cursor_page(rows, page_size, cursor, direction, row_key)
+
+
+async def apaginate(queryset, page, page_size):
+    """
+    Fetch one page of queryset by page number with the async ORM.
+
+    Returns (rows, total_count). Like Paginator.get_page(), a page past the
+    end returns the last page.
+    """
+    total_count = await queryset.acount()
+    page = min(page, max(ceil(total_count / page_size), 1))
+    offset = (page - 1) * page_size
+    rows = [row async for row in queryset[offset:min(offset + page_size, total_count)]]
+    return rows, total_count
@@ -0,0 +1,183 @@
+"""
+Range partitioning of the Transaction table by date (PostgreSQL).
+
+Migration 0008 turns transactions_transaction into a table partitioned by
+RANGE (date), one partition per month or per year of dates
+(settings.TRANSACTION_PARTITION_INTERVAL), plus a default partition for
+dates outside every partition. Queries bounded by date (the list date
+filters, keyset cursors, budget windows, date__year lookups) only read the
+partitions in range.
+
+PostgreSQL requires unique indexes of a partitioned table to include the
+partition key: the primary key is (id, date) in the database, while the
+model keeps id as its primary key (ids still come from a single sequence),
+and the fingerprint unique index is (fingerprint, date).
+
+The partition_transactions command creates partitions ahead of time and
+detaches old ones, e.g. to move them to a cheaper tablespace. A detached
+partition is a plain table: its rows leave the API, but account balances
+and daily rollups still include them, so do not run rebuild_rollups or
+recompute balances from transactions while partitions are detached.
+
+Other databases keep a single table; the functions here require PostgreSQL.
+"""
+import re
+from datetime import date
+
+from django.db import connections, transaction
+
+
+TABLE = 'transactions_transaction'
+DEFAULT_PARTITION = f'{TABLE}_default'
+INTERVALS = ('month', 'year')
+
+BOUND_RE = re.compile(r"FOR VALUES FROM \('([0-9-]+)'\) TO \('([0-9-]+)'\)")
+NAME_RE = re.compile(rf'^{TABLE}_p([0-9]{{4}})([0-9]{{2}})?$')
+
+
+def period_start(day, interval):
+    """First day of the month or year containing day"""
+    return day.replace(month=1, day=1) if interval == 'year' else day.replace(day=1)
+
+
+def period_end(start, interval):
+    """First day of the period after the one starting on start"""
+    if interval == 'year':
+        return start.replace(year=start.year + 1)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def periods(first, last, interval):
+    """(start, end) of every period from the one containing first to the one containing last"""
+    start = period_start(first, interval)
+    while start <= last:
+        end = period_end(start, interval)
+        yield start, end
+        start = end
+
+
+def partition_name(start, interval):
+    return f'{TABLE}_p{start:%Y}' if interval == 'year' else f'{TABLE}_p{start:%Y%m}'
+
+
+def parse_partition_name(name):
+    """(start, end) of the period a partition name stands for"""
+    match = NAME_RE.match(name)
+    if not match:
+        raise ValueError(f'Not a transaction partition name: {name}')
+    year, month = int(match[1]), match[2]
+    if month is None:
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    start = date(year, int(month), 1)
+    return start, period_end(start, 'month')
+
+
+def is_partitioned(using='default'):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [TABLE])
+        return cursor.fetchone()[0]
+
+
+def list_partitions(using='default'):
+    """
+    Attached partitions as (name, start, end, estimated rows), in date order.
+
+    start and end are None for the default partition, which comes last.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [TABLE]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound, estimate in rows:
+        match = BOUND_RE.search(bound)
+        start, end = (date.fromisoformat(match[1]), date.fromisoformat(match[2])) if match else (None, None)
+        partitions.append((name, start, end, max(estimate, 0)))
+    return sorted(partitions, key=lambda partition: (partition[1] is None, partition[1] or date.min))
+
+
+def stored_columns(cursor, table=TABLE):
+    """Columns of table that can be inserted into, i.e. all but generated ones, quoted"""
+    cursor.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+        """,
+        [table]
+    )
+    return ', '.join(f'"{name}"' for name, in cursor.fetchall())
+
+
+def create_partition_sql(start, end, interval):
+    return (
+        f'CREATE TABLE "{partition_name(start, interval)}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def create_partitions(first, last, interval, using='default'):
+    """
+    Create the missing partitions for the periods from first to last.
+
+    Periods that overlap an existing partition are skipped. Rows of a new
+    period that went to the default partition are moved into it. Returns
+    the names of the created partitions.
+    """
+    connection = connections[using]
+    partitions = list_partitions(using)
+    existing = [(start, end) for _, start, end, _ in partitions if start is not None]
+    has_default = len(existing) < len(partitions)
+    created = []
+    for start, end in periods(first, last, interval):
+        if any(start < other_end and other_start < end for other_start, other_end in existing):
+            continue
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            if has_default:
+                # Rows of the new range in the default partition would make CREATE ... PARTITION OF fail
+                cursor.execute(
+                    f'CREATE TEMPORARY TABLE partition_rows AS '
+                    f'SELECT * FROM "{DEFAULT_PARTITION}" WHERE date >= %s AND date < %s',
+                    [start, end]
+                )
+                cursor.execute(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE date >= %s AND date < %s', [start, end])
+                moved = cursor.rowcount
+            cursor.execute(create_partition_sql(start, end, interval))
+            if has_default:
+                if moved:
+                    columns = stored_columns(cursor)
+                    cursor.execute(f'INSERT INTO "{TABLE}" ({columns}) SELECT {columns} FROM partition_rows')
+                cursor.execute('DROP TABLE partition_rows')
+        existing.append((start, end))
+        created.append(partition_name(start, interval))
+    return created
+
+
+def detach_partition(name, tablespace=None, using='default'):
+    """Detach a partition, leaving a plain table, and optionally move it to tablespace"""
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+        if tablespace:
+            cursor.execute(f'ALTER TABLE "{name}" SET TABLESPACE "{tablespace}"')
+
+
+def attach_partition(name, tablespace=None, using='default'):
+    """Attach a previously detached partition again, optionally moving it back to tablespace first"""
+    start, end = parse_partition_name(name)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        if tablespace:
+            cursor.execute(f'ALTER TABLE "{name}" SET TABLESPACE "{tablespace}"')
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
@@ -0,0 +1,101 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from accounts.models import Account
+from backend.cache import bump_version
+from .ledger import LedgerPosting
+from .models import RecurringTransaction, Transaction
+from .search import invalidate_search_index
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def due_templates(today):
+    """auto_create templates with at least one occurrence due on or before today"""
+    return RecurringTransaction.objects.filter(
+        is_active=True,
+        auto_create=True,
+        next_due_date__lte=today
+    ).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=F('next_due_date'))
+    )
+
+
+def iter_occurrences(template, today):
+    """Yield every due occurrence date of template up to today (and its end_date)"""
+    date = template.next_due_date
+    last = min(today, template.end_date) if template.end_date else today
+    while date <= last:
+        yield date
+        next_date = template.get_next_date(date)
+        if next_date <= date:
+            break
+        date = next_date
+
+
+def materialize_batch(today, batch_size=DEFAULT_BATCH_SIZE, chunk_size=1000):
+    """
+    Create the due transactions of up to batch_size templates in one database transaction.
+
+    Templates are locked with SELECT ... FOR UPDATE SKIP LOCKED, so parallel
+    workers split the due templates between them instead of waiting on (or
+    duplicating) each other's work. Advancing next_due_date commits together
+    with the created transactions, which makes re-runs idempotent.
+
+    Returns (templates processed, transactions created); (0, 0) when nothing
+    unlocked is due.
+    """
+    with transaction.atomic():
+        templates = list(
+            due_templates(today).select_for_update(skip_locked=True).order_by('pk')[:batch_size]
+        )
+        if not templates:
+            return 0, 0
+
+        now = timezone.now()
+        owners = dict(
+            Account.objects.filter(pk__in={template.account_id for template in templates}).values_list('pk', 'user_id')
+        )
+        objects = []
+        for template in templates:
+            dates = list(iter_occurrences(template, today))
+            for date in dates:
+                obj = template.build_transaction(date)
+                obj.user_id = owners[template.account_id]
+                objects.append(obj)
+            template.next_due_date = template.get_next_date(dates[-1])
+            template.updated_at = now
+
+        posting = LedgerPosting()
+        for obj in objects:
+            posting.add_transaction(obj)
+
+        Transaction.objects.bulk_create(objects, batch_size=chunk_size)
+        posting.post()
+        RecurringTransaction.objects.bulk_update(templates, ['next_due_date', 'updated_at'], batch_size=chunk_size)
+
+        # bulk_create does not send post_save, so invalidate caches explicitly
+        invalidate_search_index()
+        bump_version('transactions', 'accounts')
+
+    return len(templates), len(objects)
+
+
+def materialize_recurring(today=None, batch_size=DEFAULT_BATCH_SIZE, chunk_size=1000):
+    """
+    Create every missed occurrence of every due auto_create template up to today.
+
+    Works through the due templates in batches until none are left; safe to
+    run from several processes at once. Returns (templates, transactions).
+    """
+    today = today or timezone.now().date()
+    total_templates = total_transactions = 0
+    while True:
+        templates, created = materialize_batch(today, batch_size, chunk_size)
+        if not created:
+            break
+        total_templates += templates
+        total_transactions += created
+    return total_templates, total_transactions
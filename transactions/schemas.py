@@ -1,7 +1,8 @@
 from ninja import Schema
-from typing import Optional
+from typing import Literal, Optional
 from decimal import Decimal
 from datetime import datetime, date, time
+import datetime as dt
 
 
 class CategorySchema(Schema):
@@ -115,10 +116,12 @@ class CategoryListResponse(Schema):
 class TransactionListResponse(Schema):
     """Response schema for transaction list with pagination"""
     transactions: list[TransactionSchema]
-    total_count: int
-    page: int
+    total_count: Optional[int]  # Omitted in cursor mode unless include_total is set
+    page: Optional[int]  # Not used in cursor mode
     page_size: int
-    total_pages: int
+    total_pages: Optional[int]
+    next_cursor: Optional[str] = None  # Cursor mode only
+    prev_cursor: Optional[str] = None  # Cursor mode only
 
 
 class RecurringTransactionListResponse(Schema):
@@ -128,3 +131,80 @@ class RecurringTransactionListResponse(Schema):
     page: int
     page_size: int
     total_pages: int
+
+
+class TransactionIngestSchema(Schema):
+    """Schema for one transaction in a bulk ingest request"""
+    account_id: int
+    transaction_type: str
+    category_id: Optional[int] = None
+    amount: Decimal
+    title: str
+    description: str = ''
+    # Annotated through the module: a default would shadow the date and time types
+    date: Optional[dt.date] = None  # Defaults to today
+    time: Optional[dt.time] = None  # Defaults to now
+    payment_method: str = 'CASH'
+    to_account_id: Optional[int] = None  # Required for transfers
+    merchant: str = ''
+    location: str = ''
+    tags: str = ''
+    is_recurring: bool = False
+    is_verified: bool = True
+
+
+class TransactionBulkIngestRequest(Schema):
+    """Request schema for bulk transaction ingest"""
+    transactions: list[TransactionIngestSchema]
+    # Rows already ingested before: reject the request, skip them or merge them into the stored rows
+    on_duplicate: Literal['error', 'skip', 'merge'] = 'error'
+
+
+class TransactionBulkIngestResponse(Schema):
+    """Response schema for bulk transaction ingest"""
+    created_count: int
+    duplicate_count: int  # Rows matching an already ingested transaction
+    account_ids: list[int]  # Accounts whose balance changed
+
+
+class IngestRowErrorSchema(Schema):
+    """Validation errors for one row of a bulk ingest request"""
+    row: int
+    errors: dict[str, list[str]]
+
+
+class TransactionBulkIngestErrorResponse(Schema):
+    """Response schema for a rejected bulk ingest request"""
+    detail: str
+    errors: list[IngestRowErrorSchema]
+
+
+class StatementImportResponse(Schema):
+    """Response schema for a bank statement import"""
+    row_count: int  # Rows read from the file
+    created_count: int
+    duplicate_count: int  # Rows skipped because the account already holds them
+    account_ids: list[int]  # Accounts whose balance changed
+    elapsed: float  # Seconds
+    rows_per_sec: float
+
+
+class NearDuplicateSchema(Schema):
+    """A transaction that looks like a copy of an earlier one"""
+    transaction_id: int
+    duplicate_of_id: int
+    account_id: int
+    transaction_type: str
+    amount: Decimal
+    date: date
+    duplicate_of_date: date
+    title: str
+    duplicate_of_title: str
+    similarity: float  # 0-1, of the normalized merchant and title
+    imported: bool  # Whether either transaction came from an import
+
+
+class NearDuplicateReportResponse(Schema):
+    """Response schema for the near-duplicate report"""
+    count: int
+    pairs: list[NearDuplicateSchema]
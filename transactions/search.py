@@ -0,0 +1,170 @@
+"""
+Transaction search over title, description and merchant.
+
+Search modes:
+
+- contains: case-insensitive substring match on any of the fields (the
+  original behaviour). On PostgreSQL it is served by trigram indexes.
+- fulltext: every search word must match a word of the document; results
+  are ranked, title matches weighing more than merchant and description.
+- prefix: like fulltext, but every search word matches words it is a prefix
+  of ("groc" finds "Groceries").
+
+On PostgreSQL the ranked modes run against the search_vector column, a
+stored generated tsvector maintained by the database itself, with a GIN
+index (see migration 0005). Other databases use an in-process inverted
+index, rebuilt whenever the transactions data version changes; it exists
+for SQLite development and test runs rather than production volumes.
+"""
+import bisect
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connections, transaction
+from django.db.models import Case, Expression, FloatField, Q, Value, When
+
+from backend.cache import get_versions
+from .pagination import KEYSET_ORDERING
+
+
+SEARCH_MODES = ('contains', 'fulltext', 'prefix')
+SEARCH_COLUMN = 'search_vector'
+SEARCH_CONFIG = 'english'
+
+# Relative weight of a match in each field; in search_vector title is weight A,
+# merchant B and description C
+FIELD_WEIGHTS = {'title': 1.0, 'merchant': 0.4, 'description': 0.2}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def search_transactions(queryset, search, mode='contains'):
+    """
+    Filter a Transaction queryset by search text.
+
+    Ranked modes order the result by relevance (best first, then the usual
+    keyset order); callers that paginate by cursor re-order by keyset.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    if mode == 'contains':
+        return queryset.filter(
+            Q(title__icontains=search) |
+            Q(description__icontains=search) |
+            Q(merchant__icontains=search)
+        )
+
+    terms = tokenize(search)
+    if not terms:
+        return queryset.none()
+
+    if connections[queryset.db].vendor == 'postgresql':
+        return _search_postgresql(queryset, terms, mode)
+    return _search_inverted_index(queryset, terms, mode)
+
+
+class SearchDocument(Expression):
+    """The search_vector column of the queried Transaction table"""
+
+    output_field = SearchVectorField()
+
+    def as_sql(self, compiler, connection):
+        alias = compiler.query.get_initial_alias()
+        return f'{compiler.quote_name_unless_alias(alias)}.{connection.ops.quote_name(SEARCH_COLUMN)}', []
+
+
+def _search_postgresql(queryset, terms, mode):
+    if mode == 'prefix':
+        query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+    else:
+        query = SearchQuery(' '.join(terms), search_type='plain', config=SEARCH_CONFIG)
+
+    # ts_rank weights are given in D, C, B, A order
+    weights = [0.0, FIELD_WEIGHTS['description'], FIELD_WEIGHTS['merchant'], FIELD_WEIGHTS['title']]
+    return queryset.alias(
+        search_document=SearchDocument(),
+        search_rank=SearchRank(SearchDocument(), query, weights=weights)
+    ).filter(search_document=query).order_by('-search_rank', *KEYSET_ORDERING)
+
+
+class InvertedIndex:
+    """Maps each word of title/merchant/description to {transaction_id: weight}"""
+
+    def __init__(self, rows):
+        """rows is an iterable of (id, title, description, merchant) tuples"""
+        postings = defaultdict(lambda: defaultdict(float))
+        for transaction_id, title, description, merchant in rows:
+            for field, text in (('title', title), ('description', description), ('merchant', merchant)):
+                for token in tokenize(text):
+                    postings[token][transaction_id] += FIELD_WEIGHTS[field]
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+
+    def matches(self, term, prefix=False):
+        """Return {transaction_id: weight} of documents containing term"""
+        if not prefix:
+            return self.postings.get(term, {})
+
+        found = defaultdict(float)
+        start = bisect.bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            for transaction_id, weight in self.postings[token].items():
+                found[transaction_id] += weight
+        return found
+
+    def search(self, terms, prefix=False):
+        """Return {transaction_id: rank} of documents matching every term"""
+        ranks = None
+        for term in terms:
+            matches = self.matches(term, prefix)
+            if ranks is None:
+                ranks = dict(matches)
+            else:
+                ranks = {
+                    transaction_id: rank + matches[transaction_id]
+                    for transaction_id, rank in ranks.items() if transaction_id in matches
+                }
+            if not ranks:
+                break
+        return ranks or {}
+
+
+_state = {'index': None, 'version': None}
+
+
+def get_inverted_index():
+    """Return the cached InvertedIndex, rebuilding it when transactions changed"""
+    from .models import Transaction
+
+    version = get_versions('transactions')[0]
+    if _state['index'] is None or _state['version'] != version:
+        rows = Transaction.objects.order_by().values_list('id', 'title', 'description', 'merchant')
+        _state.update(index=InvertedIndex(rows.iterator(chunk_size=2000)), version=version)
+    return _state['index']
+
+
+def invalidate_search_index():
+    """Drop the in-process inverted index, now and again once the current transaction commits"""
+    _state['index'] = None
+    transaction.on_commit(lambda: _state.update(index=None))
+
+
+def _search_inverted_index(queryset, terms, mode):
+    ranks = get_inverted_index().search(terms, prefix=mode == 'prefix')
+    if not ranks:
+        return queryset.none()
+
+    rank = Case(
+        *(When(id=transaction_id, then=Value(value)) for transaction_id, value in ranks.items()),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+    return queryset.filter(id__in=list(ranks)).alias(search_rank=rank).order_by('-search_rank', *KEYSET_ORDERING)
@@ -0,0 +1,64 @@
+from backend.serialization import PerCall, ValuesSerializer, choice_display, file_name, split_tags
+from .category_tree import get_category_tree
+from .models import RecurringTransaction, Transaction
+
+
+# Category names come from the in-process category tree instead of a join
+category_name = PerCall(lambda: get_category_tree().name)
+
+
+transaction_serializer = ValuesSerializer([
+    ('id', 'id'),
+    ('account_id', 'account_id'),
+    ('account_name', 'account__account_name'),
+    ('username', 'account__user__username'),
+    ('transaction_type', 'transaction_type'),
+    ('transaction_type_display', 'transaction_type', choice_display(Transaction, 'transaction_type')),
+    ('category_id', 'category_id'),
+    ('category_name', 'category_id', category_name),
+    ('amount', 'amount'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('date', 'date'),
+    ('time', 'time'),
+    ('payment_method', 'payment_method'),
+    ('payment_method_display', 'payment_method', choice_display(Transaction, 'payment_method')),
+    ('to_account_id', 'to_account_id'),
+    ('to_account_name', 'to_account__account_name'),
+    ('merchant', 'merchant'),
+    ('location', 'location'),
+    ('tags', 'tags'),
+    ('tags_list', 'tags', split_tags),
+    ('receipt_image', 'receipt_image', file_name),
+    ('is_recurring', 'is_recurring'),
+    ('is_verified', 'is_verified'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('created_by_id', 'created_by_id'),
+    ('created_by_username', 'created_by__username'),
+])
+
+
+recurring_transaction_serializer = ValuesSerializer([
+    ('id', 'id'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('account_id', 'account_id'),
+    ('account_name', 'account__account_name'),
+    ('transaction_type', 'transaction_type'),
+    ('transaction_type_display', 'transaction_type', choice_display(RecurringTransaction, 'transaction_type')),
+    ('category_id', 'category_id'),
+    ('category_name', 'category_id', category_name),
+    ('amount', 'amount'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('frequency', 'frequency'),
+    ('frequency_display', 'frequency', choice_display(RecurringTransaction, 'frequency')),
+    ('start_date', 'start_date'),
+    ('end_date', 'end_date'),
+    ('next_due_date', 'next_due_date'),
+    ('is_active', 'is_active'),
+    ('auto_create', 'auto_create'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+])
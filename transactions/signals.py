@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django.db import transaction
+
+from backend.cache import bump_version
+from .category_tree import invalidate_category_tree
+from .models import Category, Transaction
+from .search import invalidate_search_index
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def invalidate_transaction_caches(sender, **kwargs):
+    """Invalidate cached transaction responses; balances change with transactions too"""
+    invalidate_search_index()
+    bump_version('transactions', 'accounts')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_caches(sender, **kwargs):
+    """Invalidate cached responses that include category data, and the category tree"""
+    # Drop the tree now so this process sees its own write, and again after
+    # commit in case another thread reloaded it in between.
+    invalidate_category_tree()
+    transaction.on_commit(invalidate_category_tree)
+    bump_version('categories')
@@ -1,3 +1,1299 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, time, timedelta
+from decimal import Decimal
+from itertools import count
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, router
+from django.db.models import F
+from django.db.models.query import ValuesListIterable
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from accounts.api import api as accounts_api
+from accounts.models import Account, Budget, UserProfile
+from backend import db_routing, instrumentation
+from . import archive, partitions
+from .api import api as transactions_api
+from .dedupe import find_near_duplicates
+from .export import aiter_ndjson
+from .ingest import IngestError, ingest_transactions
+from .category_tree import get_category_tree
+from .forecast import expand_schedules
+from .ledger import rebuild_balances, rebuild_rollups
+from .models import AccountDailyRollup, Category, CategoryClosure, RecurringTransaction, Transaction
+from .recurring import materialize_recurring
+from .statements import import_statement
+
+
+class BalancePostingTests(TestCase):
+    """Account balances follow Transaction create/update/delete"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger', password='password123')
+        self.checking = Account.objects.create(user=self.user, account_name='Checking', balance=Decimal('100.00'))
+        self.savings = Account.objects.create(user=self.user, account_name='Savings', balance=Decimal('50.00'))
+        self.cash = Account.objects.create(user=self.user, account_name='Cash', balance=Decimal('0.00'))
+
+    def assertBalances(self, checking, savings, cash=Decimal('0.00')):
+        balances = dict(Account.objects.values_list('account_name', 'balance'))
+        self.assertEqual(balances['Checking'], Decimal(checking))
+        self.assertEqual(balances['Savings'], Decimal(savings))
+        self.assertEqual(balances['Cash'], Decimal(cash))
+
+    def create(self, **kwargs):
+        kwargs.setdefault('account', self.checking)
+        kwargs.setdefault('title', 'Test')
+        return Transaction.objects.create(**kwargs)
+
+    def test_create_income_expense_and_transfer(self):
+        self.create(transaction_type='INCOME', amount=Decimal('20.00'))
+        self.create(transaction_type='EXPENSE', amount=Decimal('5.50'))
+        self.create(transaction_type='TRANSFER', amount=Decimal('10.00'), to_account=self.savings)
+        self.assertBalances('104.50', '60.00')
+
+    def test_update_amount(self):
+        transaction = self.create(transaction_type='EXPENSE', amount=Decimal('10.00'))
+        transaction.amount = Decimal('25.00')
+        transaction.save()
+        self.assertBalances('75.00', '50.00')
+
+    def test_update_changes_type(self):
+        transaction = self.create(transaction_type='EXPENSE', amount=Decimal('10.00'))
+        transaction.transaction_type = 'INCOME'
+        transaction.save()
+        self.assertBalances('110.00', '50.00')
+
+        transaction.transaction_type = 'TRANSFER'
+        transaction.to_account = self.savings
+        transaction.save()
+        self.assertBalances('90.00', '60.00')
+
+    def test_update_changes_to_account(self):
+        transaction = self.create(transaction_type='TRANSFER', amount=Decimal('10.00'), to_account=self.savings)
+        transaction.to_account = self.cash
+        transaction.save()
+        self.assertBalances('90.00', '50.00', '10.00')
+
+    def test_update_without_ledger_fields(self):
+        transaction = self.create(transaction_type='EXPENSE', amount=Decimal('10.00'))
+        transaction.title = 'Renamed'
+        transaction.amount = Decimal('99.00')
+        transaction.save(update_fields=['title'])
+        self.assertBalances('90.00', '50.00')
+
+    def test_update_of_fetched_instance(self):
+        self.create(transaction_type='INCOME', amount=Decimal('10.00'))
+        transaction = Transaction.objects.get()
+        transaction.account = self.savings
+        transaction.save()
+        self.assertBalances('100.00', '60.00')
+
+    def test_update_of_stale_instance(self):
+        transaction = self.create(transaction_type='EXPENSE', amount=Decimal('10.00'))
+        first = Transaction.objects.get(pk=transaction.pk)
+        second = Transaction.objects.get(pk=transaction.pk)
+        first.amount = Decimal('50.00')
+        first.save()
+        second.amount = Decimal('70.00')
+        second.save()
+        self.assertBalances('30.00', '50.00')
+
+    def test_update_after_refresh_from_db(self):
+        transaction = self.create(transaction_type='EXPENSE', amount=Decimal('10.00'))
+        transaction.refresh_from_db()
+        transaction.amount = Decimal('5.00')
+        transaction.save()
+        self.assertBalances('95.00', '50.00')
+
+    def test_delete(self):
+        self.create(transaction_type='EXPENSE', amount=Decimal('10.00'))
+        transfer = self.create(transaction_type='TRANSFER', amount=Decimal('10.00'), to_account=self.savings)
+        transfer.delete()
+        Transaction.objects.get().delete()
+        self.assertBalances('100.00', '50.00')
+
+    def test_daily_rollups_follow_writes(self):
+        income = self.create(transaction_type='INCOME', amount=Decimal('20.00'), date='2025-03-01')
+        expense = self.create(transaction_type='EXPENSE', amount=Decimal('5.00'), date='2025-03-01')
+        self.create(transaction_type='EXPENSE', amount=Decimal('7.00'), date='2025-03-02')
+        income.amount = Decimal('30.00')
+        income.date = '2025-03-03'
+        income.save()
+        expense.delete()
+
+        def snapshot():
+            return sorted(AccountDailyRollup.objects.exclude(transaction_count=0).values_list(
+                'account_id', 'date', 'transaction_type', 'total_amount', 'transaction_count'
+            ))
+
+        maintained = snapshot()
+        rebuild_rollups()
+        self.assertEqual(maintained, snapshot())
+        self.assertEqual(self.checking.get_monthly_summary(2025, 3), {
+            'income': Decimal('30.00'),
+            'expense': Decimal('7.00'),
+            'net': Decimal('23.00'),
+            'transaction_count': 2,
+        })
+
+
+    def test_rebuild_balances_matches_posting(self):
+        Account.objects.update(initial_balance=F('balance'))
+        self.create(transaction_type='INCOME', amount=Decimal('20.00'))
+        self.create(transaction_type='EXPENSE', amount=Decimal('5.50'), account=self.savings)
+        self.create(transaction_type='TRANSFER', amount=Decimal('10.00'), to_account=self.cash)
+        self.create(transaction_type='TRANSFER', amount=Decimal('3.00'))
+        posted = dict(Account.objects.values_list('id', 'balance'))
+
+        Account.objects.update(balance=Decimal('0.00'))
+        self.assertEqual(rebuild_balances(), 3)
+        self.assertEqual(dict(Account.objects.values_list('id', 'balance')), posted)
+
+
+class BulkIngestTests(TestCase):
+    """Bulk ingest writes rows in chunks and posts one delta per account"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ingest', password='password123')
+        self.checking = Account.objects.create(user=self.user, account_name='Checking', balance=Decimal('100.00'))
+        self.savings = Account.objects.create(user=self.user, account_name='Savings', balance=Decimal('0.00'))
+
+    def test_ingest_posts_aggregated_balances(self):
+        rows = [
+            {'account_id': self.checking.id, 'transaction_type': 'EXPENSE', 'amount': '1.50', 'title': f'Coffee {i}'}
+            for i in range(40)
+        ]
+        rows.append({
+            'account_id': str(self.checking.id), 'transaction_type': 'TRANSFER', 'amount': '10.00',
+            'title': 'To savings', 'to_account_id': str(self.savings.id), 'date': '2025-01-31'
+        })
+
+        with self.assertNumQueries(13):
+            result = ingest_transactions(rows, chunk_size=25)
+
+        self.assertEqual(
+            result,
+            {'created_count': 41, 'duplicate_count': 0, 'account_ids': [self.checking.id, self.savings.id]}
+        )
+        self.checking.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('30.00'))
+        self.assertEqual(self.savings.balance, Decimal('10.00'))
+
+    def test_invalid_rows_reject_the_batch(self):
+        rows = [
+            {'account_id': self.checking.id, 'transaction_type': 'INCOME', 'amount': '5.00', 'title': 'Ok'},
+            {'account_id': self.checking.id, 'transaction_type': 'GIFT', 'amount': '0', 'title': 'Bad'},
+            {'account_id': 999999, 'transaction_type': 'INCOME', 'amount': '5.00', 'title': 'Missing account'},
+        ]
+
+        with self.assertRaises(IngestError) as context:
+            ingest_transactions(rows)
+
+        self.assertEqual([error['row'] for error in context.exception.errors], [1, 2])
+        self.assertEqual(set(context.exception.errors[0]['errors']), {'transaction_type', 'amount'})
+        self.assertFalse(Transaction.objects.exists())
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('100.00'))
+
+    def test_reingest_rejects_skips_or_merges_duplicates(self):
+        rows = [
+            {'account_id': self.checking.id, 'transaction_type': 'EXPENSE', 'amount': '3.50', 'title': 'Coffee',
+             'date': '2026-02-03'}
+            for _ in range(2)
+        ]
+        self.assertEqual(ingest_transactions(rows)['created_count'], 2)
+
+        # Same payment with different spacing and case, plus a third identical coffee
+        rows[0] = dict(rows[0], title='  COFFEE ', tags='morning')
+        rows.append(dict(rows[1]))
+        with self.assertRaises(IngestError) as context:
+            ingest_transactions(rows)
+        self.assertEqual([error['row'] for error in context.exception.errors], [0, 1])
+
+        result = ingest_transactions(rows, on_duplicate='merge')
+        self.assertEqual((result['created_count'], result['duplicate_count']), (1, 2))
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('tags', flat=True)), ['', '', 'morning']
+        )
+        self.assertEqual(ingest_transactions(rows, on_duplicate='skip')['created_count'], 0)
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.balance, Decimal('89.50'))
+
+    def test_endpoint_accepts_dates_and_times(self):
+        row = {'account_id': self.checking.id, 'transaction_type': 'EXPENSE', 'amount': '2.00', 'title': 'Tea',
+               'date': '2026-02-03', 'time': '08:15:00'}
+        response = self.client.post(
+            '/api/v1/transactions/bulk/', {'transactions': [row]}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            Transaction.objects.values_list('date', 'time').get(), (date(2026, 2, 3), time(8, 15))
+        )
+
+    def test_endpoint_merge_copies_only_sent_fields(self):
+        row = {'account_id': self.checking.id, 'transaction_type': 'EXPENSE', 'amount': '2.00', 'title': 'Tea',
+               'date': '2026-02-03', 'payment_method': 'CREDIT_CARD', 'description': 'Green',
+               'tags': 'drinks', 'is_verified': False}
+        ingest_transactions([row])
+
+        row = {key: row[key] for key in ('account_id', 'transaction_type', 'amount', 'title', 'date')}
+        response = self.client.post(
+            '/api/v1/transactions/bulk/',
+            {'transactions': [dict(row, location='Station')], 'on_duplicate': 'merge'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['duplicate_count'], 1)
+        self.assertEqual(
+            Transaction.objects.values_list('location', 'payment_method', 'description', 'tags', 'is_verified').get(),
+            ('Station', 'CREDIT_CARD', 'Green', 'drinks', False)
+        )
+
+
+class TransactionOwnerTests(TestCase):
+    """Transaction.user follows the owner of the account"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='password123')
+        self.bob = User.objects.create_user(username='bob', password='password123')
+        self.checking = Account.objects.create(user=self.alice, account_name='Checking')
+        self.shared = Account.objects.create(user=self.bob, account_name='Shared')
+
+    def owners(self):
+        return dict(Transaction.objects.values_list('title', 'user_id'))
+
+    def test_writes_copy_the_owner(self):
+        moved = Transaction.objects.create(
+            account=self.checking, transaction_type='INCOME', amount=Decimal('5.00'), title='Moved'
+        )
+        ingest_transactions([
+            {'account_id': self.shared.id, 'transaction_type': 'EXPENSE', 'amount': '2.00', 'title': 'Ingested'}
+        ])
+        moved.account = self.shared
+        moved.save(update_fields=['account'])
+        self.assertEqual(self.owners(), {'Moved': self.bob.id, 'Ingested': self.bob.id})
+
+        account = Account.objects.get(pk=self.shared.pk)
+        account.user = self.alice
+        account.save()
+        self.assertEqual(self.owners(), {'Moved': self.alice.id, 'Ingested': self.alice.id})
+
+        response = self.client.get('/api/v1/transactions/', {'user_id': self.alice.id})
+        self.assertEqual(response.json()['total_count'], 2)
+
+
+class StatisticsCacheTests(TestCase):
+    """Statistics responses are cached until transactions change"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='stats', password='password123')
+        self.account = Account.objects.create(user=user, account_name='Checking')
+
+    def create_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                account=self.account, transaction_type='INCOME', amount=Decimal('5.00'), title='Salary'
+            )
+
+    def test_statistics_cached_until_write(self):
+        self.create_transaction()
+        first = self.client.get('/api/v1/transactions/statistics/').json()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/v1/transactions/statistics/').json(), first)
+
+        self.create_transaction()
+        second = self.client.get('/api/v1/transactions/statistics/').json()
+        self.assertEqual(second['total_transactions'], first['total_transactions'] + 1)
+
+    def test_bulk_ingest_invalidates_account_statistics(self):
+        before = self.client.get('/api/v1/accounts/statistics/').json()
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_transactions([
+                {'account_id': self.account.id, 'transaction_type': 'INCOME', 'amount': '7.00', 'title': 'Bonus'}
+            ])
+        after = self.client.get('/api/v1/accounts/statistics/').json()
+        self.assertNotEqual(before['balance_by_currency'], after['balance_by_currency'])
+
+    def test_rebuilds_invalidate_account_statistics(self):
+        self.create_transaction()
+        Account.objects.update(balance=Decimal('0.00'))
+        stale = self.client.get('/api/v1/accounts/statistics/').json()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_rollups()
+            rebuild_balances()
+        rebuilt = self.client.get('/api/v1/accounts/statistics/').json()
+        self.assertNotEqual(stale['balance_by_currency'], rebuilt['balance_by_currency'])
+
+
+class ReplicaRoutingTests(TestCase):
+    """API reads go to a replica unless the client wrote recently or the replica fails"""
+
+    def setUp(self):
+        # The test database stands in for a replica
+        self.pool = db_routing.ReplicaPool(['default'])
+        patcher = mock.patch.object(db_routing, 'replicas', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+        self.read_aliases = []
+
+    def view(self, request):
+        self.read_aliases.append(db_routing.current_read_alias())
+        return HttpResponse()
+
+    def handle(self, request, view=None):
+        return db_routing.ReplicaRoutingMiddleware(view or self.view)(request)
+
+    def test_reads_and_writes(self):
+        response = self.handle(self.factory.get('/api/v1/transactions/'))
+        self.assertNotIn(db_routing.PIN_COOKIE, response.cookies)
+        self.handle(self.factory.get('/admin/'))
+        post = self.handle(self.factory.post('/api/v1/transactions/bulk/'))
+        self.assertEqual(self.read_aliases, ['default', None, None])
+
+        # The client that wrote keeps reading from the primary
+        request = self.factory.get('/api/v1/transactions/')
+        request.COOKIES[db_routing.PIN_COOKIE] = post.cookies[db_routing.PIN_COOKIE].value
+        self.handle(request)
+        self.assertEqual(self.read_aliases[-1], None)
+
+    def test_write_pins_rest_of_request_to_primary(self):
+        def view(request):
+            self.read_aliases.append(db_routing.current_read_alias())
+            router.db_for_write(Transaction)
+            self.read_aliases.append(db_routing.current_read_alias())
+            return HttpResponse()
+
+        response = self.handle(self.factory.get('/api/v1/transactions/'), view)
+        self.assertEqual(self.read_aliases, ['default', None])
+        self.assertIn(db_routing.PIN_COOKIE, response.cookies)
+
+    def test_failed_replica_falls_back_to_primary(self):
+        def view(request):
+            self.read_aliases.append(db_routing.current_read_alias())
+            if db_routing.current_read_alias():
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT * FROM missing_replica_table')
+                except Exception:
+                    return HttpResponse(status=500)
+            return HttpResponse()
+
+        with self.assertLogs('backend.db_routing', 'WARNING'):
+            response = self.handle(self.factory.get('/api/v1/transactions/'), view)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read_aliases, ['default', None])
+        self.assertEqual(self.pool.available(), [])
+
+    async def test_async_view_reads_from_replica(self):
+        async def view(request):
+            self.read_aliases.append(db_routing.current_read_alias())
+            await Transaction.objects.acount()
+            return HttpResponse()
+
+        middleware = db_routing.ReplicaRoutingMiddleware(view)
+        self.assertTrue(db_routing.iscoroutinefunction(middleware))
+        response = await middleware(self.factory.get('/api/v1/transactions/'))
+        self.assertNotIn(db_routing.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.read_aliases, ['default'])
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_replica_choice(self):
+        pool = db_routing.ReplicaPool(['a', 'b', 'c'])
+        self.assertEqual([pool.choose() for _ in range(4)], ['a', 'b', 'c', 'a'])
+
+        pool = db_routing.ReplicaPool(['a', 'b', 'c'], strategy='least_latency')
+        pool.probed_at = db_routing.time.monotonic()
+        pool.latency.update(a=0.030, b=0.002, c=0.010)
+        self.assertEqual(pool.choose(), 'b')
+        with self.assertLogs('backend.db_routing', 'WARNING'):
+            pool.mark_down('b')
+        self.assertEqual(pool.choose(), 'c')
+
+
+class AsyncHandlerTests(TestCase):
+    """Read endpoints are async views on the async ORM"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='async', password='password123')
+        account = Account.objects.create(user=user, account_name='Checking')
+        for amount, is_verified in (('5.00', True), ('7.00', False)):
+            Transaction.objects.create(
+                account=account, transaction_type='EXPENSE', amount=Decimal(amount),
+                title='Lunch', is_verified=is_verified
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_statistics_aggregates(self):
+        response = await self.async_client.get('/api/v1/transactions/statistics/')
+        stats = response.json()
+        self.assertEqual(
+            (stats['total_transactions'], stats['verified_transactions'], stats['unverified_transactions']),
+            (2, 1, 1)
+        )
+        [amounts] = stats['amounts_by_type']
+        self.assertEqual(Decimal(amounts['total_amount']), Decimal('12.00'))
+
+    async def test_list_pages(self):
+        response = await self.async_client.get('/api/v1/transactions/', {'page': 5, 'page_size': 1})
+        data = response.json()
+        # Like Paginator.get_page(), a page past the end returns the last one
+        self.assertEqual((data['total_count'], data['total_pages'], len(data['transactions'])), (2, 2, 1))
+
+        response = await self.async_client.get('/api/v1/transactions/', {'pagination': 'cursor', 'page_size': 1})
+        self.assertIsNotNone(response.json()['next_cursor'])
+
+
+    async def test_export_streams_with_async_orm(self):
+        response = await self.async_client.get('/api/v1/transactions/export/', {'format': 'csv'})
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(lines), 3)
+
+        # Rows are pulled from the database one chunk at a time, not read in full first
+        pulled = []
+        iterate = ValuesListIterable.__iter__
+
+        def counting_iter(iterable):
+            for row in iterate(iterable):
+                pulled.append(row)
+                yield row
+
+        with mock.patch.object(ValuesListIterable, '__iter__', counting_iter):
+            lines = aiter_ndjson(Transaction.objects.all(), chunk_size=1)
+            first = await anext(lines)
+            self.assertEqual(len(pulled), 1)
+            rest = [line async for line in lines]
+        self.assertEqual(json.loads(first)['title'], 'Lunch')
+        self.assertEqual((len(rest), len(pulled)), (1, 2))
+
+class DatabaseMetricsTests(TestCase):
+    """The internal database metrics endpoint is limited to staff and internal clients"""
+
+    def test_metrics_access(self):
+        self.assertEqual(self.client.get('/api/v1/_internal/db/').status_code, 403)
+
+        staff = User.objects.create_user(username='ops', password='password123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/api/v1/_internal/db/')
+
+        self.assertEqual(response.status_code, 200)
+        default = response.json()['databases']['default']
+        self.assertEqual((default['mode'], default['health_checks']), ('persistent', True))
+
+
+class ApiMetricsTests(TestCase):
+    """Sampled API requests report queries and timings per endpoint"""
+
+    def setUp(self):
+        instrumentation.registry.clear()
+        self.addCleanup(instrumentation.registry.clear)
+        Category.objects.create(name='Food')
+        get_category_tree()
+
+    @override_settings(API_METRICS_SAMPLE_RATE=1.0)
+    def test_sampled_request(self):
+        response = self.client.get('/api/v1/categories/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[0-9.]+;desc="2 queries, 0 repeated", serialize;dur=')
+
+        self.assertEqual(self.client.get('/api/v1/_metrics').status_code, 403)
+        self.client.force_login(User.objects.create_user(username='ops', password='password123', is_staff=True))
+        metrics = self.client.get('/api/v1/_metrics').content.decode()
+        labels = f'pid="{os.getpid()}",method="GET",route="/api/v1/categories/"'
+        self.assertIn(f'api_requests_total{{{labels},status="200"}} 1', metrics)
+        self.assertIn(f'api_db_queries_total{{{labels}}} 2', metrics)
+        self.assertIn(f'api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1', metrics)
+
+    @override_settings(API_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_request_is_only_counted(self):
+        response = self.client.get('/api/v1/categories/')
+        self.assertNotIn('Server-Timing', response)
+        endpoint = instrumentation.registry.endpoints['GET', '/api/v1/categories/']
+        self.assertEqual((endpoint.count, endpoint.sampled, endpoint.queries), (1, 0, 0))
+
+
+def api_routes():
+    """(method, path) of every operation of the accounts and transactions APIs"""
+    routes = set()
+    for api in (accounts_api, transactions_api):
+        for prefix, api_router in api._routers:
+            for path, path_view in api_router.path_operations.items():
+                for operation in path_view.operations:
+                    routes.update((method, prefix + path) for method in operation.methods)
+    return routes
+
+
+@override_settings(API_CACHE_TIMEOUT=0)
+class QueryBudgetTests(TestCase):
+    """
+    Every API route runs as many queries for a small page of little data as
+    for a large page of more data: a count that grows with either is an N+1.
+    """
+
+    # Page sizes, and rows per write; 40 rows still fit in one bulk INSERT on SQLite
+    SMALL, LARGE = 5, 40
+    maxDiff = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed(users=2)
+        cls.account = Account.objects.filter(account_type='CHECKING').order_by('id').first()
+        cls.transaction = Transaction.objects.filter(account=cls.account).order_by('id').first()
+        cls.parent = Category.objects.filter(subcategories__isnull=False).order_by('id').first()
+        cls.profile = UserProfile.objects.order_by('id').first()
+        cls.budget = Budget.objects.order_by('id').first()
+        cls.recurring = RecurringTransaction.objects.order_by('id').first()
+
+    @staticmethod
+    def seed(users):
+        """Sample data, plus schedules and a near-duplicate pair on every new checking account"""
+        existing = list(Account.objects.values_list('id', flat=True))
+        call_command('create_sample_data', users=users, transactions_per_account=30, stdout=io.StringIO())
+        today = date.today()
+        for account in Account.objects.filter(account_type='CHECKING').exclude(id__in=existing):
+            for title, transaction_type, amount in (('Salary', 'INCOME', '4500.00'), ('Rent', 'EXPENSE', '1600.00')):
+                RecurringTransaction.objects.create(
+                    user_id=account.user_id, account=account, transaction_type=transaction_type,
+                    amount=Decimal(amount), title=title, frequency='MONTHLY',
+                    start_date=today.replace(day=1), next_due_date=today.replace(day=1)
+                )
+            for title in ('Grocery store', 'GROCERY STORE #123'):
+                Transaction.objects.create(
+                    account=account, transaction_type='EXPENSE', amount=Decimal('42.00'), title=title, date=today
+                )
+
+    def setUp(self):
+        # Written rows must be new every time, or they are skipped as duplicates
+        self.serial = count()
+
+    def requests(self):
+        """{(method, path): {label: request(size)}} covering every route, size being the page size or row count"""
+        def get(path, size_param=None, **params):
+            def request(size):
+                data = dict(params, **{size_param: size}) if size_param else params
+                return self.client.get(f'/api/v1{path}', data)
+            return request
+
+        def bulk(size):
+            rows = [
+                {'account_id': self.account.id, 'transaction_type': 'EXPENSE', 'amount': '3.50',
+                 'title': f'Budget row {next(self.serial)}'}
+                for _ in range(size)
+            ]
+            return self.client.post('/api/v1/transactions/bulk/', json.dumps({'transactions': rows}),
+                                    content_type='application/json')
+
+        def statement(size):
+            lines = ''.join(f'{today},Statement line {next(self.serial)},-4.20\n' for _ in range(size))
+            upload = SimpleUploadedFile('statement.csv', f'Date,Description,Amount\n{lines}'.encode(), 'text/csv')
+            return self.client.post('/api/v1/transactions/import/', {'account_id': self.account.id, 'file': upload})
+
+        today = date.today().isoformat()
+        month_ago = (date.today() - timedelta(days=30)).isoformat()
+        account, transaction = self.account.id, self.transaction.id
+        return {
+            ('GET', '/accounts/'): {'accounts': get('/accounts/', 'page_size')},
+            ('GET', '/accounts/{int:account_id}/'): {'account': get(f'/accounts/{account}/')},
+            ('GET', '/accounts/{int:account_id}/summary/'): {'account summary': get(f'/accounts/{account}/summary/')},
+            ('GET', '/accounts/{int:account_id}/forecast/'): {
+                'forecast': get(f'/accounts/{account}/forecast/', 'months'),
+                'daily forecast': get(f'/accounts/{account}/forecast/', 'months', granularity='daily'),
+            },
+            ('GET', '/user-profiles/'): {'profiles': get('/user-profiles/', 'page_size')},
+            ('GET', '/user-profiles/{profile_id}/'): {'profile': get(f'/user-profiles/{self.profile.id}/')},
+            ('GET', '/budgets/'): {'budgets': get('/budgets/', 'page_size')},
+            ('GET', '/budgets/{budget_id}/'): {'budget': get(f'/budgets/{self.budget.id}/')},
+            ('GET', '/accounts/statistics/'): {'account statistics': get('/accounts/statistics/')},
+            ('GET', '/categories/'): {'categories': get('/categories/', 'page_size')},
+            ('GET', '/categories/{category_id}/'): {'category': get(f'/categories/{self.parent.id}/')},
+            ('GET', '/transactions/'): {
+                'transactions': get('/transactions/', 'page_size'),
+                'transactions page 2': get('/transactions/', 'page_size', page=2),
+                'transactions cursor': get('/transactions/', 'page_size', pagination='cursor', include_total=True),
+                'transactions by account': get('/transactions/', 'page_size', account_id=account, date_from=month_ago),
+                'transactions by category tree': get(
+                    '/transactions/', 'page_size', category_id=self.parent.id, include_descendants=True
+                ),
+                'transactions search': get('/transactions/', 'page_size', search='store'),
+                'transactions fulltext search': get('/transactions/', 'page_size', search='store', search_mode='fulltext'),
+            },
+            ('GET', '/transactions/export/'): {
+                'export': get('/transactions/export/'),
+                'export csv': get('/transactions/export/', format='csv', account_id=account),
+            },
+            ('POST', '/transactions/bulk/'): {'bulk ingest': bulk},
+            ('POST', '/transactions/import/'): {'statement import': statement},
+            ('GET', '/transactions/duplicates/'): {'duplicates': get('/transactions/duplicates/', 'limit')},
+            ('GET', '/transactions/{int:transaction_id}/'): {'transaction': get(f'/transactions/{transaction}/')},
+            ('GET', '/transactions/{int:transaction_id}/summary/'): {
+                'transaction summary': get(f'/transactions/{transaction}/summary/')
+            },
+            ('GET', '/recurring-transactions/'): {'recurring': get('/recurring-transactions/', 'page_size')},
+            ('GET', '/recurring-transactions/{recurring_id}/'): {
+                'recurring schedule': get(f'/recurring-transactions/{self.recurring.id}/')
+            },
+            ('GET', '/transactions/statistics/'): {'transaction statistics': get('/transactions/statistics/')},
+        }
+
+    def count_queries(self, requests, size):
+        counts = {}
+        for variants in requests.values():
+            for label, request in variants.items():
+                # The first request fills per-process caches such as the category tree
+                request(size)
+                with CaptureQueriesContext(connection) as queries:
+                    response = request(size)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 300, label)
+                counts[label] = len(queries)
+        return counts
+
+    def test_query_counts_do_not_grow(self):
+        requests = self.requests()
+        self.assertEqual(set(requests), api_routes(), 'Every API route needs a query budget here')
+
+        small = self.count_queries(requests, self.SMALL)
+        self.assertEqual(self.count_queries(requests, self.LARGE), small)
+
+        self.seed(users=5)
+        self.assertEqual(self.count_queries(requests, self.LARGE), small)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL')
+    def test_indexed_filters_avoid_sequential_scans(self):
+        month_ago = (date.today() - timedelta(days=30)).isoformat()
+        filters = {
+            'account': {'account_id': self.account.id},
+            'account and dates': {'account_id': self.account.id, 'date_from': month_ago},
+            'type and dates': {'transaction_type': 'EXPENSE', 'date_from': month_ago},
+            'category': {'category_id': self.parent.id},
+            'category tree': {'category_id': self.parent.id, 'include_descendants': True},
+            'user': {'user_id': self.account.user_id},
+            'user and unverified': {'user_id': self.account.user_id, 'is_verified': False},
+            'user and amounts': {'user_id': self.account.user_id, 'min_amount': 100, 'max_amount': 500},
+            'dates': {'date_from': month_ago, 'date_to': date.today().isoformat()},
+            'cursor': {'pagination': 'cursor'},
+        }
+        with connection.cursor() as cursor:
+            # The test tables are small enough for any plan to prefer a sequential
+            # scan; forbid them so one remains only where no index applies
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for label, params in filters.items():
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get('/api/v1/transactions/', params)
+                for query in queries:
+                    if 'transactions_transaction' not in query['sql']:
+                        continue
+                    cursor.execute(f"EXPLAIN {query['sql']}")
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+                    with self.subTest(label, sql=query['sql']):
+                        # Partitions are named transactions_transaction_p<period> and _default
+                        self.assertNotRegex(plan, r'Seq Scan on "?transactions_transaction(_p[0-9]+|_default)?\b')
+
+
+class TransactionPartitionTests(TestCase):
+    """The transaction table is partitioned by date on PostgreSQL"""
+
+    def test_periods(self):
+        self.assertEqual(
+            [(start, partitions.partition_name(start, 'month')) for start, _ in
+             partitions.periods(date(2025, 11, 15), date(2026, 1, 1), 'month')],
+            [(date(2025, 11, 1), 'transactions_transaction_p202511'),
+             (date(2025, 12, 1), 'transactions_transaction_p202512'),
+             (date(2026, 1, 1), 'transactions_transaction_p202601')]
+        )
+        self.assertEqual(
+            list(partitions.periods(date(2025, 6, 1), date(2026, 6, 1), 'year')),
+            [(date(2025, 1, 1), date(2026, 1, 1)), (date(2026, 1, 1), date(2027, 1, 1))]
+        )
+        self.assertEqual(
+            partitions.parse_partition_name('transactions_transaction_p202512'), (date(2025, 12, 1), date(2026, 1, 1))
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL')
+    def test_new_partition_takes_rows_and_prunes(self):
+        user = User.objects.create_user(username='partitions', password='password123')
+        account = Account.objects.create(user=user, account_name='Checking')
+        old = Transaction.objects.create(
+            account=account, transaction_type='EXPENSE', amount=Decimal('3.00'), title='Old', date=date(1990, 5, 2)
+        )
+        self.assertEqual(
+            partitions.create_partitions(date(1990, 5, 1), date(1990, 5, 31), 'month'),
+            ['transactions_transaction_p199005']
+        )
+        self.assertEqual(Transaction.objects.get(date__year=1990).pk, old.pk)
+
+        plan = Transaction.objects.filter(date__range=(date(1990, 5, 1), date(1990, 5, 31))).explain()
+        self.assertIn('transactions_transaction_p199005', plan)
+        self.assertNotIn('transactions_transaction_default', plan)
+
+
+class TransactionArchiveTests(TestCase):
+    """Old transactions move to Parquet segments and the API keeps serving them"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = self.settings(TRANSACTION_ARCHIVE_DIR=directory, API_CACHE_TIMEOUT=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = User.objects.create_user(username='archive', password='password123')
+        self.checking = Account.objects.create(user=self.user, account_name='Checking', balance=Decimal('100.00'))
+        self.savings = Account.objects.create(user=self.user, account_name='Savings')
+        other = User.objects.create_user(username='other', password='password123')
+        self.other = Account.objects.create(user=other, account_name='Other')
+        food = Category.objects.create(name='Food')
+        for day, (account, transaction_type, amount) in enumerate([
+            (self.checking, 'EXPENSE', '12.50'), (self.savings, 'INCOME', '300.00'),
+            (self.checking, 'TRANSFER', '40.00'), (self.other, 'EXPENSE', '7.25'),
+        ] * 6):
+            Transaction.objects.create(
+                account=account, transaction_type=transaction_type, amount=Decimal(amount),
+                to_account=self.savings if transaction_type == 'TRANSFER' else None,
+                category=food if transaction_type == 'EXPENSE' else None,
+                title=f'Row {day}', merchant='Corner Grocer' if day % 3 else 'Fuel Stop',
+                date=date(2019, 11, 20) + timedelta(days=day * 9), time=time(9, day % 2), created_by=self.user
+            )
+
+    def list_all(self, **params):
+        """Every page of the transaction list in page mode, and in cursor mode forwards and backwards"""
+        pages, page = [], 1
+        while True:
+            body = self.client.get('/api/v1/transactions/', dict(params, page=page, page_size=5)).json()
+            pages += body['transactions']
+            if page >= body['total_pages']:
+                break
+            page += 1
+
+        forward, token = [], None
+        while True:
+            query = dict(params, pagination='cursor', page_size=5, include_total=True)
+            body = self.client.get('/api/v1/transactions/', dict(query, cursor=token) if token else query).json()
+            self.assertEqual(body['total_count'], len(pages))
+            forward += body['transactions']
+            if not body['next_cursor']:
+                break
+            token = body['next_cursor']
+        self.assertEqual(forward, pages)
+
+        backward, token = body['transactions'], body['prev_cursor']
+        while token:
+            body = self.client.get('/api/v1/transactions/', dict(params, cursor=token, page_size=5)).json()
+            backward = body['transactions'] + backward
+            token = body['prev_cursor']
+        self.assertEqual(backward, pages)
+        return pages
+
+    def test_archive_and_read_back(self):
+        queries = [
+            {}, {'account_id': self.checking.id}, {'user_id': self.user.id}, {'date_from': '2020-02-01'},
+            {'date_to': '2020-03-15', 'transaction_type': 'EXPENSE'}, {'min_amount': 20, 'max_amount': 100},
+            {'search': 'grocer'}, {'search': 'fuel', 'search_mode': 'fulltext'},
+        ]
+        before = [self.list_all(**query) for query in queries]
+        archived_id = Transaction.objects.filter(account=self.checking).earliest('date').id
+        detail = self.client.get(f'/api/v1/transactions/{archived_id}/').json()
+        summary = self.client.get(f'/api/v1/transactions/{archived_id}/summary/').json()
+        balances = dict(Account.objects.values_list('id', 'balance'))
+
+        call_command('archive_transactions', before='2020-03-01', stdout=io.StringIO())
+
+        self.assertFalse(Transaction.objects.filter(date__lt=date(2020, 3, 1)).exists())
+        self.assertTrue(Transaction.objects.filter(date__gte=date(2020, 3, 1)).exists())
+        manifests = archive.load_manifests()
+        self.assertEqual(
+            {manifest['account_id'] for manifest in manifests}, {self.checking.id, self.savings.id, self.other.id}
+        )
+        self.assertEqual(sum(manifest['rows'] for manifest in manifests), 12)
+        checking, = [manifest for manifest in manifests if manifest['account_id'] == self.checking.id]
+        self.assertEqual(
+            [segment['path'] for segment in checking['segments']],
+            [archive.segment_path(self.checking.id, month, checking['archive_id'])
+             for month in ('2019-11', '2019-12', '2020-01', '2020-02')]
+        )
+        self.assertEqual(archive.verify_archives(), [])
+
+        self.assertEqual([self.list_all(**query) for query in queries], before)
+        self.assertEqual(self.client.get(f'/api/v1/transactions/{archived_id}/').json(), detail)
+        self.assertEqual(self.client.get(f'/api/v1/transactions/{archived_id}/summary/').json(), summary)
+        self.assertEqual(self.client.get('/api/v1/transactions/999999/').status_code, 404)
+        self.assertEqual(dict(Account.objects.values_list('id', 'balance')), balances)
+
+        # Live rows dated before the cutoff are merged in date order
+        backdated = Transaction.objects.create(
+            account=self.checking, transaction_type='EXPENSE', amount=Decimal('1.00'), title='Backdated',
+            date=date(2019, 12, 1)
+        )
+        titles = [row['title'] for row in self.list_all(account_id=self.checking.id)]
+        self.assertEqual(titles[-3:], ['Row 2', backdated.title, 'Row 0'])
+
+        # Queries that stay after the archived dates do not read the archive
+        with mock.patch.object(archive, 'read_archived') as read_archived:
+            self.client.get('/api/v1/transactions/', {'date_from': '2020-03-01'})
+        read_archived.assert_not_called()
+
+    def test_list_reads_archive_only_as_far_as_the_page(self):
+        before = self.list_all()
+        archive.archive_transactions(date(2020, 3, 1))
+
+        with mock.patch.object(archive, 'read_archived', wraps=archive.read_archived) as read_archived:
+            body = self.client.get('/api/v1/transactions/', {'page_size': 5}).json()
+            read_archived.assert_not_called()
+            self.assertEqual(body['total_count'], 24)
+
+            # Page 3 ends 3 rows past the 12 live ones
+            body = self.client.get('/api/v1/transactions/', {'page': 3, 'page_size': 5}).json()
+            self.assertEqual(body['transactions'], before[10:15])
+            self.assertEqual(read_archived.call_args.args[0], 3)
+
+            query = {'pagination': 'cursor', 'page_size': 5, 'include_total': True}
+            body = self.client.get('/api/v1/transactions/', query).json()
+            self.assertEqual((body['transactions'], body['total_count']), (before[:5], 24))
+            self.assertEqual(read_archived.call_count, 1)
+
+    def test_list_include_descendants_reads_archive(self):
+        food = Category.objects.get(name='Food')
+        groceries = Category.objects.create(name='Groceries', parent=food)
+        Transaction.objects.filter(title__in=['Row 0', 'Row 20']).update(category=groceries)
+        params = {'category_id': food.id, 'include_descendants': True}
+        before = self.list_all(**params)
+        self.assertIn('Row 0', [row['title'] for row in before])
+
+        archive.archive_transactions(date(2020, 3, 1))
+
+        self.assertEqual(self.list_all(**params), before)
+        self.assertEqual(
+            [row['title'] for row in self.list_all(category_id=groceries.id, include_descendants=True)],
+            ['Row 20', 'Row 0']
+        )
+
+    def test_rebuilds_refuse_archived_accounts(self):
+        archive.archive_transactions(date(2020, 3, 1), account_ids=[self.checking.id])
+        totals = self.checking.get_totals()
+
+        with self.assertRaises(archive.ArchiveError):
+            rebuild_balances()
+        with self.assertRaisesMessage(CommandError, f'accounts {self.checking.id} are archived'):
+            call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(self.checking.get_totals(), totals)
+        # Accounts without archived transactions can still be rebuilt
+        self.assertEqual(rebuild_balances([self.other.id]), 1)
+        call_command('rebuild_rollups', accounts=[self.savings.id], stdout=io.StringIO())
+
+    def test_reimport_skips_archived_rows(self):
+        statement = 'Date,Description,Amount\n2019-12-02,Coffee,-3.50\n2019-12-02,Coffee,-3.50\n'
+        self.assertEqual(import_statement(io.StringIO(statement), self.savings)['created_count'], 2)
+        rows = [{'account_id': self.other.id, 'transaction_type': 'EXPENSE', 'amount': '9.00', 'title': 'Taxi',
+                 'date': '2019-12-03'}]
+        self.assertEqual(ingest_transactions(rows)['created_count'], 1)
+        archive.archive_transactions(date(2020, 3, 1))
+        self.assertFalse(Transaction.objects.filter(title__in=['Coffee', 'Taxi']).exists())
+
+        result = import_statement(io.StringIO(statement + '2019-12-04,Tea,-2.00\n'), self.savings)
+        self.assertEqual((result['created_count'], result['duplicate_count']), (1, 2))
+        with self.assertRaises(IngestError):
+            ingest_transactions(rows)
+        self.assertEqual(ingest_transactions(rows, on_duplicate='merge')['created_count'], 0)
+        self.assertFalse(Transaction.objects.filter(title__in=['Coffee', 'Taxi']).exists())
+
+    def test_failed_archive_keeps_rows(self):
+        with mock.patch.object(archive, '_delete_rows', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                archive.archive_transactions(date(2020, 3, 1), account_ids=[self.checking.id])
+        self.assertEqual(archive.load_manifests(status=None), [])
+        self.assertEqual(Transaction.objects.count(), 24)
+        self.assertEqual(list(archive.archive_dir().rglob('*.parquet')), [])
+
+    def test_settle_interrupted_archive(self):
+        manifest, = archive.archive_transactions(date(2020, 3, 1), account_ids=[self.checking.id])
+        manifest['status'] = 'pending'
+        archive._write_json(archive.manifest_path(manifest['archive_id']), manifest)
+        self.assertEqual(archive.settle_pending(), [(manifest['archive_id'], 'complete')])
+        self.assertEqual(archive.load_manifests()[0]['archive_id'], manifest['archive_id'])
+
+
+class CategoryTreeTests(TestCase):
+    """Category paths and names are resolved from the in-process tree cache"""
+
+    def setUp(self):
+        self.food = Category.objects.create(name='Food')
+        self.dining = Category.objects.create(name='Dining', parent=self.food)
+        self.coffee = Category.objects.create(name='Coffee', parent=self.dining)
+        self.espresso = Category.objects.create(name='Espresso', parent=self.coffee)
+
+    def test_full_paths_and_descendants(self):
+        tree = get_category_tree()
+        self.assertEqual(tree.full_path(self.espresso.id), 'Food > Dining > Coffee > Espresso')
+        self.assertEqual(tree.parent_name(self.coffee.id), 'Dining')
+        self.assertEqual(
+            tree.descendant_ids(self.dining.id),
+            {self.dining.id, self.coffee.id, self.espresso.id}
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.espresso.get_full_path(), 'Food > Dining > Coffee > Espresso')
+
+    def test_list_categories_does_not_query_per_row(self):
+        get_category_tree()
+        # COUNT and page query only, however deep the tree is
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/categories/')
+        paths = {row['name']: row['full_path'] for row in response.json()['categories']}
+        self.assertEqual(paths['Espresso'], 'Food > Dining > Coffee > Espresso')
+
+    def test_rename_invalidates_tree(self):
+        get_category_tree()
+        self.food.name = 'Groceries'
+        self.food.save()
+        self.assertEqual(get_category_tree().full_path(self.espresso.id), 'Groceries > Dining > Coffee > Espresso')
+
+
+class CategoryClosureTests(TestCase):
+    """The closure table follows Category writes and backs include_descendants"""
+
+    def setUp(self):
+        self.food = Category.objects.create(name='Food & Dining')
+        self.groceries = Category.objects.create(name='Groceries', parent=self.food)
+        self.produce = Category.objects.create(name='Produce', parent=self.groceries)
+        self.travel = Category.objects.create(name='Travel')
+
+    def descendants(self, category):
+        return set(CategoryClosure.objects.filter(ancestor=category).values_list('descendant__name', flat=True))
+
+    def test_closure_follows_moves_and_deletes(self):
+        self.assertEqual(self.descendants(self.food), {'Food & Dining', 'Groceries', 'Produce'})
+        self.assertEqual(
+            CategoryClosure.objects.get(ancestor=self.food, descendant=self.produce).depth, 2
+        )
+
+        self.groceries.parent = self.travel
+        self.groceries.save()
+        self.assertEqual(self.descendants(self.food), {'Food & Dining'})
+        self.assertEqual(self.descendants(self.travel), {'Travel', 'Groceries', 'Produce'})
+
+        self.groceries.delete()
+        self.assertEqual(self.descendants(self.travel), {'Travel'})
+
+    def test_cannot_move_under_own_subtree(self):
+        self.food.parent = self.produce
+        with self.assertRaises(ValidationError):
+            self.food.full_clean()
+        with self.assertRaises(ValueError):
+            self.food.save()
+        self.assertEqual(self.descendants(self.food), {'Food & Dining', 'Groceries', 'Produce'})
+
+    def test_list_transactions_include_descendants(self):
+        user = User.objects.create_user(username='closure', password='password123')
+        account = Account.objects.create(user=user, account_name='Checking')
+        for category in (self.food, self.produce, self.travel):
+            Transaction.objects.create(
+                account=account, transaction_type='EXPENSE', amount=Decimal('1.00'),
+                title=category.name, category=category
+            )
+
+        url = f'/api/v1/transactions/?category_id={self.food.id}'
+        exact = self.client.get(url).json()['transactions']
+        nested = self.client.get(url + '&include_descendants=true').json()['transactions']
+        self.assertEqual({row['title'] for row in exact}, {'Food & Dining'})
+        self.assertEqual({row['title'] for row in nested}, {'Food & Dining', 'Produce'})
+
+
+class TransactionSearchTests(TestCase):
+    """search/search_mode on the transaction list"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='search', password='password123')
+        account = Account.objects.create(user=user, account_name='Checking')
+        for title, merchant, description in [
+            ('Weekly groceries', 'FreshMart', ''),
+            ('Dinner', 'Bistro', 'groceries forgotten, ate out'),
+            ('Fuel', 'Shell', 'road trip'),
+        ]:
+            Transaction.objects.create(
+                account=account, transaction_type='EXPENSE', amount=Decimal('10.00'),
+                title=title, merchant=merchant, description=description
+            )
+
+    def search(self, search, mode):
+        response = self.client.get('/api/v1/transactions/', {'search': search, 'search_mode': mode})
+        return [row['title'] for row in response.json()['transactions']]
+
+    def test_fulltext_ranks_title_matches_first(self):
+        self.assertEqual(self.search('groceries', 'fulltext'), ['Weekly groceries', 'Dinner'])
+        self.assertEqual(self.search('groceries road', 'fulltext'), [])
+
+    def test_prefix_matches_word_starts(self):
+        self.assertEqual(self.search('groc', 'prefix'), ['Weekly groceries', 'Dinner'])
+        self.assertEqual(self.search('fresh', 'prefix'), ['Weekly groceries'])
+        self.assertEqual(self.search('rocer', 'prefix'), [])
+
+    def test_contains_is_substring_match(self):
+        self.assertEqual(set(self.search('rocer', 'contains')), {'Weekly groceries', 'Dinner'})
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.search('espresso', 'fulltext'), [])
+        Transaction.objects.filter(title='Fuel').get().delete()
+        dinner = Transaction.objects.get(title='Dinner')
+        dinner.title = 'Espresso'
+        dinner.save()
+        self.assertEqual(self.search('espresso', 'fulltext'), ['Espresso'])
+        self.assertEqual(self.search('fuel', 'fulltext'), [])
+
+
+class RunRecurringTests(TestCase):
+    """run_recurring catches up every due auto_create template exactly once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='recurring', password='password123')
+        self.account = Account.objects.create(user=self.user, account_name='Checking', balance=Decimal('0.00'))
+
+    def template(self, **kwargs):
+        kwargs.setdefault('start_date', date(2026, 1, 1))
+        kwargs.setdefault('next_due_date', kwargs['start_date'])
+        kwargs.setdefault('auto_create', True)
+        return RecurringTransaction.objects.create(
+            user=self.user, account=self.account, transaction_type='EXPENSE', amount=Decimal('10.00'),
+            title='Rent', **kwargs
+        )
+
+    def test_catches_up_missed_periods_idempotently(self):
+        monthly = self.template(frequency='MONTHLY')
+        weekly = self.template(frequency='WEEKLY', end_date=date(2026, 1, 20))
+        self.template(frequency='DAILY', auto_create=False)
+
+        self.assertEqual(materialize_recurring(today=date(2026, 3, 15)), (2, 6))
+        self.assertEqual(materialize_recurring(today=date(2026, 3, 15)), (0, 0))
+
+        self.assertEqual(
+            sorted(Transaction.objects.filter(title='Rent').values_list('date', flat=True)),
+            [date(2026, 1, 1), date(2026, 1, 1), date(2026, 1, 8), date(2026, 1, 15),
+             date(2026, 2, 1), date(2026, 3, 1)]
+        )
+        monthly.refresh_from_db()
+        weekly.refresh_from_db()
+        self.assertEqual(monthly.next_due_date, date(2026, 4, 1))
+        self.assertEqual(weekly.next_due_date, date(2026, 1, 22))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('-60.00'))
+
+    def test_batches(self):
+        for _ in range(3):
+            self.template(frequency='MONTHLY')
+        self.assertEqual(materialize_recurring(today=date(2026, 2, 1), batch_size=2), (3, 6))
+
+
+class StatementImportTests(TestCase):
+    """Statement imports map columns, skip rows already imported and post balances"""
+
+    CSV = (
+        'Date,Description,Amount,Memo\n'
+        '2026-02-01,Salary,"2,000.00",February\n'
+        '2026-02-03,Coffee,-3.50,\n'
+        '2026-02-03,Coffee,-3.50,\n'
+        '2026-02-04,Groceries,(45.10),\n'
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='statement', password='password123')
+        self.account = Account.objects.create(user=self.user, account_name='Checking', balance=Decimal('0.00'))
+
+    def test_csv_import_skips_duplicates_on_reimport(self):
+        result = import_statement(io.StringIO(self.CSV), self.account, chunk_size=2)
+        self.assertEqual((result['row_count'], result['created_count'], result['duplicate_count']), (4, 4, 0))
+        self.assertEqual(result['account_ids'], [self.account.id])
+
+        # An overlapping statement only adds the rows the account does not hold yet
+        overlap = self.CSV + '2026-02-03,Coffee,-3.50,\n2026-02-05,Rent,-900.00,\n'
+        result = import_statement(io.StringIO(overlap), self.account)
+        self.assertEqual((result['created_count'], result['duplicate_count']), (2, 4))
+
+        self.assertEqual(Transaction.objects.filter(account=self.account, title='Coffee').count(), 3)
+        salary = Transaction.objects.get(title='Salary')
+        self.assertEqual((salary.transaction_type, salary.description), ('INCOME', 'February'))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1044.40'))
+        rollup = AccountDailyRollup.objects.get(account=self.account, date=date(2026, 2, 3))
+        self.assertEqual((rollup.total_amount, rollup.transaction_count), (Decimal('10.50'), 3))
+
+    def test_ofx_import(self):
+        ofx = (
+            'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            '<STMTTRN>\n<TRNTYPE>POS\n<DTPOSTED>20260210143000.000[-5:EST]\n<TRNAMT>-12.40\n'
+            '<FITID>1\n<NAME>Bakery &amp; Co\n<MEMO>Card 1234\n</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>DIRECTDEP\n<DTPOSTED>20260215\n<TRNAMT>500.00\n<FITID>2\n'
+            '<NAME>Employer\n</STMTTRN>\n</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        )
+        result = import_statement(io.StringIO(ofx), self.account, file_format='ofx')
+
+        self.assertEqual(result['created_count'], 2)
+        bakery = Transaction.objects.get(account=self.account, transaction_type='EXPENSE')
+        self.assertEqual(
+            (bakery.title, bakery.description, bakery.amount, bakery.date, bakery.time, bakery.payment_method),
+            ('Bakery & Co', 'Card 1234', Decimal('12.40'), date(2026, 2, 10), time(14, 30), 'DEBIT_CARD')
+        )
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('487.60'))
+
+    def test_invalid_rows_reject_the_import(self):
+        statement = (
+            'Date,Payee,Amount,Type\n2026-02-01,Ok,5.00,\n2026-02-31,Bad date,1.00,\n2026-02-02,,abc,\n'
+            '2026-02-03,To savings,20.00,transfer\n'
+        )
+
+        with self.assertRaises(IngestError) as context:
+            import_statement(io.StringIO(statement), self.account)
+
+        self.assertEqual([error['row'] for error in context.exception.errors], [1, 2, 3])
+        self.assertEqual(set(context.exception.errors[1]['errors']), {'amount', 'title'})
+        self.assertEqual(
+            context.exception.errors[2]['errors'], {'to_account_id': ['Transfers require a target account.']}
+        )
+        self.assertFalse(Transaction.objects.exists())
+
+
+class NearDuplicateReportTests(TestCase):
+    """The duplicate report pairs similar transactions of one account dated close together"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='duplicates', password='password123')
+        self.account = Account.objects.create(user=self.user, account_name='Checking', balance=Decimal('0.00'))
+
+    def create(self, title, day, amount='42.00', **kwargs):
+        return Transaction.objects.create(
+            account=self.account, transaction_type='EXPENSE', amount=Decimal(amount), title=title,
+            date=date(2026, 3, day), **kwargs
+        )
+
+    def test_report_lists_similar_pairs(self):
+        manual = self.create('Grocery store', 1)
+        self.create('Gym', 2)  # Same amount, different payee
+        imported = self.create('GROCERY STORE #123', 2, fingerprint='f' * 32)
+        self.create('Grocery store', 9)  # Too far apart
+        self.create('Grocery store', 2, amount='41.00')
+
+        response = self.client.get('/api/v1/transactions/duplicates/', {'account_id': self.account.id})
+
+        self.assertEqual(response.status_code, 200)
+        pairs = response.json()['pairs']
+        self.assertEqual(
+            [(pair['transaction_id'], pair['duplicate_of_id'], pair['imported']) for pair in pairs],
+            [(imported.id, manual.id, True)]
+        )
+
+    def test_reads_in_chunks_until_limit(self):
+        for day in range(1, 11):
+            self.create('Coffee', day)
+            self.create('Coffee', day)
+        everything = find_near_duplicates(Transaction.objects.all(), days=0)
+        self.assertEqual(len(everything), 10)
+        self.assertEqual(find_near_duplicates(Transaction.objects.all(), days=0, chunk_size=3), everything)
+
+        # Only the later row of each pair has a candidate: 2 pairs per chunk, so
+        # the limit is reached in the second of five chunks
+        with CaptureQueriesContext(connection) as queries:
+            pairs = find_near_duplicates(Transaction.objects.all(), days=0, limit=3, chunk_size=2)
+        self.assertEqual(pairs, everything[:3])
+        self.assertEqual(len(queries), 4)
+
+
+class ForecastExpansionTests(TestCase):
+    """Vectorized schedule expansion matches stepping with get_next_date()"""
+
+    def test_matches_get_next_date_chain(self):
+        end = date(2028, 12, 31)
+        schedules = [
+            ('DAILY', date(2026, 2, 25), date(2026, 3, 5)),
+            ('WEEKLY', date(2026, 1, 1), end),
+            ('BIWEEKLY', date(2026, 1, 3), date(2026, 6, 30)),
+            ('MONTHLY', date(2026, 1, 31), end),
+            ('MONTHLY', date(2026, 3, 30), end),
+            ('QUARTERLY', date(2026, 11, 30), end),
+            ('YEARLY', date(2028, 2, 29), date(2032, 3, 1)),
+        ]
+        frequencies = [frequency for frequency, _, _ in schedules]
+        first = np.array([start for _, start, _ in schedules], dtype='datetime64[D]')
+        last = np.array([stop for _, _, stop in schedules], dtype='datetime64[D]')
+        schedule, dates = expand_schedules(frequencies, first, last)
+
+        for index, (frequency, start, stop) in enumerate(schedules):
+            template = RecurringTransaction(frequency=frequency)
+            expected = []
+            current = start
+            while current <= stop:
+                expected.append(current)
+                current = template.get_next_date(current)
+            self.assertEqual(sorted(day.item() for day in dates[schedule == index]), expected, frequency)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentBalancePostingTests(TransactionTestCase):
+    """Concurrent writers to one account must not lose balance updates"""
+
+    THREADS = 8
+    TRANSACTIONS_PER_THREAD = 25
+
+    def test_concurrent_writers(self):
+        user = User.objects.create_user(username='concurrent', password='password123')
+        account = Account.objects.create(user=user, account_name='Shared', balance=Decimal('0.00'))
+        other = Account.objects.create(user=user, account_name='Other', balance=Decimal('0.00'))
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for i in range(self.TRANSACTIONS_PER_THREAD):
+                    transaction = Transaction.objects.create(
+                        account=account,
+                        transaction_type='INCOME',
+                        amount=Decimal('3.00'),
+                        title=f'Income {index}-{i}'
+                    )
+                    if i % 5 == 0:
+                        transaction.amount = Decimal('2.00')
+                        transaction.save()
+                    Transaction.objects.create(
+                        account=account,
+                        transaction_type='TRANSFER',
+                        to_account=other,
+                        amount=Decimal('1.00'),
+                        title=f'Transfer {index}-{i}'
+                    )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.TRANSACTIONS_PER_THREAD
+        updated = self.THREADS * len(range(0, self.TRANSACTIONS_PER_THREAD, 5))
+        account.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(account.balance, Decimal(3 * total - updated - total))
+        self.assertEqual(other.balance, Decimal(total))